@@ -9,6 +9,9 @@ $env:SFERA_SQL_LOGIN = "sa"
 $env:SFERA_SQL_PASSWORD = ""
 $env:SFERA_SQL_DB = "baza_testowa"
 
+# Ile sesji Sfery może działać równocześnie w kolejce zadań launchera (stanowiska licencji)
+$env:SFERA_LICENCJE = "1"
+
 
 $ErrorActionPreference = "Stop"
 
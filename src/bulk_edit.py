@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+"""
+Masowa edycja pól dokumentów (data wystawienia, kategoria, tytuł, uwagi).
+Plan zmian powstaje z jednego zapytania SQL; zapisywane są tylko dokumenty
+z rzeczywistą różnicą, partiami, z postępem i dziennikiem (wznawianie/cofanie).
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import time as _time
+from datetime import date, datetime, time
+from pathlib import Path
+from typing import Callable, Optional
+
+from pywintypes import com_error
+
+import logowanie
+import metryki
+import replika
+from cli import add_common_args, doc_filter, parse_date, resolve_runs
+from com_worker import ComWorker, checkpoint
+from journal import ST_FAILED, ST_SAVED, ST_UNDONE, Journal
+from retry import CircuitOpen, ItemRunner
+from scheduler import cancel_requested, report_progress
+from utils import doc_where, run_sql, to_com_time
+
+logger = logging.getLogger(__name__)
+
+# ===================== Stałe =====================
+LOG_PREFIX = "EDYCJA_"
+JOURNAL_DIR = Path(logowanie.LOG_DIR)
+DEFAULT_BATCH = 50
+
+# Typy dokumentów (dok_Typ) wg nazw używanych w programie
+DOC_TYPES = {"FS": 2, "MM": 9}
+
+# ============================================================================ #
+#                                    POLA
+# ============================================================================ #
+
+def _noon(d: date):
+    # Ustal noon, aby uniknąć problemów z DST
+    return to_com_time(datetime.combine(d, time(12, 0)))
+
+
+def _as_date(v) -> Optional[date]:
+    if v is None or v == "":
+        return None
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    return parse_date(v)
+
+
+def _as_int(v) -> Optional[int]:
+    return int(v) if v not in (None, "") else None
+
+
+def _as_text(v) -> str:
+    return "" if v is None else str(v)
+
+
+# nazwa -> (właściwość SuDokument, kolumna dok__Dokument, normalizacja, wartość dla COM)
+FIELDS: dict[str, tuple[str, str, Callable, Callable]] = {
+    "data":      ("DataWystawienia", "dok_DataWyst", _as_date, _noon),
+    "kategoria": ("KategoriaId",     "dok_KatId",    _as_int,  int),
+    "tytul":     ("Tytul",           "dok_Tytul",    _as_text, str),
+    "uwagi":     ("Uwagi",           "dok_Uwagi",    _as_text, str),
+}
+
+
+def parse_assignments(pairs: list[str]) -> dict[str, str]:
+    """['data=2026-01-31', 'tytul=...'] -> {'data': '2026-01-31', ...}"""
+    out = {}
+    for pair in pairs:
+        field, sep, value = str(pair).partition("=")
+        field = field.strip().lower()
+        if not sep or field not in FIELDS:
+            raise ValueError(f"Błędne przypisanie '{pair}' (pola: {', '.join(FIELDS)}).")
+        out[field] = value
+    return out
+
+
+def resolve_assignments(src, raw: dict) -> dict:
+    """Normalizuje wartości; kategoria może być podana nazwą ze słownika."""
+    out = {}
+    for field, value in raw.items():
+        if field == "kategoria" and value not in (None, "") and not str(value).strip().isdigit():
+            kat = replika.katalog(src, ["kategorie"]).by("kategorie", "nazwa", value)
+            if kat is None:
+                raise ValueError(f"Nie znaleziono kategorii '{value}'.")
+            value = kat.id
+        out[field] = FIELDS[field][2](value)
+    return out
+
+# ============================================================================ #
+#                                    PLAN
+# ============================================================================ #
+
+def plan_changes(src, assignments: dict, typ: Optional[int] = None, filtr: Optional[dict] = None,
+                 ids: Optional[list[int]] = None) -> list[dict]:
+    """
+    Jedno zapytanie: bieżące wartości pól dla dokumentów z filtra (albo listy ID).
+    Zwraca tylko dokumenty z różnicą: {id, numer, netto, old: {pole: ...}, new: {pole: ...}}.
+    """
+    if ids is not None:
+        if not ids:
+            return []
+        where = doc_where(typ, ids=ids)
+    else:
+        where = doc_where(typ, **(filtr or {}))
+    cols = ", ".join(f"d.{FIELDS[f][1]}" for f in assignments)
+    with metryki.current().stage("plan"):
+        rows = run_sql(src, f"""
+            SELECT d.dok_Id, d.dok_NrPelny, d.dok_WartNetto, {cols}
+              FROM dok__Dokument d
+             WHERE {where}
+             ORDER BY d.dok_DataWyst, d.dok_Id
+        """)
+    if ids is not None:
+        pos = {int(i): n for n, i in enumerate(ids)}
+        rows.sort(key=lambda r: pos.get(int(r["dok_Id"]), len(pos)))
+
+    plan = []
+    for r in rows:
+        old, new = {}, {}
+        for field, value in assignments.items():
+            current = FIELDS[field][2](r[FIELDS[field][1]])
+            if current != value:
+                old[field], new[field] = current, value
+        if new:
+            plan.append({"id": int(r["dok_Id"]), "numer": str(r["dok_NrPelny"]),
+                         "netto": r["dok_WartNetto"], "old": old, "new": new})
+    logger.info("Plan: %d dokumentów do zmiany, %d bez zmian.", len(plan), len(rows) - len(plan))
+    return plan
+
+
+def describe(entry: dict) -> str:
+    changes = "; ".join(f"{f}: {_fmt(entry['old'].get(f))} -> {_fmt(v)}" for f, v in entry["new"].items())
+    return f"{entry['numer']} (netto {entry['netto']}): {changes}"
+
+
+def _fmt_json(v):
+    return v.isoformat() if isinstance(v, date) else v
+
+
+def _fmt(v) -> str:
+    return v.isoformat() if isinstance(v, date) else repr(v) if isinstance(v, str) else str(v)
+
+# ============================================================================ #
+#                                   ZAPIS
+# ============================================================================ #
+
+def _save(sub, entry: dict) -> None:
+    doc = sub.Dokumenty.Wczytaj(entry["id"])
+    try:
+        for field, value in entry["new"].items():
+            setattr(doc, FIELDS[field][0], FIELDS[field][3](value))
+        doc.Zapisz()
+    finally:
+        try:
+            doc.Zamknij()
+        except Exception:
+            pass
+
+
+def apply_changes(sub, plan: list[dict], journal: Optional[Journal] = None,
+                  batch_size: int = DEFAULT_BATCH, dry_run: bool = False, status: str = ST_SAVED,
+                  runner: Optional[ItemRunner] = None) -> int:
+    """
+    Zapisuje plan partiami po batch_size dokumentów; po każdej partii loguje
+    postęp i tempo. Każdy zapis trafia do dziennika ze statusem 'status'.
+    Błędy pojedynczych dokumentów obsługuje runner (ponowienia, lista nieudanych);
+    po otwarciu bezpiecznika albo anulowaniu (scheduler.request_cancel) pozostałe
+    dokumenty trafiają na listę nieprzetworzonych - dziennik pozwala je wznowić.
+    Zwraca liczbę zapisanych dokumentów.
+    """
+    runner = runner or ItemRunner()
+    total = len(plan)
+    saved = 0
+    cancelled = False
+    t0 = _time.perf_counter()
+    with metryki.current().stage("zapis"):
+        for start in range(0, total, max(1, batch_size)):
+            for n, entry in enumerate(plan[start:start + batch_size], start=start):
+                if cancel_requested():
+                    for rest in plan[n:]:
+                        runner.skip(rest, "anulowano przez użytkownika")
+                    logger.warning("Anulowano przez użytkownika po %d z %d dokumentów.", n, total)
+                    cancelled = True
+                    break
+                if dry_run:
+                    logger.info("DRY RUN: %s", describe(entry))
+                    continue
+                logger.info("Zmieniam %s", describe(entry))
+                try:
+                    ok = runner.run(entry, _save, sub, entry)
+                except CircuitOpen as e:
+                    for rest in plan[n + 1:]:
+                        runner.skip(rest, str(e))
+                    raise
+                if ok:
+                    saved += 1
+                    if journal is not None:
+                        journal.record(entry["id"], entry["numer"], entry["old"], entry["new"], status)
+                elif journal is not None and status == ST_SAVED:
+                    journal.record(entry["id"], entry["numer"], entry["old"], entry["new"], ST_FAILED,
+                                   error=runner.failed[-1]["blad"])
+                report_progress(n + 1, total)
+                sub = checkpoint(sub)       # strażnik: odnowienie sesji, dalej od następnego dokumentu
+            if cancelled:
+                break
+            done = min(start + batch_size, total)
+            elapsed = _time.perf_counter() - t0
+            logger.info("Postęp: %d/%d (%.1f dok./s)", done, total, done / elapsed if elapsed > 0 else 0.0)
+    if runner.failed:
+        logger.warning("Zapisano %d z %d dokumentów; nieudane: %d, ponowienia: %d.",
+                       saved, total, len(runner.failed), runner.retries)
+    return saved
+
+
+def _apply_logged(sub, plan: list[dict], journal: Journal, batch_size: int, prefix: str,
+                  dead_params: dict, status: str = ST_SAVED) -> int:
+    """apply_changes z listą nieudanych dokumentów zapisaną obok dziennika (manifest ponowienia)."""
+    runner = ItemRunner()
+    try:
+        return apply_changes(sub, plan, journal, batch_size, status=status, runner=runner)
+    finally:
+        runner.write_dead_letters(JOURNAL_DIR, prefix, dead_params)
+
+
+def run_edit(sub, plan: list[dict], assignments: dict, prefix: str = LOG_PREFIX,
+             batch_size: int = DEFAULT_BATCH, dry_run: bool = False,
+             dead_params: Optional[dict] = None) -> int:
+    """
+    Zapis planu z dziennikiem (nagłówek: przypisania + lista ID).
+    dead_params - parametry przebiegu zapisywane w manifeście nieudanych dokumentów.
+    """
+    if dry_run or not plan:
+        return apply_changes(sub, plan, None, batch_size, dry_run)
+    values = {f: _fmt_json(v) for f, v in assignments.items()}
+    header = {"assignments": values, "ids": [e["id"] for e in plan]}
+    with Journal.create(JOURNAL_DIR, prefix, header) as journal:
+        logger.info("Dziennik zmian: %s", journal.path)
+        return _apply_logged(sub, plan, journal, batch_size, prefix,
+                             dead_params if dead_params is not None else {"ustaw": values})
+
+
+def resume(sub, path: str, batch_size: int = DEFAULT_BATCH, prefix: str = LOG_PREFIX) -> int:
+    """Dokańcza przebieg z dziennika: ponowny plan dla niezatwierdzonych dokumentów."""
+    journal = Journal(path)
+    header = journal.plan()
+    if not header:
+        raise ValueError(f"Dziennik {path} nie zawiera planu przebiegu.")
+    # dzienniki zmiana_mm sprzed silnika zapisywały samą datę
+    raw = header.get("assignments") or {"data": header["data"]}
+    assignments = {f: FIELDS[f][2](v) for f, v in raw.items()}
+    pending = journal.pending_ids()
+    logger.info("Wznawiam %s: pozostało %d z %d dokumentów.", path, len(pending), len(header["ids"]))
+    plan = plan_changes(sub, assignments, ids=pending)
+    with journal:
+        return _apply_logged(sub, plan, journal, batch_size, prefix, {"wznow": str(path)})
+
+
+def current_values(src, fields: list[str], ids: list[int]) -> dict[int, dict]:
+    """Bieżące wartości pól dokumentów jednym zapytaniem: {id: {pole: wartość}}."""
+    if not ids or not fields:
+        return {}
+    cols = ", ".join(f"d.{FIELDS[f][1]}" for f in fields)
+    rows = run_sql(src, f"SELECT d.dok_Id, {cols} FROM dok__Dokument d WHERE {doc_where(ids=ids)}")
+    return {int(r["dok_Id"]): {f: FIELDS[f][2](r[FIELDS[f][1]]) for f in fields} for r in rows}
+
+
+def undo(sub, path: str, batch_size: int = DEFAULT_BATCH, prefix: str = LOG_PREFIX) -> int:
+    """
+    Przywraca stare wartości zapisane w dzienniku (od najnowszej zmiany). Dokument,
+    którego bieżąca wartość różni się od zapisanej przez przebieg (zmieniony później,
+    np. ręcznie), jest pomijany z ostrzeżeniem.
+    """
+    journal = Journal(path)
+    plan = []
+    for e in journal.undo_entries():
+        old, new = e["old"], e["new"]
+        if not isinstance(old, dict):
+            old, new = {"data": old}, {"data": new}
+        plan.append({"id": int(e["id"]), "numer": e["numer"], "netto": "-",
+                     "old": {f: FIELDS[f][2](v) for f, v in new.items()},
+                     "new": {f: FIELDS[f][2](v) for f, v in old.items()}})
+    fields = sorted({f for entry in plan for f in entry["old"]})
+    current = current_values(sub, fields, [entry["id"] for entry in plan])
+    checked = []
+    for entry in plan:
+        now = current.get(entry["id"])
+        changed = [f for f, v in entry["old"].items() if now is None or now[f] != v]
+        if changed:
+            logger.warning("%s: pomijam – zmieniony po przebiegu (%s).", entry["numer"], "; ".join(
+                f"{f}: {_fmt(now[f]) if now else 'brak dokumentu'} zamiast {_fmt(entry['old'][f])}"
+                for f in changed))
+            continue
+        checked.append(entry)
+    if len(checked) < len(plan):
+        logger.warning("Pominięto %d z %d zmian zmienionych po przebiegu.", len(plan) - len(checked), len(plan))
+    plan = checked
+    logger.info("Cofam %d zmian z dziennika %s.", len(plan), path)
+    with journal:
+        return _apply_logged(sub, plan, journal, batch_size, prefix, {"cofnij": str(path)}, status=ST_UNDONE)
+
+# ============================================================================ #
+#                                    MAIN
+# ============================================================================ #
+
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Masowa edycja pól dokumentów wg filtra.")
+    ap.add_argument("--typ", default="MM", help=f"Typ dokumentu: {', '.join(DOC_TYPES)} albo dok_Typ (liczba).")
+    ap.add_argument("--ustaw", action="append", default=[],
+                    help="Przypisanie pole=wartość (pola: data, kategoria, tytul, uwagi); wielokrotnie.")
+    ap.add_argument("--partia", type=int, default=DEFAULT_BATCH, help="Dokumentów na partię zapisu.")
+    ap.add_argument("--wznow", help="Wznów przebieg z pliku dziennika (.jsonl).")
+    ap.add_argument("--cofnij", help="Przywróć wartości zapisane w dzienniku (.jsonl).")
+    add_common_args(ap)
+    return ap.parse_args(argv)
+
+
+def edit_run(sub, run: dict) -> None:
+    """(wątek COM) Jeden przebieg: plan z SQL i zapis różnic."""
+    batch = int(run.get("partia") or DEFAULT_BATCH)
+    if run.get("cofnij"):
+        undo(sub, run["cofnij"], batch)
+        return
+    if run.get("wznow"):
+        resume(sub, run["wznow"], batch)
+        return
+    ustaw = run.get("ustaw") or []
+    raw = ustaw if isinstance(ustaw, dict) else parse_assignments(ustaw)
+    if not raw:
+        raise ValueError("Podaj co najmniej jedno przypisanie: --ustaw pole=wartość")
+    typ = str(run.get("typ") or "MM").upper()
+    typ_id = DOC_TYPES[typ] if typ in DOC_TYPES else int(typ)
+    assignments = resolve_assignments(sub, raw)
+    plan = plan_changes(sub, assignments, typ=typ_id, filtr=doc_filter(run))
+    dead_params = {"typ": typ, "ustaw": {f: _fmt_json(v) for f, v in assignments.items()}}
+    run_edit(sub, plan, assignments, batch_size=batch, dry_run=bool(run["dry_run"]), dead_params=dead_params)
+
+
+def main(args: argparse.Namespace):
+    worker = ComWorker()
+    try:
+        for run in resolve_runs(args):
+            worker.submit(edit_run, run).result()
+    except com_error as e:
+        logger.exception("Błąd COM: %s", e)
+    except Exception as e:
+        logger.exception("Błąd krytyczny: %s", e)
+    finally:
+        worker.shutdown()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logfile = logowanie.setup_logging(LOG_PREFIX = LOG_PREFIX)
+    logger.info("Start aplikacji. Logi zapisuję do pliku: %s", logfile)
+    metryki.start("bulk_edit", LOG_PREFIX)
+    try:
+        main(args)
+    finally:
+        metryki.finish(Path(logfile).parent)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Wspólne argumenty CLI i manifesty wsadowe (JSON/YAML) dla narzędzi.
+Tryb --headless: żadnych okien, dokumenty wybierane filtrem zamiast okna Wybierz().
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+try:
+    import yaml  # opcjonalnie: manifesty .yaml/.yml
+except ImportError:
+    yaml = None
+
+
+def parse_date(s: str) -> date:
+    """Data w formacie YYYY-MM-DD, DD.MM.YYYY albo DD/MM/YYYY."""
+    s = str(s).strip()
+    try:
+        return datetime.fromisoformat(s).date()
+    except ValueError:
+        pass
+    for fmt in ("%d.%m.%Y", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(s, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError("Nieprawidłowy format daty. Użyj YYYY-MM-DD lub DD.MM.YYYY")
+
+
+def prev_month_range(today: Optional[date] = None) -> tuple[date, date]:
+    """Pierwszy i ostatni dzień poprzedniego miesiąca."""
+    today = today or datetime.now().date()
+    last_prev = today.replace(day=1) - timedelta(days=1)
+    return last_prev.replace(day=1), last_prev
+
+# ============================================================================ #
+#                                  ARGUMENTY
+# ============================================================================ #
+
+def add_common_args(ap: argparse.ArgumentParser) -> None:
+    """Argumenty wspólne: tryb bez okien, manifest, filtr dokumentów, dry-run."""
+    ap.add_argument("--headless", action="store_true",
+                    help="Tryb bez okien (np. nocne uruchomienia z harmonogramu).")
+    ap.add_argument("--manifest", help="Plik JSON/YAML z parametrami; klucz 'runs' = lista przebiegów.")
+    ap.add_argument("--od", help="Data wystawienia od (domyślnie początek poprzedniego miesiąca).")
+    ap.add_argument("--do", help="Data wystawienia do (domyślnie koniec poprzedniego miesiąca).")
+    ap.add_argument("--numer", action="append", default=[],
+                    help="Numer dokumentu, '*' = dowolny ciąg (można podać wiele razy).")
+    ap.add_argument("--kontrahent", action="append", type=int, default=[],
+                    help="ID kontrahenta (można podać wiele razy).")
+    ap.add_argument("--id", dest="ids", action="append", type=int, default=[],
+                    help="ID dokumentu (można podać wiele razy).")
+    ap.add_argument("--dry-run", dest="dry_run", action="store_true",
+                    help="Symulacja, bez zapisu.")
+
+
+def load_manifest(path: str) -> dict:
+    p = Path(path)
+    text = p.read_text(encoding="utf-8-sig")
+    if p.suffix.lower() in (".yaml", ".yml"):
+        if yaml is None:
+            raise RuntimeError("Manifest YAML wymaga pakietu PyYAML (pip install pyyaml).")
+        data = yaml.safe_load(text) or {}
+    else:
+        data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError(f"Manifest {path}: oczekiwano obiektu z parametrami.")
+    return data
+
+
+def _norm_keys(d: dict) -> dict:
+    return {str(k).replace("-", "_"): v for k, v in d.items()}
+
+
+def resolve_runs(args: argparse.Namespace) -> list[dict]:
+    """
+    Lista przebiegów: argumenty CLI nadpisane manifestem, a ten - wpisami z 'runs'.
+    Podanie manifestu włącza tryb --headless.
+    """
+    base = dict(vars(args))
+    if not args.manifest:
+        return [base]
+    manifest = _norm_keys(load_manifest(args.manifest))
+    runs = manifest.pop("runs", None) or [{}]
+    base["headless"] = True
+    return [{**base, **manifest, **_norm_keys(run)} for run in runs]
+
+
+def _as_list(v) -> list:
+    if v is None:
+        return []
+    return list(v) if isinstance(v, (list, tuple)) else [v]
+
+
+def doc_filter(run: dict) -> dict:
+    """
+    Filtr dokumentów z parametrów przebiegu.
+    Daty domyślnie: poprzedni miesiąc (poza wyborem po samych ID).
+    """
+    ids = [int(i) for i in _as_list(run.get("ids")) or _as_list(run.get("id"))]
+    od, do = (None, None) if ids else prev_month_range()
+    return {
+        "od": parse_date(run["od"]) if run.get("od") else od,
+        "do": parse_date(run["do"]) if run.get("do") else do,
+        "numery": [str(n) for n in _as_list(run.get("numer"))],
+        "kh_ids": [int(k) for k in _as_list(run.get("kontrahent"))],
+        "ids": ids,
+    }
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Wątek roboczy COM (STA) będący właścicielem sesji Subiekta.
+Wszystkie wywołania Sfery idą przez submit(fn) -> Future, więc okna Tk
+w wątku głównym nie zamarzają w czasie długich zapytań i wydruków.
+Strażnik (straznik.Watchdog) między zadaniami - albo w checkpoint() w pętli
+zadania - odnawia sesję, gdy proces Subiekta puchnie lub zwalnia.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+import pythoncom
+from win32com.client import Dispatch
+
+import metryki
+import straznik
+from utils import get_subiekt, run_sql
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT = object()
+_tls = threading.local()          # bieżący ComWorker w jego wątku (checkpoint)
+_recycle_listeners: list[Callable[[], None]] = []
+
+
+def add_recycle_listener(fn: Callable[[], None]) -> None:
+    """fn() w wątku COM po odnowieniu sesji - np. czyszczenie obiektów COM trzymanych w pamięci podręcznej."""
+    _recycle_listeners.append(fn)
+
+
+def checkpoint(sub: Any) -> Any:
+    """
+    Wywoływane w pętli zadania po każdej pozycji (w wątku COM): czas pozycji
+    dla strażnika, w razie potrzeby odnowienie sesji. Zwraca sesję, której
+    należy używać dalej; poza wątkiem ComWorker zwraca 'sub' bez zmian.
+    """
+    worker = getattr(_tls, "worker", None)
+    return sub if worker is None else worker._checkpoint(sub)
+
+
+class ComWorker:
+    """
+    Jeden wątek STA: CoInitialize, logowanie (session_factory), kolejka zadań.
+    Funkcje przekazane do submit() dostają sesję jako pierwszy argument
+    i wykonują się po kolei w wątku, który ją utworzył.
+    Obiektów COM zwróconych z zadań nie wolno wywoływać z innych wątków -
+    można je jedynie przekazać z powrotem do kolejnego submit().
+    Po odnowieniu sesji przez strażnika (domyślnie straznik.from_env()) kolejne
+    zadania dostają nową sesję; obiekty starej sesji są nieważne.
+    """
+
+    def __init__(self, session_factory: Callable[[], Any] = get_subiekt, name: str = "sfera-com",
+                 watchdog: Optional[straznik.Watchdog] = _DEFAULT):
+        self._factory = session_factory
+        self._watchdog = straznik.from_env() if watchdog is _DEFAULT else watchdog
+        self._sub = None
+        self._last_item = 0.0
+        self._checkpoints = 0
+        self.recycles = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._session: Future = Future()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------ API
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Kolejkuje fn(sub, *args, **kwargs) w wątku COM."""
+        fut: Future = Future()
+        self._queue.put((fut, fn, args, kwargs))
+        return fut
+
+    def run_sql_async(self, sql: str) -> Future:
+        """run_sql() wykonywane w wątku COM; wynik: list[dict]."""
+        return self.submit(run_sql, sql)
+
+    def wait_ready(self, timeout: float | None = None) -> Any:
+        """Czeka na zalogowanie; zgłasza wyjątek logowania, jeśli wystąpił."""
+        return self._session.result(timeout)
+
+    def marshal_session(self) -> Any:
+        """
+        Udostępnia sesję innemu wątkowi (musi mieć wywołane CoInitialize).
+        Wywołania przez zwrócony obiekt są przekazywane do wątku COM.
+        """
+        stream = self.submit(
+            lambda sub: pythoncom.CoMarshalInterThreadInterfaceInStream(pythoncom.IID_IDispatch, sub._oleobj_)
+        ).result()
+        return Dispatch(pythoncom.CoGetInterfaceAndReleaseStream(stream, pythoncom.IID_IDispatch))
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Kończy wątek po wykonaniu zadań z kolejki (Zakoncz() + CoUninitialize)."""
+        self._queue.put(None)
+        if wait:
+            self._thread.join()
+
+    def __enter__(self) -> "ComWorker":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
+
+    # ---------------------------------------------------------------- wątek
+
+    def _login(self) -> Any:
+        since = time.time()
+        with metryki.current().stage("logowanie"):
+            sub = self._factory()
+        if self._watchdog is not None:
+            self._watchdog.attach(since)
+        return sub
+
+    def _recycle(self, reason: str) -> Any:
+        """
+        Zakoncz() + ponowne logowanie; listenery czyszczą obiekty starej sesji.
+        Nieudane logowanie: kolejne zadania dostają jego wyjątek (jak przy starcie).
+        """
+        logger.warning("Odnawiam sesję Sfery: %s.", reason)
+        t0 = time.perf_counter()
+        try:
+            self._sub.Zakoncz()
+        except Exception as e:
+            logger.debug("Zakoncz(): %s", e)
+        self._sub = None
+        for fn in list(_recycle_listeners):
+            fn()
+        try:
+            self._sub = self._login()
+        except BaseException as e:
+            logger.error("Ponowne logowanie do Sfery nieudane: %s", e)
+            self._session = Future()
+            self._session.set_exception(e)
+            raise
+        self.recycles += 1
+        metryki.current().count("recykling_sesji")
+        logger.info("Nowa sesja Sfery po %.1f s (odnowienie nr %d).", time.perf_counter() - t0, self.recycles)
+        return self._sub
+
+    def _checkpoint(self, sub: Any) -> Any:
+        self._checkpoints += 1
+        now = time.perf_counter()
+        self._watchdog_item(now - self._last_item)
+        self._last_item = now
+        reason = self._watchdog.check() if self._watchdog is not None else None
+        if reason:
+            sub = self._recycle(reason)
+            self._last_item = time.perf_counter()
+        return sub
+
+    def _watchdog_item(self, seconds: float) -> None:
+        if self._watchdog is not None:
+            self._watchdog.item(seconds)
+
+    def _run(self) -> None:
+        pythoncom.CoInitializeEx(pythoncom.COINIT_APARTMENTTHREADED)
+        _tls.worker = self
+        try:
+            try:
+                self._sub = self._login()
+                self._session.set_result(self._sub)
+            except BaseException as e:
+                self._session.set_exception(e)
+            while True:
+                try:
+                    item = self._queue.get(timeout=0.05)
+                except queue.Empty:
+                    pythoncom.PumpWaitingMessages()
+                    continue
+                if item is None:
+                    break
+                fut, fn, args, kwargs = item
+                if not fut.set_running_or_notify_cancel():
+                    continue
+                if self._sub is None:
+                    fut.set_exception(self._session.exception())
+                    continue
+                # zadanie bez checkpoint() to jedna pozycja dla strażnika
+                self._checkpoints = 0
+                self._last_item = t0 = time.perf_counter()
+                try:
+                    fut.set_result(fn(self._sub, *args, **kwargs))
+                except BaseException as e:
+                    fut.set_exception(e)
+                if self._watchdog is None:
+                    continue
+                if not self._checkpoints:
+                    self._watchdog_item(time.perf_counter() - t0)
+                reason = self._watchdog.check()
+                if reason and self._sub is not None:
+                    try:
+                        self._recycle(reason)
+                    except BaseException:
+                        pass        # wyjątek logowania w self._session
+        finally:
+            try:
+                if self._sub is not None:
+                    self._sub.Zakoncz()
+            except Exception:
+                pass
+            _tls.worker = None
+            pythoncom.CoUninitialize()
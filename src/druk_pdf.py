@@ -1,12 +1,25 @@
+import argparse
+import json
 import os
+import shutil
 import sys
 import time
 import platform
 import subprocess
 import threading
 import tkinter as tk
+from datetime import datetime
 from tkinter import ttk, filedialog, messagebox
 
+try:
+    from pypdf import PdfReader, PdfWriter  # opcjonalnie: łączenie PDF-ów w wsady
+except ImportError:
+    PdfReader = PdfWriter = None
+
+import metryki
+from cli import resolve_runs
+from scheduler import report_progress
+
 # ---- Platform printer backends -------------------------------------------------
 
 class WindowsPrinterBackend:
@@ -39,6 +52,15 @@ class WindowsPrinterBackend:
             pass
         return False
    
+    def printer_state(self, printer_name):
+        """(liczba zadań w kolejce, flagi statusu) wg spoolera."""
+        h = self.win32print.OpenPrinter(printer_name)
+        try:
+            info = self.win32print.GetPrinter(h, 2)
+            return int(info["cJobs"]), int(info["Status"])
+        finally:
+            self.win32print.ClosePrinter(h)
+
     def print_pdf(self, printer_name, pdf_path):
         # Use ShellExecute with PrintTo verb so the registered PDF handler does the rendering
         # Note: this call is asynchronous; add a small delay between jobs to avoid overloading the handler
@@ -57,6 +79,309 @@ class WindowsPrinterBackend:
         subprocess.Popen(cmd, shell=False)
 
 
+# ---- Drukowanie (wspólne dla okna i trybu bez okien) ---------------------------
+
+def iter_pdfs(root, recursive=False):
+    if recursive:
+        for dirpath, _, filenames in os.walk(root):
+            for f in sorted(filenames):
+                if f.lower().endswith('.pdf'):
+                    yield os.path.join(dirpath, f)
+    else:
+        for f in sorted(os.listdir(root)):
+            if f.lower().endswith('.pdf'):
+                yield os.path.join(root, f)
+
+
+# ---- Wsady: wiele małych PDF-ów w jednym zadaniu wydruku -----------------------
+
+BATCH_DIR = os.path.join("..", "cache", "wsady")
+BATCH_KEEP_DAYS = 7
+BATCH_MAP = "mapa.jsonl"   # wiersz na wsad: {"wsad", "strony", "bajty", "pliki"}
+
+
+def merge_batches(pdfs, out_dir, max_pages=50, max_mb=20.0, log=print):
+    """
+    Łączy kolejne PDF-y w wsady ograniczone liczbą stron i rozmiarem plików źródłowych.
+    Generator: w pamięci jest tylko bieżący wsad (pliki źródłowe czytane po jednym);
+    każdy zapisany wsad od razu trafia do mapy out_dir/mapa.jsonl - po błędzie
+    druku wsadu z mapy widać, których plików źródłowych dotyczył.
+    Plik, którego nie da się odczytać, idzie osobno (jak bez wsadów).
+    """
+    if PdfWriter is None:
+        raise RuntimeError("Łączenie PDF-ów wymaga pakietu pypdf (pip install pypdf).")
+    os.makedirs(out_dir, exist_ok=True)
+    max_bytes = max_mb * 2**20 if max_mb else None
+    writer, sources, pages, size, n = None, [], 0, 0, 0
+
+    with open(os.path.join(out_dir, BATCH_MAP), "a", encoding="utf-8") as mapping:
+        def record(path, files, pages_, bytes_):
+            mapping.write(json.dumps({"wsad": os.path.basename(path), "strony": pages_, "bajty": bytes_,
+                                      "pliki": files}, ensure_ascii=False) + "\n")
+            mapping.flush()
+            return path
+
+        def flush():
+            nonlocal writer, sources, pages, size, n
+            n += 1
+            path = os.path.join(out_dir, f"wsad_{n:04d}.pdf")
+            with open(path, "wb") as f:
+                writer.write(f)
+            out = record(path, sources, pages, size)
+            writer, sources, pages, size = None, [], 0, 0
+            return out
+
+        for pdf in pdfs:
+            nbytes = os.path.getsize(pdf)
+            try:
+                reader = PdfReader(pdf)
+                npages = len(reader.pages)
+            except Exception as e:
+                log(f"Nie można odczytać {os.path.basename(pdf)} ({e}) – drukuję osobno.\n")
+                if writer is not None:
+                    yield flush()
+                yield record(pdf, [pdf], None, nbytes)
+                continue
+            full = writer is not None and (
+                (max_pages and pages + npages > max_pages) or (max_bytes and size + nbytes > max_bytes))
+            if full:
+                yield flush()
+            if writer is None:
+                writer = PdfWriter()
+            for page in reader.pages:
+                writer.add_page(page)
+            sources.append(pdf)
+            pages += npages
+            size += nbytes
+        if writer is not None:
+            yield flush()
+
+
+def batch_dir(root=BATCH_DIR, keep_days=BATCH_KEEP_DAYS):
+    """Nowy folder wsadów przebiegu; przy okazji usuwa foldery starsze niż keep_days."""
+    if os.path.isdir(root) and keep_days:
+        limit = time.time() - keep_days * 86400
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            try:
+                if os.path.isdir(path) and os.path.getmtime(path) < limit:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                continue
+    return os.path.join(root, datetime.now().strftime("%Y-%m-%d_%H%M%S"))
+
+
+def batched(pdfs, max_pages, max_mb=20.0, log=print):
+    """
+    Wsady do druku albo pdfs bez zmian (max_pages = 0 - wsady wyłączone, brak pypdf).
+    Wsady to generator: każdy idzie do druku zaraz po połączeniu, kolejny łączy się
+    w czasie odstępu między zadaniami.
+    """
+    if not max_pages:
+        return pdfs
+    if PdfWriter is None:
+        log("Brak pakietu pypdf – drukuję pliki pojedynczo (pip install pypdf).\n")
+        return pdfs
+    out_dir = batch_dir()
+
+    def stream():
+        n = 0
+        for batch in merge_batches(pdfs, out_dir, max_pages, max_mb, log):
+            n += 1
+            yield batch
+        log(f"Połączono {len(pdfs)} PDF-ów w {n} zadań; mapa wsadów: "
+            f"{os.path.join(out_dir, BATCH_MAP)}\n")
+
+    return stream()
+
+
+# Flagi PRINTER_STATUS_* oznaczające drukarkę niezdolną do pracy
+PRINTER_STATUS_FAILED = (
+    0x00000002    # ERROR
+    | 0x00000008  # PAPER_JAM
+    | 0x00000010  # PAPER_OUT
+    | 0x00000080  # OFFLINE
+    | 0x00000400  # NOT_AVAILABLE
+    | 0x00040000  # NO_TONER
+    | 0x00100000  # USER_INTERVENTION
+    | 0x00400000  # DOOR_OPEN
+)
+MAX_PRINTER_FAILURES = 2   # kolejne błędy, po których drukarka wypada z puli
+MAX_FILE_ATTEMPTS = 2      # próby jednego pliku; potem plik uznany za wadliwy (nie drukarka)
+
+
+class PrinterPool:
+    """
+    Pula drukarek: każde zadanie trafia do drukarki, która najwcześniej będzie
+    wolna - wg odstępu 'delay' po ostatnim zadaniu i liczby zadań w kolejce spoolera.
+    Drukarka z błędem (status spoolera albo MAX_PRINTER_FAILURES nieudanych
+    wysłań z rzędu) wypada z puli; jej zadanie wraca do kolejki. Błędy pliku,
+    który nie wydrukował się nigdzie, są drukarkom odpuszczane (forgive).
+    """
+
+    def __init__(self, backend, printers, delay, log=print, clock=time.monotonic):
+        self.backend = backend
+        self.delay = delay
+        self.log = log
+        self.clock = clock
+        self.state = {name: {"free_at": 0.0, "failures": 0, "sent": 0, "active": True} for name in printers}
+
+    @property
+    def active(self):
+        return [n for n, s in self.state.items() if s["active"]]
+
+    def _queue(self, name):
+        """Zadania w kolejce spoolera; przy błędzie statusu drukarka wypada z puli."""
+        try:
+            jobs, status = self.backend.printer_state(name)
+        except AttributeError:
+            return 0            # backend bez podglądu spoolera
+        except Exception as e:
+            self.fail(name, f"brak odpowiedzi spoolera: {e}")
+            return None
+        if status & PRINTER_STATUS_FAILED:
+            self.disable(name, f"status drukarki 0x{status:08x}")
+            return None
+        return jobs
+
+    def pick(self, avoid=()):
+        """
+        (drukarka, moment startu) z najwcześniejszym szacowanym startem; None = pula pusta.
+        Drukarki z 'avoid' (np. te, na których plik już się nie wydrukował) tylko, gdy nie ma innych.
+        """
+        now = self.clock()
+        best = None
+        names = [n for n in self.active if n not in avoid] or self.active
+        for name in names:
+            jobs = self._queue(name)
+            if jobs is None:
+                continue
+            s = self.state[name]
+            # ostatnie wysłane zadanie jest już w free_at; dalsze z kolejki spoolera wydłużają oczekiwanie
+            start = max(s["free_at"], now + max(0, jobs - 1) * self.delay)
+            key = (start, jobs, s["sent"])
+            if best is None or key < best[0]:
+                best = (key, name)
+        return (best[1], best[0][0]) if best else None
+
+    def sent(self, name):
+        s = self.state[name]
+        s["sent"] += 1
+        s["failures"] = 0
+        s["free_at"] = self.clock() + self.delay
+
+    def fail(self, name, reason):
+        s = self.state[name]
+        s["failures"] += 1
+        if s["failures"] >= MAX_PRINTER_FAILURES:
+            self.disable(name, reason)
+
+    def forgive(self, name):
+        """Błąd okazał się winą pliku - nie liczy się drukarce (jeśli jeszcze jest w puli)."""
+        s = self.state[name]
+        s["failures"] = max(0, s["failures"] - 1)
+
+    def disable(self, name, reason):
+        if self.state[name]["active"]:
+            self.state[name]["active"] = False
+            self.log(f"Drukarka {name} wyłączona z puli: {reason}\n")
+
+
+def _total(pdfs):
+    """Liczba plików albo 0, gdy pdfs to generator (wsady łączone w trakcie druku)."""
+    return len(pdfs) if hasattr(pdfs, "__len__") else 0
+
+
+def print_files_pool(backend, printers, pdfs, delay, log=print, sleep=time.sleep, clock=time.monotonic):
+    """
+    Rozdziela PDF-y (lista albo generator wsadów) na kilka drukarek (PrinterPool);
+    zwraca {drukarka: liczba zadań}. Plik nieudany MAX_FILE_ATTEMPTS razy (na różnych
+    drukarkach, jeśli są) trafia na listę wadliwych w logu, a jego błędy nie obciążają drukarek.
+    """
+    pool = PrinterPool(backend, printers, delay, log, clock)
+    log(f"Pula drukarek: {', '.join(printers)}\n---\n")
+    total = _total(pdfs)
+    source = iter(pdfs)
+    pending = []        # pliki do ponownej próby
+    attempts = {}       # plik -> drukarki, na których się nie wydrukował
+    bad = []
+    done = 0
+    while True:
+        if not pending:
+            pdf = next(source, None)
+            if pdf is None:
+                break
+            pending.append(pdf)
+        picked = pool.pick(avoid=attempts.get(pending[-1], ()))
+        if picked is None:
+            left = f"{total - done - len(bad)} plików" if total else "pozostałych plików"
+            log(f"\nBrak sprawnych drukarek – nie wysłano {left}.\n")
+            break
+        name, start = picked
+        wait = start - clock()
+        if wait > 0:
+            sleep(wait)
+        pdf = pending.pop()
+        t0 = time.perf_counter()
+        try:
+            backend.print_with_adobe(name, pdf)
+        except Exception as e:
+            metryki.current().item(time.perf_counter() - t0, ok=False)
+            log(f"BŁĄD przy {os.path.basename(pdf)} na {name}: {e}\n")
+            failed_on = attempts.setdefault(pdf, [])
+            failed_on.append(name)
+            if len(failed_on) >= MAX_FILE_ATTEMPTS:
+                # nie wydrukował się nigdzie - wina pliku: drukarki bez kary, plik na listę wadliwych
+                for p in failed_on[:-1]:
+                    pool.forgive(p)
+                bad.append(pdf)
+                metryki.current().count("pliki_wadliwe")
+                log(f"Pomijam {os.path.basename(pdf)} – nie wydrukował się {len(failed_on)} razy.\n")
+                report_progress(done + len(bad), total)
+                continue
+            pool.fail(name, str(e))
+            pending.append(pdf)     # spróbuje inna (albo ta sama) drukarka
+            continue
+        metryki.current().item(time.perf_counter() - t0)
+        pool.sent(name)
+        done += 1
+        log(f"[{done}/{total or '?'}] {name}: {os.path.basename(pdf)}\n")
+        report_progress(done + len(bad), total)
+    if bad:
+        log(f"\nNieudane pliki ({len(bad)}):\n" + "".join(f"  {p}\n" for p in bad))
+    counts = {n: s["sent"] for n, s in pool.state.items()}
+    log("\nGotowe. " + ", ".join(f"{n}: {c}" for n, c in counts.items()) + "\n")
+    return counts
+
+
+def print_files(backend, printer_name, pdfs, delay, log=print):
+    """
+    Wysyła kolejne PDF-y (lista albo generator wsadów) na drukarkę z odstępem 'delay'
+    sekund; czas łączenia kolejnego wsadu wlicza się w odstęp.
+    """
+    log(f"Drukarka: {printer_name}\n---\n")
+    total = _total(pdfs)
+    sent_at = None
+    for i, pdf in enumerate(pdfs, 1):
+        if sent_at is not None:
+            wait = delay - (time.monotonic() - sent_at)
+            if wait > 0:
+                log(f" ... czekam {wait:.0f} sekund ...\n")
+                time.sleep(wait)
+        sent_at = time.monotonic()
+        t0 = time.perf_counter()
+        try:
+            # backend.print_pdf(printer_name, pdf) # Używając printto - nie działa za każdym razem
+            backend.print_with_adobe(printer_name, pdf)
+            metryki.current().item(time.perf_counter() - t0)
+            log(f"[{i}/{total or '?'}] Wysłano: {os.path.basename(pdf)}\n")
+        except Exception as e:
+            metryki.current().item(time.perf_counter() - t0, ok=False)
+            log(f"BŁĄD przy {os.path.basename(pdf)}: {e}\n")
+        report_progress(i, total)
+    log("\nGotowe.\n")
+
+
 # ---- UI -----------------------------------------------------------------------
 
 class App(tk.Tk):
@@ -79,6 +404,8 @@ class App(tk.Tk):
         self.printer = tk.StringVar()
         self.recursive = tk.BooleanVar(value=False)
         self.delay = tk.IntVar(value=10)  # spacing between jobs
+        self.pool_mode = tk.BooleanVar(value=False)
+        self.batch_pages = tk.IntVar(value=0)  # 0 = każdy plik osobnym zadaniem
 
         self._build_ui()
         self._load_printers()
@@ -100,6 +427,11 @@ class App(tk.Tk):
         self.printer_combo.grid(row=0, column=1, sticky="we", padx=8)
         ttk.Button(frm2, text="Odśwież", command=self._load_printers).grid(row=0, column=2, sticky="e")
         ttk.Button(frm2, text="Właściwości…", command=self.open_printer_properties).grid(row=0, column=3, sticky="e", padx=(8,0))
+        ttk.Checkbutton(frm2, text="Pula drukarek (zaznacz kilka):", variable=self.pool_mode,
+                        command=self._toggle_pool).grid(row=1, column=0, sticky="nw", pady=(6, 0))
+        self.pool_list = tk.Listbox(frm2, selectmode=tk.MULTIPLE, height=4, exportselection=False)
+        self.pool_list.grid(row=1, column=1, sticky="we", padx=8, pady=(6, 0))
+        self.pool_list.configure(state="disabled")
         frm2.columnconfigure(1, weight=1)
 
         frm4 = ttk.Frame(self)
@@ -107,6 +439,8 @@ class App(tk.Tk):
         ttk.Checkbutton(frm4, text="Skanuj podfoldery (rekurencyjnie)", variable=self.recursive).pack(side=tk.LEFT)
         ttk.Label(frm4, text="Odstęp między zadaniami [s]:").pack(side=tk.LEFT, padx=(16,4))
         ttk.Spinbox(frm4, from_=0, to=10000, textvariable=self.delay, width=7).pack(side=tk.LEFT)
+        ttk.Label(frm4, text="Łącz w zadania do [stron] (0 = nie):").pack(side=tk.LEFT, padx=(16,4))
+        ttk.Spinbox(frm4, from_=0, to=1000, textvariable=self.batch_pages, width=5).pack(side=tk.LEFT)
 
         frm5 = ttk.Frame(self)
         frm5.pack(fill=tk.BOTH, expand=True, **pad)
@@ -131,9 +465,24 @@ class App(tk.Tk):
             messagebox.showerror("Błąd drukarek", str(e))
             names = []
         self.printer_combo["values"] = names
+        self.pool_list.configure(state="normal")
+        self.pool_list.delete(0, tk.END)
+        for n in names:
+            self.pool_list.insert(tk.END, n)
+        self._toggle_pool()
         if names and not self.printer.get():
             self.printer.set(names[0])
 
+    def _toggle_pool(self):
+        pool = self.pool_mode.get()
+        self.pool_list.configure(state="normal" if pool else "disabled")
+        self.printer_combo.configure(state="disabled" if pool else "readonly")
+
+    def _selected_printers(self):
+        if self.pool_mode.get():
+            return [self.pool_list.get(i) for i in self.pool_list.curselection()]
+        return [self.printer.get()] if self.printer.get() else []
+
     def open_printer_properties(self):
         name = self.printer.get()
         if not name:
@@ -144,27 +493,16 @@ class App(tk.Tk):
         except Exception as e:
             messagebox.showerror("Właściwości drukarki", f"Nie udało się otworzyć właściwości: {e}")
 
-    def _iter_pdfs(self, root, recursive=False):
-        if recursive:
-            for dirpath, _, filenames in os.walk(root):
-                for f in sorted(filenames):
-                    if f.lower().endswith('.pdf'):
-                        yield os.path.join(dirpath, f)
-        else:
-            for f in sorted(os.listdir(root)):
-                if f.lower().endswith('.pdf'):
-                    yield os.path.join(root, f)
-
     def start_print(self):
         folder = self.folder.get().strip()
         if not folder or not os.path.isdir(folder):
             messagebox.showwarning("Brak folderu", "Wybierz poprawny folder z PDF-ami.")
             return
-        if not self.printer.get():
+        if not self._selected_printers():
             messagebox.showwarning("Brak drukarki", "Wybierz drukarkę.")
             return
 
-        pdfs = list(self._iter_pdfs(folder, self.recursive.get()))
+        pdfs = list(iter_pdfs(folder, self.recursive.get()))
         if not pdfs:
             messagebox.showinfo("Brak plików", "Nie znaleziono żadnych PDF-ów w wybranym folderze.")
             return
@@ -173,28 +511,18 @@ class App(tk.Tk):
         self.log.delete("1.0", tk.END)
         self.log.insert(tk.END, f"Znalezione PDF-y: {len(pdfs)}\n")
 
-        t = threading.Thread(target=self._print_worker, args=(pdfs,))
+        t = threading.Thread(target=self._print_worker, args=(pdfs, self._selected_printers()))
         t.daemon = True
         t.start()
 
-    def _print_worker(self, pdfs):
-        printer_name = self.printer.get()
+    def _print_worker(self, pdfs, printers):
         delay = max(0, int(self.delay.get()))
-
-        self._log(f"Drukarka: {printer_name}\n---\n")
-
         try:
-            for i, pdf in enumerate(pdfs, 1):
-                try:
-                    # self.backend.print_pdf(printer_name, pdf) # Używając printto - nie działa za każdym razem
-                    self.backend.print_with_adobe(printer_name, pdf)
-                    self._log(f"[{i}/{len(pdfs)}] Wysłano: {os.path.basename(pdf)}\n")
-                except Exception as e:
-                    self._log(f"BŁĄD przy {os.path.basename(pdf)}: {e}\n")
-                if i < len(pdfs):
-                    self._log(f" ... czekam {delay} sekund ...\n")
-                    time.sleep(delay)
-            self._log("\nGotowe.\n")
+            pdfs = batched(pdfs, max(0, int(self.batch_pages.get())), log=self._log)
+            if len(printers) > 1:
+                print_files_pool(self.backend, printers, pdfs, delay, log=self._log)
+            else:
+                print_files(self.backend, printers[0], pdfs, delay, log=self._log)
         finally:
             self.start_btn["state"] = "normal"
 
@@ -203,6 +531,63 @@ class App(tk.Tk):
         self.log.see(tk.END)
 
 
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Seryjne drukowanie PDF-ów z folderu.")
+    ap.add_argument("--headless", action="store_true", help="Drukuj bez okna (wymaga --folder i --printer).")
+    ap.add_argument("--manifest", help="Plik JSON/YAML z parametrami; klucz 'runs' = lista folderów.")
+    ap.add_argument("--folder", help="Folder z PDF-ami.")
+    ap.add_argument("--printer", help="Nazwa drukarki.")
+    ap.add_argument("--pula", action="append", default=[],
+                    help="Drukarka z puli (podaj kilka razy) - zadania trafiają do najwcześniej wolnej.")
+    ap.add_argument("--rekurencyjnie", action="store_true", help="Skanuj podfoldery.")
+    ap.add_argument("--odstep", type=int, default=10, help="Odstęp między zadaniami [s].")
+    ap.add_argument("--wsad-stron", type=int, default=0,
+                    help="Łącz kolejne PDF-y w zadania do N stron (0 = każdy plik osobno; wymaga pypdf).")
+    ap.add_argument("--wsad-mb", type=float, default=20.0, help="Limit rozmiaru wsadu [MB].")
+    return ap.parse_args(argv)
+
+
+def run_headless(args):
+    backend = WindowsPrinterBackend()
+    for run in resolve_runs(args):
+        folder, printer = run.get("folder"), run.get("printer")
+        pool = run.get("pula") or []
+        pool = [pool] if isinstance(pool, str) else [p for p in pool if p]
+        if not folder or not os.path.isdir(folder):
+            print(f"Nie znaleziono folderu: {folder}")
+            continue
+        if not printer and not pool:
+            print("Podaj drukarkę: --printer NAZWA albo --pula NAZWA (kilka razy)")
+            continue
+        pdfs = list(iter_pdfs(folder, run.get("rekurencyjnie")))
+        print(f"Znalezione PDF-y: {len(pdfs)} w {folder}")
+        delay = max(0, int(run.get("odstep") or 0))
+        pdfs = batched(pdfs, int(run.get("wsad_stron") or 0), float(run.get("wsad_mb") or 0),
+                       log=lambda msg: print(msg, end=""))
+        if len(pool) > 1:
+            print_files_pool(backend, pool, pdfs, delay, log=lambda msg: print(msg, end=""))
+        else:
+            print_files(backend, pool[0] if pool else printer, pdfs, delay,
+                        log=lambda msg: print(msg, end=""))
+
+
+LOG_PREFIX = "PDF_"
+
 if __name__ == "__main__":
-    app = App()
-    app.mainloop()
+    args = parse_args()
+    metryki.start("druk_pdf", LOG_PREFIX)
+    try:
+        if args.headless or args.manifest:
+            run_headless(args)
+        else:
+            app = App()
+            if args.folder:
+                app.folder.set(args.folder)
+            if args.printer:
+                app.printer.set(args.printer)
+            app.recursive.set(args.rekurencyjnie)
+            app.delay.set(args.odstep)
+            app.batch_pages.set(args.wsad_stron)
+            app.mainloop()
+    finally:
+        metryki.finish()
@@ -11,18 +11,30 @@ import csv
 import logging
 import os
 import tempfile
+import threading
+import time
+from concurrent.futures import Future, wait
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
 # ===== Third-party =====
-import pythoncom
 import win32com.client as win32
 import win32print
 from pywintypes import com_error
 
 import logowanie
-from gui import choose_wzor_wydruku, show_completion_dialog, choose_output_dir
-from utils import get_subiekt, run_sql, select_docs_prev_month, safe_filename
+import metryki
+import replika
+import slowniki
+from cli import add_common_args, doc_filter, resolve_runs
+from com_worker import ComWorker, add_recycle_listener
+from gui import ProgressWindow, choose_wzor_wydruku, show_completion_dialog, choose_output_dir
+import paczki_pdf
+from output_plan import collisions, plan_output_paths, update_manifest, write_manifest
+from retry import NO_RETRY, ItemRunner
+from scheduler import cancel_requested, report_progress
+from sql_pool import ReadPath
+from utils import run_sql_batch, select_docs_by_filter, select_docs_prev_month
 
 logger = logging.getLogger(__name__)
 
@@ -39,6 +51,8 @@ STORAGE_PATH: Optional[str] = None
 
 # Nazwa pliku logu: prefiks + data
 LOG_PREFIX = "FS_"
+DEAD_LETTER_DIR = Path(logowanie.LOG_DIR)   # listy nieudanych dokumentów obok logów
+ABORT_WAIT_S = 120                          # po przerwaniu: czekanie na dokument w trakcie eksportu
 
 def _default_storage_path() -> str:
     base = os.environ.get("LOCALAPPDATA") or os.environ.get("APPDATA") or os.getcwd()
@@ -97,173 +111,495 @@ def set_saved_wzor(kh_id: int, wzw_id: int, path: Optional[str] = None) -> None:
     m[int(kh_id)] = int(wzw_id)
     save_mapping_csv(m, path)
 
+# ============================================================================ #
+#                 CSV: profil wydruku (drukarka, kopie) per kontrahent
+# ============================================================================ #
+
+PROFILES_FILE = "drukarki_kontrahentow.csv"   # obok CSV z wzorcami
+
+
+def profiles_path(storage_path: Optional[str] = None) -> Path:
+    return Path(resolve_storage_path(storage_path)).with_name(PROFILES_FILE)
+
+def load_print_profiles(storage_path: Optional[str] = None) -> dict[int, dict]:
+    """
+    Profile wydruku z CSV (kh_id;drukarka;kopie albo z przecinkami): kh_id -> {"drukarka", "kopie"}.
+    Puste pole = None - obowiązuje wartość przebiegu (--printer, --kopie).
+    """
+    p = profiles_path(storage_path)
+    if not p.exists():
+        return {}
+    profiles: dict[int, dict] = {}
+    with p.open("r", encoding="utf-8-sig", newline="") as f:
+        sample = f.read(1024)
+        f.seek(0)
+        r = csv.reader(f, delimiter=";" if ";" in sample else ",")
+        for row in r:
+            if not row or row[0] == "kh_id":
+                continue
+            try:
+                profiles[int(row[0])] = {
+                    "drukarka": (row[1].strip() if len(row) > 1 else "") or None,
+                    "kopie": int(row[2]) if len(row) > 2 and row[2].strip() else None,
+                }
+            except ValueError:
+                continue
+    return profiles
+
+def apply_print_profiles(items: list[dict], profiles: dict[int, dict], printer_name: Optional[str],
+                         kopie: int = 1) -> None:
+    """Drukarka i kopie każdego dokumentu: z profilu kontrahenta, a pola puste - z przebiegu."""
+    for it in items:
+        prof = profiles.get(it["kh_id"]) or {}
+        it["drukarka"] = prof.get("drukarka") or printer_name
+        it["kopie"] = prof.get("kopie") or kopie
+
+def _wzorce_dicts(sl: slowniki.Slownik) -> list[dict]:
+    return [{"wzw_Id": w.id, "wzw_Nazwa": w.nazwa} for w in sl]
+
+def _kontrahenci_opisy(sl: slowniki.Slownik) -> dict[int, str]:
+    return {k.id: k.opis for k in sl}
+
 def fetch_wzorce_fs(spAplikacja) -> list[dict]:
-    return run_sql(
-        spAplikacja,
-        """
-        SELECT wz.wzw_Id, wz.wzw_Nazwa
-          FROM wy_Wzorzec wz
-          JOIN wy_Typ wt ON wz.wzw_Typ = wt.wtp_Id
-         WHERE wt.wtp_Nazwa = 'Faktura sprzedaży'
-         ORDER BY wz.wzw_Nazwa
-        """,
-    )
+    return _wzorce_dicts(slowniki.load(spAplikacja, ["wzorce_fs"])["wzorce_fs"])
 
 def fetch_kontrahenci_basic(spAplikacja) -> dict[int, str]:
-    rows = run_sql(
-        spAplikacja,
-        """
-        SELECT k.kh_Id,
-               a.adr_Nazwa       AS Nazwa,
-               a.adr_Adres       AS Adres,
-               a.adr_Miejscowosc AS Miejscowosc
-          FROM kh__Kontrahent k
-          JOIN adr__Ewid a ON k.kh_Id = a.adr_IdObiektu
-         WHERE a.adr_TypAdresu = 1
-        """,
-    )
-    return {
-        int(r["kh_Id"]): f"{r['Nazwa']}, {r['Adres']}, {r['Miejscowosc']}"
-        for r in rows
-    }
+    return _kontrahenci_opisy(replika.load(spAplikacja, ["kontrahenci"])["kontrahenci"])
+
+def fetch_reference_data(spAplikacja) -> tuple[list[dict], slowniki.Slownik]:
+    """Wzorce FS i kontrahenci jednym zapytaniem wsadowym."""
+    with metryki.current().stage("slowniki"):
+        sl = replika.load(spAplikacja, ["wzorce_fs", "kontrahenci"])
+    return _wzorce_dicts(sl["wzorce_fs"]), sl["kontrahenci"]
 
 # ============================================================================ #
 #                              DRUKOWANIE / SUBIEKT                            
 # ============================================================================ #
 
+_printers: Optional[frozenset[str]] = None
+_printers_lock = threading.Lock()
+
+def available_printers(refresh: bool = False) -> frozenset[str]:
+    """Drukarki systemu - EnumPrinters raz na proces (refresh=True wymusza odczyt)."""
+    global _printers
+    with _printers_lock:
+        if _printers is None or refresh:
+            _printers = frozenset(
+                p[2] for p in win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL | win32print.PRINTER_ENUM_CONNECTIONS)
+            )
+        return _printers
+
 def ensure_printer_exists(name: str) -> None:
-    available = {
-        p[2] for p in win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL | win32print.PRINTER_ENUM_CONNECTIONS)
-    }
-    if name not in available:
+    # drukarka dodana w trakcie przebiegu: jeden ponowny odczyt listy
+    if name not in available_printers() and name not in available_printers(refresh=True):
         raise RuntimeError(f"Nie znaleziono drukarki: {name}")
 
-def drukuj_wg_ustawien(
-    su_dokument,
-    wzw_id: int,
-    printer_name: Optional[str] = DEFAULT_PRINTER,
-    ilosc_kopii: int = 1,
-    strona_od: Optional[int] = None,
-    strona_do: Optional[int] = None,
-) -> None:
-    """Wywołuje DrukujWgUstawien na obiekcie dokumentu."""
-    ust = win32.Dispatch("InsERT.UstawieniaWydruku")
-    ust.WzorzecWydruku = int(wzw_id)
+# Obiekty UstawieniaWydruku per (wzorzec, drukarka, kopie, strony); COM - osobno w każdym wątku
+_settings = threading.local()
+add_recycle_listener(_settings.__dict__.clear)    # nowa sesja Sfery - nowe obiekty ustawień
+
+def print_settings(wzw_id: int, printer_name: Optional[str] = DEFAULT_PRINTER, ilosc_kopii: int = 1,
+                   strona_od: Optional[int] = None, strona_do: Optional[int] = None):
+    """UstawieniaWydruku dla danej kombinacji - tworzone raz i używane dla kolejnych dokumentów."""
+    cache = _settings.__dict__.setdefault("cache", {})
+    key = (int(wzw_id), printer_name, int(ilosc_kopii or 1), strona_od, strona_do)
+    ust = cache.get(key)
+    if ust is not None:
+        return ust
 
     if printer_name:
         ensure_printer_exists(printer_name)
+    ust = win32.Dispatch("InsERT.UstawieniaWydruku")
+    ust.WzorzecWydruku = int(wzw_id)
+    if printer_name:
         ust.DrukarkaDomyslSysOp = False
         ust.Drukarka = printer_name
     else:
         ust.DrukarkaDomyslSysOp = True
 
-    ust.IloscKopii = int(ilosc_kopii) if ilosc_kopii else 1
+    ust.IloscKopii = key[2]
     if strona_od is not None:
         ust.StronaOd = int(strona_od)
     if strona_do is not None:
         ust.StronaDo = int(strona_do)
+    cache[key] = ust
+    return ust
 
-    su_dokument.DrukujWgUstawien(ust)
+def drukuj_wg_ustawien(
+    su_dokument,
+    wzw_id: int,
+    printer_name: Optional[str] = DEFAULT_PRINTER,
+    ilosc_kopii: int = 1,
+    strona_od: Optional[int] = None,
+    strona_do: Optional[int] = None,
+) -> None:
+    """Wywołuje DrukujWgUstawien na obiekcie dokumentu (ustawienia z print_settings)."""
+    su_dokument.DrukujWgUstawien(print_settings(wzw_id, printer_name, ilosc_kopii, strona_od, strona_do))
 
 # ============================================================================ #
 #                                     MAIN                                     
 # ============================================================================ #
 
-def main():
-    # (Opcjonalnie) argumenty CLI
-    ap = argparse.ArgumentParser()
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Eksport/wydruk FS wg wzorca przypisanego do kontrahenta.")
     ap.add_argument("--storage", help="Ścieżka do CSV z wyborem wzorców (domyślna lokalna/APPDATA).")
-    ap.add_argument("--printer", help="Nazwa drukarki (None = domyślna systemowa).")
-    args = ap.parse_args()
-
-    storage_path = args.storage if args.storage else STORAGE_PATH
-    # printer_name = args.printer if args.printer else DEFAULT_PRINTER
+    ap.add_argument("--printer", help="Nazwa drukarki dla --tryb druk (brak = DEFAULT_PRINTER).")
+    ap.add_argument("--kopie", type=int, default=1,
+                    help="Liczba kopii dla --tryb druk (profil kontrahenta ma pierwszeństwo).")
+    ap.add_argument("--tryb", choices=("pdf", "druk"), default="pdf", help="Eksport do PDF albo wydruk.")
+    ap.add_argument("--out-dir", dest="out_dir", help="Folder zapisu PDF (domyślnie ..\\wydruki).")
+    ap.add_argument("--uklad", default="",
+                    help="Podkatalogi w folderze zapisu, np. '{year}/{month}/{contractor}' "
+                         "(pola: year, month, day, contractor, kh_id).")
+    ap.add_argument("--kolejnosc", choices=EXPORT_ORDERS, default="wzorzec",
+                    help="Kolejność eksportu: wzorzec (grupami wg wzorca), wzorzec_kontrahent, "
+                         "wybor (kolejność wyboru dokumentów, eksport już w trakcie wyboru wzorców).")
+    ap.add_argument("--paczki", action="store_true",
+                    help="Po eksporcie PDF: plik zbiorczy per kontrahent z zakładkami (podkatalog 'paczki', wymaga pypdf).")
+    ap.add_argument("--wzorzec", type=int,
+                    help="ID wzorca dla kontrahentów bez zapamiętanego wyboru (tryb bez okien).")
+    add_common_args(ap)
+    return ap.parse_args(argv)
+
+
+def choose_wzorce(kh_ids: list[int], wzorce: list[dict], kontrahenci: slowniki.Slownik,
+                  run: dict, storage_path: Optional[str],
+                  on_chosen: Callable[[int, Optional[int]], None]) -> None:
+    """
+    Wzorzec per kontrahent: okno wyboru albo (bez okien) zapamiętany / --wzorzec.
+    on_chosen(kh_id, wzw_id) wołane zaraz po każdym wyborze - eksport rusza w tle.
+    """
+    if run["headless"]:
+        saved = load_mapping_csv(storage_path)
+        for kh_id in kh_ids:
+            on_chosen(kh_id, saved.get(kh_id) or run.get("wzorzec"))
+        return
+
+    saved = load_mapping_csv(storage_path)
+    for i, kh_id in enumerate(kh_ids, start=1):
+        if cancel_requested():
+            on_chosen(kh_id, None)   # dokumenty i tak trafią na listę nieprzetworzonych
+            continue
+
+        def _remember(wzw_id: int, _kh=kh_id):
+            set_saved_wzor(_kh, wzw_id, storage_path)
+
+        k = kontrahenci.get(kh_id)
+        nazwa = k.opis if k else f"KH {kh_id}"
+        logger.info("Wybór wzorca dla %s (ID: %s) (%d/%d)", nazwa, kh_id, i, len(kh_ids))
+        wyb = choose_wzor_wydruku(
+            nazwa_kontrahenta=nazwa,
+            wzorce=wzorce,
+            num=i,
+            total=len(kh_ids),
+            kh_id=kh_id,
+            preselect_wzw_id=saved.get(kh_id),
+            remember_default=True,
+            on_remember=_remember,
+        )
+        logger.info("Wybrano: %s", wyb["wzw_Nazwa"] if wyb else "Anulowano")
+        on_chosen(kh_id, int(wyb["wzw_Id"]) if wyb else None)
+
+
+def read_selection(sub, run: dict) -> list[dict]:
+    """(wątek COM) Wybór dokumentów; zwraca opisy: obiekt dokumentu, id, numer, data, kontrahent."""
+    if run["headless"]:
+        docs = select_docs_by_filter(sub, typ=2, filtr=doc_filter(run))
+    else:
+        docs = select_docs_prev_month(sub.Dokumenty, typ=2) # 2 = FS
+    return [
+        {"doc": d, "sub": sub, "id": int(d.Identyfikator), "numer": str(d.NumerPelny),
+         "data": d.DataWystawienia, "kh_id": int(d.KontrahentId)}
+        for d in docs
+    ]
 
-    default_dir = (Path.cwd().parent / "wydruki")  # ..\wydruki
-    default_dir.mkdir(parents=True, exist_ok=True)
 
-    pythoncom.CoInitialize()
-    sub = None
-    try:
-        sub = get_subiekt()
+def document(sub, item: dict):
+    """(wątek COM) Obiekt dokumentu z bieżącej sesji - po odnowieniu sesji (strażnik) wczytany ponownie po id."""
+    if item.get("sub") is not sub:
+        item["doc"] = sub.Dokumenty.Wczytaj(item["id"])
+        item["sub"] = sub
+    return item["doc"]
 
-        # dane referencyjne
-        wzorce = fetch_wzorce_fs(sub)
-        wz_by_id = {int(w["wzw_Id"]): str(w["wzw_Nazwa"]) for w in wzorce}
-        kontrahenci = fetch_kontrahenci_basic(sub)
 
-        # wybór dokumentów
-        docs = select_docs_prev_month(sub.Dokumenty, typ=2) # 2 = FS
+# ============================================================================ #
+#                      KOLEJNOŚĆ EKSPORTU I CZASY RENDEROWANIA
+# ============================================================================ #
 
-        # zbuduj listę unikalnych kontrahentów
-        kh_ids: list[int] = []
-        for d in docs:
-            if d.KontrahentId not in kh_ids:
-                kh_ids.append(int(d.KontrahentId))
-
-        # wybór / preselekcja wzorców per kontrahent
-        wz_kontr: dict[int, Optional[int]] = {}
-        for i, kh_id in enumerate(kh_ids, start=1):
-            def _remember(wzw_id: int, _kh=kh_id):
-                set_saved_wzor(_kh, wzw_id, storage_path)
-
-            nazwa = kontrahenci.get(kh_id, f"KH {kh_id}")
-            logger.info("Wybór wzorca dla %s (ID: %s) (%d/%d)", nazwa, kh_id, i, len(kh_ids))
-            pre = get_saved_wzor(kh_id, storage_path)
-            wyb = choose_wzor_wydruku(
-                nazwa_kontrahenta=nazwa,
-                wzorce=wzorce,
-                num=i,
-                total=len(kh_ids),
-                kh_id=kh_id,
-                preselect_wzw_id=pre,
-                remember_default=True,
-                on_remember=_remember,
-            )
-            logger.info("Wybrano: %s", wyb["wzw_Nazwa"] if wyb else "Anulowano")
-            wz_kontr[kh_id] = int(wyb["wzw_Id"]) if wyb else None
-
-        # opóźnienie między drukami
-        # delay = ask_delay_seconds(default=5) or 0
-
-        # drukowanie/export
-        if len(docs) == 0:
-            logger.info("Brak dokumentów do eksportu.")
-            return
-        out_dir = choose_output_dir(default_dir)
-        for i, d in enumerate(docs, start=1):
-            wzw_id = wz_kontr.get(int(d.KontrahentId))
-            if not wzw_id:
-                logger.warning("Pomijam %s – brak wybranego wzorca.", getattr(d, "NumerPelny", "<bez numeru>"))
-                continue
-            wz_name = wz_by_id.get(wzw_id, f"wzorzec {wzw_id}")
-            fname = safe_filename(str(d.NumerPelny))
-            fullpath = str(out_dir / fname)
-            logger.info("Exportuję (%d/%d) %s wzorem %s do pliku %s", i, len(docs), d.NumerPelny, wz_name, fullpath)
-            d.DrukujDoPlikuWgWzorca(wzw_id, fullpath, 0)  # 0 = PDF
-            # drukuj_wg_ustawien(d, wzw_id=wzw_id, printer_name=printer_name, ilosc_kopii=1)
+# Pierwszy wydruk nowym wzorcem jest wyraźnie wolniejszy od kolejnych - grupowanie
+# po wzorcu ogranicza przełączenia. Manifest zachowuje kolejność wyboru.
+EXPORT_ORDERS = ("wzorzec", "wzorzec_kontrahent", "wybor")
+
+
+def export_order(chosen: list[tuple[dict, int]], order: str) -> list[tuple[dict, int]]:
+    """(dokument, wzw_id) w kolejności eksportu; sortowanie stabilne - w grupie zostaje kolejność wyboru."""
+    if order == "wzorzec":
+        return sorted(chosen, key=lambda c: c[1] or 0)
+    if order == "wzorzec_kontrahent":
+        return sorted(chosen, key=lambda c: (c[1] or 0, c[0]["kh_id"]))
+    return list(chosen)
+
+
+def template_switches(wzw_ids: list[int]) -> int:
+    """Ile razy renderowanie zaczyna się nowym wzorcem (pierwszy dokument też się liczy)."""
+    return sum(1 for n, w in enumerate(wzw_ids) if n == 0 or w != wzw_ids[n - 1])
+
+
+def render_timing(exported: list[dict], selection: list[int]) -> Optional[dict]:
+    """
+    Porównanie czasów: pierwszy render po zmianie wzorca ("zimny") vs kolejne ("ciepłe")
+    dla dokumentów w kolejności eksportu (item["czas_renderu"], item["wzw_id"]) oraz
+    szacowany zysk względem kolejności wyboru (lista wzw_id 'selection').
+    """
+    cold, warm = [], []
+    prev = None
+    for it in exported:
+        t = it.get("czas_renderu")
+        if t is not None:
+            (cold if it["wzw_id"] != prev else warm).append(t)
+        prev = it["wzw_id"]
+    if not cold:
+        return None
+    cold_avg = sum(cold) / len(cold)
+    warm_avg = sum(warm) / len(warm) if warm else cold_avg
+    actual = template_switches([it["wzw_id"] for it in exported])
+    before = template_switches(selection)
+    return {"zmiany": actual, "zmiany_wybor": before, "zimny_s": cold_avg, "cieply_s": warm_avg,
+            "zysk_s": max(0, before - actual) * max(0.0, cold_avg - warm_avg)}
+
+
+def export_doc(sub, item: dict, wzw_id: int, wz_name: str, run: dict,
+               printer_name: Optional[str], pos: int, total: int) -> None:
+    """(wątek COM) Eksport/wydruk jednego dokumentu; w trybie druk drukarka i kopie z item."""
+    d = document(sub, item)
+    t0 = time.perf_counter()
+    if run["dry_run"]:
+        logger.info("DRY RUN (%d/%d) %s wzorem %s", pos, total, item["numer"], wz_name)
+    elif run["tryb"] == "druk":
+        printer_name = item.get("drukarka") or printer_name
+        logger.info("Drukuję (%d/%d) %s wzorem %s na %s (kopie: %d)", pos, total, item["numer"], wz_name,
+                    printer_name or "drukarce domyślnej", item.get("kopie") or 1)
+        drukuj_wg_ustawien(d, wzw_id=wzw_id, printer_name=printer_name, ilosc_kopii=item.get("kopie") or 1)
+    else:
+        fullpath = str(item["path"])
+        logger.info("Exportuję (%d/%d) %s wzorem %s do pliku %s", pos, total, item["numer"], wz_name, fullpath)
+        d.DrukujDoPlikuWgWzorca(wzw_id, fullpath, 0)  # 0 = PDF
+    if not run["dry_run"]:
+        item["czas_renderu"] = time.perf_counter() - t0
+    report_progress(pos, total)
+
+
+def export_doc_guarded(sub, runner: ItemRunner, item: dict, *args) -> bool:
+    """(wątek COM) export_doc z ponowieniami; False = dokument na liście nieudanych."""
+    if cancel_requested():
+        runner.skip(item, "anulowano przez użytkownika")
+        return False
+    return runner.run(item, export_doc, sub, item, *args)
+
+
+def exported(f: Future) -> bool:
+    """Future export_doc_guarded zakończony sukcesem."""
+    return f.done() and not f.cancelled() and f.exception() is None and bool(f.result())
+
+
+def log_render_timing(exported: list[dict], selection: list[int]) -> None:
+    """Porównanie czasów renderowania w logu i w metrykach przebiegu."""
+    t = render_timing(exported, selection)
+    if t is None:
+        return
+    logger.info("Zmiany wzorca: %d (w kolejności wyboru: %d); pierwszy render wzorcem %.2f s, "
+                "kolejne %.2f s; szacowany zysk z grupowania: %.1f s.",
+                t["zmiany"], t["zmiany_wybor"], t["zimny_s"], t["cieply_s"], t["zysk_s"])
+    m = metryki.current()
+    m.count("zmiany_wzorca", t["zmiany"])
+    m.count("render_zimny_s", round(t["zimny_s"], 4))
+    m.count("render_cieply_s", round(t["cieply_s"], 4))
+
+
+def export_run(worker: ComWorker, run: dict, wzorce: list[dict], kontrahenci: slowniki.Slownik) -> None:
+    """
+    Jeden przebieg eksportu. Operacje COM idą do wątku roboczego, okna Tk zostają
+    w wątku głównym. Kolejność 'wybor': dokumenty w kolejności wyboru (jak w manifeście),
+    zlecane, gdy tylko ich kontrahent ma wzorzec - eksport trwa w czasie wyboru kolejnych;
+    'wzorzec': po wyborze, grupami wg wzorca (manifest - kolejność wyboru).
+    """
+    storage_path = run.get("storage") or STORAGE_PATH
+    printer_name = run.get("printer") or DEFAULT_PRINTER
+    wz_by_id = {int(w["wzw_Id"]): str(w["wzw_Nazwa"]) for w in wzorce}
+
+    # wybór dokumentów
+    with metryki.current().stage("wybor"):
+        items = worker.submit(read_selection, run).result()
+    if len(items) == 0:
+        logger.info("Brak dokumentów do eksportu.")
+        return
+
+    # dokumenty pogrupowane po kontrahencie (kolejność pierwszego wystąpienia)
+    by_kh: dict[int, list[dict]] = {}
+    for pos, it in enumerate(items):
+        it["pos"] = pos     # kolejność wyboru (manifest, paczki)
+        by_kh.setdefault(it["kh_id"], []).append(it)
+
+    if run["tryb"] == "pdf":
+        default_dir = Path(run["out_dir"]) if run.get("out_dir") else (Path.cwd().parent / "wydruki")  # ..\wydruki
+        default_dir.mkdir(parents=True, exist_ok=True)
+        out_dir = default_dir if run["headless"] else choose_output_dir(default_dir)
+
+        # plan ścieżek: wszystkie nazwy i katalogi przed renderowaniem
+        for it in items:
+            k = kontrahenci.get(it["kh_id"])
+            it["kontrahent"] = k.nazwa if k else None
+        plan_output_paths(items, out_dir, run.get("uklad") or "", create_dirs=not run["dry_run"])
+        n_coll = collisions(items)
+        if n_coll:
+            logger.warning("Kolizje nazw plików: %d – dodano sufiksy ' (n)'.", n_coll)
+        if not run["dry_run"]:
+            write_manifest(items, out_dir)
+    else:
+        # profile wydruku: drukarka i kopie per kontrahent; nieznane drukarki zgłoszone raz, przed drukiem
+        profiles = load_print_profiles(storage_path)
+        apply_print_profiles(items, profiles, printer_name, int(run.get("kopie") or 1))
+        if profiles:
+            logger.info("Profile wydruku: %d kontrahentów (%s).", len(profiles), profiles_path(storage_path))
+        missing = {it["drukarka"] for it in items if it["drukarka"]} - available_printers()
+        if missing:
+            logger.warning("Nie znaleziono drukarek: %s – dokumenty na nie trafią na listę nieudanych.",
+                           ", ".join(sorted(missing)))
+
+    # drukowanie/export - w tle; kolejność 'wybor': od razu po wyborze wzorca dla kontrahenta,
+    # 'wzorzec*': po wyborze wszystkich wzorców, grupami wg wzorca (mniej "zimnych" renderów);
+    # błąd jednego dokumentu (w trybie pdf ponowiony, jeśli przejściowy) nie przerywa przebiegu
+    order = run.get("kolejnosc") or "wzorzec"
+    # wydruk bez ponowień: timeout po wysłaniu do spoolera nie może drukować dokumentu drugi raz
+    runner = ItemRunner(NO_RETRY if run["tryb"] == "druk" else None)
+    futures: list[tuple[Future, dict]] = []
+    chosen: list[tuple[dict, int]] = []         # (dokument, wzorzec) w kolejności wyboru (pos)
+    choices: dict[int, Optional[int]] = {}      # kh_id -> wybrany wzorzec
+    cursor = 0                                  # 'wybor': pierwszy jeszcze niezlecony dokument
+    skipped = 0
+
+    # paczki per kontrahent: łączone w tle, gdy tylko skończy się eksport dokumentów kontrahenta
+    stage = None
+    if run.get("paczki") and run["tryb"] == "pdf" and not run["dry_run"]:
+        if paczki_pdf.available():
+            stage = paczki_pdf.BundleStage(out_dir)
+        else:
+            logger.warning("Paczki PDF pominięte – brak pakietu pypdf (pip install pypdf).")
+
+    def submit(it: dict, wzw_id: int) -> None:
+        it["wzw_id"] = wzw_id
+        wz_name = wz_by_id.get(wzw_id, f"wzorzec {wzw_id}")
+        if stage is not None:
+            stage.expect(it)
+        f = worker.submit(export_doc_guarded, runner, it, wzw_id, wz_name, run, printer_name,
+                          len(futures) + 1, len(items) - skipped)
+        if stage is not None:
+            f.add_done_callback(lambda f, it=it: stage.done(it, exported(f)))
+        futures.append((f, it))
+
+    def start_export(kh_id: int, wzw_id: Optional[int]) -> None:
+        nonlocal cursor, skipped
+        choices[kh_id] = wzw_id
+        if not wzw_id:
+            skipped += len(by_kh[kh_id])
+            if not cancel_requested():
+                for it in by_kh[kh_id]:
+                    logger.warning("Pomijam %s – brak wybranego wzorca.", it["numer"])
+        # kolejność wyboru: wszystkie dokumenty do pierwszego kontrahenta jeszcze bez wzorca
+        while cursor < len(items) and items[cursor]["kh_id"] in choices:
+            it = items[cursor]
+            cursor += 1
+            if choices[it["kh_id"]]:
+                chosen.append((it, choices[it["kh_id"]]))
+                if order == "wybor":
+                    submit(it, choices[it["kh_id"]])
+
+    # okno postępu (bez trybu headless): licznik, tempo, ETA i "Anuluj" - stop po bieżącym dokumencie
+    progress = None if run["headless"] else ProgressWindow(
+        "Wydruk FS" if run["tryb"] == "druk" else "Eksport FS do PDF")
+    try:
+        with metryki.current().stage("wzorce"):
+            choose_wzorce(list(by_kh), wzorce, kontrahenci, run, storage_path, on_chosen=start_export)
+        if order != "wybor":
+            for it, wzw_id in export_order(chosen, order):
+                submit(it, wzw_id)
+        if stage is not None:
+            stage.seal()
+        with metryki.current().stage("eksport"):
+            if progress is not None:
+                progress.wait(f for f, _ in futures)
+            for f, _ in futures:
+                f.result()
+        report_progress(len(futures), len(futures))
+        log_render_timing([it for _, it in futures], [w for _, w in chosen])
+        if stage is not None:
+            with metryki.current().stage("paczki"):
+                bundles = stage.close()
+            update_manifest(out_dir, paczki=bundles)
+            metryki.current().count("paczki", len(bundles))
+            logger.info("Paczki PDF: %d kontrahentów, %d dokumentów (%s).", len(bundles),
+                        sum(b["dokumenty"] for b in bundles), out_dir / paczki_pdf.BUNDLE_DIR)
+    except BaseException as e:
+        if stage is not None:
+            stage.abort()
+        for f, _ in futures:
+            f.cancel()
+        # bieżący dokument w wątku COM kończy się sam; potem na listę nieudanych trafia
+        # każdy niewyeksportowany dokument, którego runner jeszcze nie zapisał
+        wait([f for f, _ in futures if not f.done()], timeout=ABORT_WAIT_S)
+        recorded = {f["id"] for f in runner.failed}
+        for f, it in futures:
+            if not exported(f) and it["id"] not in recorded:
+                runner.skip(it, str(e) or type(e).__name__)
+        raise
+    finally:
+        if progress is not None:
+            progress.close()
+        if cancel_requested():
+            logger.warning("Anulowano przez użytkownika.")
+        if runner.failed:
+            logger.warning("Wyeksportowano %d z %d dokumentów; nieudane: %d, ponowienia: %d.",
+                           len(futures) - len(runner.failed), len(futures), len(runner.failed), runner.retries)
+        runner.write_dead_letters(DEAD_LETTER_DIR, LOG_PREFIX, {
+            k: run.get(k) for k in ("tryb", "out_dir", "uklad", "wzorzec", "printer", "kopie", "storage",
+                                    "kolejnosc", "paczki")
+            if run.get(k)
+        })
+
+
+def main(args: argparse.Namespace):
+    # logowanie w wątku COM; dane referencyjne równolegle bezpośrednio z SQL (albo przez Sferę)
+    worker = ComWorker()
+    reads = ReadPath.from_env(
+        fallback=lambda sql: worker.run_sql_async(sql).result(),
+        fallback_batch=lambda queries: worker.submit(run_sql_batch, queries).result(),
+    )
+    try:
+        runs = resolve_runs(args)
+        f_reference = reads.submit(fetch_reference_data)
 
-            # if delay and i < len(docs):
-            #     logger.info("  ... czekam %d sekund ...", delay)
-            #     time.sleep(delay)
+        for n, run in enumerate(runs, start=1):
+            if len(runs) > 1:
+                logger.info("=== Przebieg %d/%d ===", n, len(runs))
+            export_run(worker, run, *f_reference.result())
 
     except com_error as e:
         logger.exception("Błąd COM: %s", e)
     except Exception as e:
         logger.exception("Błąd krytyczny: %s", e)
     finally:
-        try:
-            if sub is not None:
-                sub.Zakoncz()
-        except Exception:
-            pass
-        pythoncom.CoUninitialize()
+        reads.close()
+        worker.shutdown()
 
 
 if __name__ == "__main__":
+    args = parse_args()
     logfile = logowanie.setup_logging(LOG_PREFIX = LOG_PREFIX)
     print(f"Start aplikacji. Logi zapisuję do pliku: {logfile}")
+    metryki.start("drukuj_fs", LOG_PREFIX)
     try:
-        main()
+        main(args)
     finally:
-        show_completion_dialog(logfile=logfile, logs_dir="logs")
+        metryki.finish(Path(logfile).parent)
+        if not (args.headless or args.manifest):
+            show_completion_dialog(logfile=logfile, logs_dir="logs")
@@ -1,9 +1,50 @@
+import os
+import threading
+import time
 import tkinter as tk
+import unicodedata
 from datetime import datetime, timedelta
 from pathlib import Path
 from tkinter import messagebox, ttk
 from typing import Callable, Optional
 
+from cli import parse_date
+
+
+# ---------- Wspólny root Tk ----------
+_root: Optional[tk.Tk] = None
+
+def get_root() -> tk.Tk:
+    """Jeden ukryty root Tk na cały proces; okna dialogowe są jego oknami Toplevel."""
+    global _root
+    try:
+        if _root is not None and _root.winfo_exists():
+            return _root
+    except tk.TclError:
+        pass
+    _root = tk.Tk()
+    _root.withdraw()
+    return _root
+
+def _dialog(title: str, topmost_ms: Optional[int] = 250) -> tk.Toplevel:
+    win = tk.Toplevel(get_root())
+    win.title(title)
+    win.lift()
+    win.attributes("-topmost", True)
+    if topmost_ms is not None:
+        win.after(topmost_ms, lambda: win.attributes("-topmost", False))
+    win.focus_force()
+    return win
+
+def _run_modal(win: tk.Toplevel) -> None:
+    """Modalnie: blokuje do zamknięcia okna (zamiast osobnego mainloop)."""
+    try:
+        win.wait_visibility()
+        win.grab_set()
+    except tk.TclError:
+        pass
+    win.wait_window()
+
 
 def ask_new_date_and_dryrun(default_dayshift: int = 0, default_dryrun: bool = True):
     """
@@ -12,13 +53,8 @@ def ask_new_date_and_dryrun(default_dayshift: int = 0, default_dryrun: bool = Tr
     """
     result = {"date": None, "dry": None}
 
-    root = tk.Tk()
-    root.title("Ustawienia zmiany daty dokumentów")
+    root = _dialog("Ustawienia zmiany daty dokumentów")
     root.resizable(False, False)
-    root.lift(); root.attributes("-topmost", True)
-    root.after(250, lambda: root.attributes("-topmost", False))
-    root.focus_force()
-    root.grab_set()
 
     frm = ttk.Frame(root, padding=12)
     frm.pack(fill="both", expand=True)
@@ -45,7 +81,7 @@ def ask_new_date_and_dryrun(default_dayshift: int = 0, default_dryrun: bool = Tr
         try:
             d = _parse_user_date(date_var.get())
         except Exception as e:
-            messagebox.showerror("Błędna data", str(e)); return
+            messagebox.showerror("Błędna data", str(e), parent=root); return
         result["date"] = d
         result["dry"] = dry_var.get()
         root.destroy()
@@ -60,7 +96,7 @@ def ask_new_date_and_dryrun(default_dayshift: int = 0, default_dryrun: bool = Tr
     root.bind("<Escape>", lambda e: cancel())
     entry.focus_set(); entry.select_range(0, tk.END)
 
-    root.mainloop()
+    _run_modal(root)
     return result["date"], result["dry"]
 
 
@@ -77,13 +113,8 @@ def show_completion_dialog(logfile: str | None = None, logs_dir: str = "logs") -
         logs_path = Path(logs_dir).resolve()
         last_file = None
 
-    root = tk.Tk()
-    root.title("Operacja zakończona")
+    root = _dialog("Operacja zakończona", topmost_ms=None)
     root.resizable(False, False)
-    root.lift()
-    root.attributes("-topmost", True)
-    root.focus_force()
-    root.grab_set()
 
     frm = ttk.Frame(root, padding=12)
     frm.pack(fill="both", expand=True)
@@ -109,33 +140,482 @@ def show_completion_dialog(logfile: str | None = None, logs_dir: str = "logs") -
             webbrowser.open(str(logs_path))
 
     ttk.Button(btns, text="Otwórz folder logów", command=open_logs).pack(side="left")
+    if last_file:
+        import logowanie
+
+        def open_viewer():
+            root.grab_release()     # podgląd obok okna modalnego musi przyjmować zdarzenia
+            show_log_viewer(last_file, start=logowanie.run_offset)
+
+        ttk.Button(btns, text="Pokaż log", command=open_viewer).pack(side="left", padx=(6, 0))
     ttk.Button(btns, text="OK", command=root.destroy).pack(side="right")
 
     root.bind("<Return>", lambda e: root.destroy())
     root.bind("<Escape>", lambda e: root.destroy())
 
-    root.mainloop()
+    _run_modal(root)
+
+# ---------- GUI: okno postępu ----------
+def _fmt_duration(seconds: float) -> str:
+    m, s = divmod(int(seconds), 60)
+    h, m = divmod(m, 60)
+    return f"{h:d}:{m:02d}:{s:02d}"
+
+
+class ProgressWindow:
+    """
+    Okno postępu przebiegu działającego w innym wątku (np. ComWorker): licznik,
+    tempo, szacowany czas do końca i przycisk "Anuluj". Postęp przychodzi przez
+    scheduler.report_progress(); anulowanie ustawia scheduler.request_cancel(),
+    a pętla kończy pracę po bieżącym dokumencie. Okno odświeża się w wątku Tk.
+    """
+
+    POLL_MS = 250
+
+    def __init__(self, title: str, unit: str = "dok."):
+        import scheduler
+        self._scheduler = scheduler
+        scheduler.clear_cancel()    # anulowanie poprzedniego przebiegu w tym procesie
+        self.unit = unit
+        self._lock = threading.Lock()
+        self._done, self._total = 0, 0
+        self._t0 = time.monotonic()
+
+        self.win = _dialog(title)
+        self.win.resizable(False, False)
+        self.win.protocol("WM_DELETE_WINDOW", self.cancel)
+        frm = ttk.Frame(self.win, padding=12)
+        frm.pack(fill="both", expand=True)
+        self.count = ttk.Label(frm, text="Przygotowanie…", font=("Segoe UI", 11, "bold"))
+        self.count.pack(anchor="w")
+        self.bar = ttk.Progressbar(frm, length=380, mode="indeterminate")
+        self.bar.pack(fill="x", pady=8)
+        self.bar.start(15)
+        self.details = ttk.Label(frm, text="")
+        self.details.pack(anchor="w")
+        self.cancel_btn = ttk.Button(frm, text="Anuluj", command=self.cancel)
+        self.cancel_btn.pack(anchor="e", pady=(10, 0))
+        scheduler.add_progress_listener(self._on_progress)
+        self.win.after(self.POLL_MS, self._tick)
+
+    def _on_progress(self, done: int, total: int) -> None:
+        """(dowolny wątek) zapamiętuje stan; okno czyta go przy odświeżeniu."""
+        with self._lock:
+            self._done, self._total = done, total
+
+    def cancel(self) -> None:
+        if self._scheduler.cancel_requested():
+            return
+        self._scheduler.request_cancel()
+        self.cancel_btn.configure(state="disabled")
+        self.count.configure(text="Anulowanie – kończę bieżący dokument…")
+
+    def _tick(self) -> None:
+        # odświeżanie przez after(): działa też, gdy wątek Tk obsługuje inne okno (np. wybór wzorca)
+        try:
+            self._refresh()
+            self.win.after(self.POLL_MS, self._tick)
+        except tk.TclError:
+            pass
+
+    def _refresh(self) -> None:
+        with self._lock:
+            done, total = self._done, self._total
+        if not done and not total:
+            return
+        elapsed = time.monotonic() - self._t0
+        rate = done / elapsed if elapsed > 0 else 0.0
+        if total and str(self.bar["mode"]) != "determinate":
+            self.bar.stop()
+            self.bar.configure(mode="determinate", maximum=total)
+        if total:
+            self.bar.configure(value=done)
+        if not self._scheduler.cancel_requested():
+            self.count.configure(text=f"{done}/{total} {self.unit}" if total else f"{done} {self.unit}")
+        info = f"Czas: {_fmt_duration(elapsed)}   Tempo: {rate:.2f} {self.unit}/s"
+        if total and rate > 0 and done < total:
+            info += f"   Pozostało: ~{_fmt_duration((total - done) / rate)}"
+        self.details.configure(text=info)
+
+    def wait(self, futures) -> None:
+        """Obsługuje okno do zakończenia wszystkich futures (wątek Tk), potem je zamyka."""
+        futures = list(futures)
+        try:
+            while not all(f.done() for f in futures):
+                self.win.update()
+                time.sleep(0.03)
+        except tk.TclError:
+            pass    # okno zamknięte razem z rootem
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self._scheduler.remove_progress_listener(self._on_progress)
+        try:
+            self.win.destroy()
+        except tk.TclError:
+            pass
+
+# ---------- GUI: tabela wirtualna (sortowanie, tylko widoczne wiersze) ----------
+class VirtualTable(ttk.Frame):
+    """
+    Treeview pokazujący tylko widoczne okno wierszy - przewijanie przestawia przesunięcie
+    zamiast trzymać tysiące elementów w Tk. Klik w nagłówek sortuje (drugi klik - malejąco).
+    rows: lista krotek w kolejności columns; tag_of(row) -> nazwa tagu (np. wyróżnienie) albo "".
+    """
+
+    def __init__(self, parent, columns: list[tuple[str, str, int]], rows: list[tuple],
+                 height: int = 20, tag_of: Optional[Callable[[tuple], str]] = None):
+        super().__init__(parent)
+        self.rows = list(rows)
+        self.height = height
+        self.tag_of = tag_of or (lambda r: "")
+        self.offset = 0
+        self._sort: tuple[int, bool] = (-1, False)
+
+        names = [c[0] for c in columns]
+        self.tree = ttk.Treeview(self, columns=names, show="headings", height=height, selectmode="browse")
+        for i, (name, text, width) in enumerate(columns):
+            self.tree.heading(name, text=text, command=lambda i=i: self.sort_by(i))
+            self.tree.column(name, width=width, anchor="w", stretch=True)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.vsb = ttk.Scrollbar(self, orient="vertical", command=self._on_scroll)
+        self.vsb.pack(side="right", fill="y")
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll(-3 if e.delta > 0 else 3))
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self._items = [self.tree.insert("", "end", values=()) for _ in range(height)]
+        self._render()
+
+    def tag_configure(self, tag: str, **kw) -> None:
+        self.tree.tag_configure(tag, **kw)
+
+    def sort_by(self, col: int) -> None:
+        desc = self._sort == (col, False)
+        self.rows.sort(key=lambda r: (r[col] is None, r[col]), reverse=desc)
+        self._sort = (col, desc)
+        self.offset = 0
+        self._render()
+
+    def scroll(self, n: int) -> None:
+        self.offset = max(0, min(self.offset + n, max(0, len(self.rows) - self.height)))
+        self._render()
+
+    def _on_scroll(self, action, value, unit=None):
+        if action == "moveto":
+            self.offset = int(float(value) * len(self.rows))
+            self.scroll(0)
+        elif action == "scroll":
+            self.scroll(int(value) * (self.height if unit == "pages" else 1))
+
+    def _render(self) -> None:
+        window = self.rows[self.offset:self.offset + self.height]
+        for n, iid in enumerate(self._items):
+            if n < len(window):
+                tag = self.tag_of(window[n])
+                self.tree.item(iid, values=["" if v is None else v for v in window[n]], tags=(tag,) if tag else ())
+            else:
+                self.tree.item(iid, values=(), tags=())
+        total = max(1, len(self.rows))
+        self.vsb.set(self.offset / total, min(1.0, (self.offset + self.height) / total))
+
+
+def show_table_preview(title: str, summary: str, columns: list[tuple[str, str, int]], rows: list[tuple],
+                       tag_of: Optional[Callable[[tuple], str]] = None, tags: Optional[dict] = None,
+                       confirm_text: Optional[str] = None) -> bool:
+    """Modalny podgląd w VirtualTable; z confirm_text - przycisk potwierdzenia (zwraca True)."""
+    result = {"ok": False}
+    win = _dialog(title)
+    win.geometry("900x560")
+    frm = ttk.Frame(win, padding=12)
+    frm.pack(fill="both", expand=True)
+    ttk.Label(frm, text=summary, justify="left", wraplength=860).pack(anchor="w", pady=(0, 8))
+    table = VirtualTable(frm, columns, rows, height=20, tag_of=tag_of)
+    for tag, kw in (tags or {}).items():
+        table.tag_configure(tag, **kw)
+    table.pack(fill="both", expand=True)
+
+    def ok():
+        result["ok"] = True
+        win.destroy()
+
+    btns = ttk.Frame(frm)
+    btns.pack(fill="x", pady=(10, 0))
+    ttk.Button(btns, text="Zamknij", command=win.destroy).pack(side="right")
+    if confirm_text:
+        ttk.Button(btns, text=confirm_text, command=ok).pack(side="right", padx=(0, 8))
+    win.bind("<Escape>", lambda e: win.destroy())
+    _run_modal(win)
+    return result["ok"]
+
+# ---------- GUI: podgląd logu ----------
+def show_log_viewer(logfile: str | Path, start: int = 0, limit: int = 2000) -> None:
+    """
+    Okno podglądu logu (niemodalne). Plik jest mapowany w pamięci i filtrowany
+    bez wczytywania całości: domyślnie tylko bieżący przebieg (od bajtu 'start'),
+    filtr poziomu i tekstu (np. numer dokumentu), najwyżej 'limit' ostatnich wierszy.
+    """
+    import log_viewer
+
+    win = _dialog(f"Log: {Path(logfile).name}")
+    win.geometry("1000x600")
+
+    bar = ttk.Frame(win, padding=(8, 8, 8, 4))
+    bar.pack(fill="x")
+    level = tk.StringVar(value="")
+    text = tk.StringVar(value="")
+    only_run = tk.BooleanVar(value=True)
+    status = tk.StringVar(value="")
+
+    ttk.Label(bar, text="Poziom od:").pack(side="left")
+    ttk.Combobox(bar, textvariable=level, values=("",) + log_viewer.LEVELS, width=10,
+                 state="readonly").pack(side="left", padx=(4, 12))
+    ttk.Label(bar, text="Szukaj (np. numer dokumentu):").pack(side="left")
+    entry = ttk.Entry(bar, textvariable=text, width=30)
+    entry.pack(side="left", padx=(4, 12))
+    ttk.Checkbutton(bar, text="Tylko ten przebieg", variable=only_run).pack(side="left")
+
+    body = ttk.Frame(win, padding=(8, 0, 8, 0))
+    body.pack(fill="both", expand=True)
+    view = tk.Text(body, wrap="none", font=("Consolas", 9))
+    ys = ttk.Scrollbar(body, orient="vertical", command=view.yview)
+    xs = ttk.Scrollbar(body, orient="horizontal", command=view.xview)
+    view.configure(yscrollcommand=ys.set, xscrollcommand=xs.set)
+    view.grid(row=0, column=0, sticky="nsew")
+    ys.grid(row=0, column=1, sticky="ns")
+    xs.grid(row=1, column=0, sticky="ew")
+    body.rowconfigure(0, weight=1)
+    body.columnconfigure(0, weight=1)
+    view.tag_configure("WARNING", foreground="#b36b00")
+    view.tag_configure("ERROR", foreground="#c00000")
+    view.tag_configure("CRITICAL", foreground="#ffffff", background="#c00000")
+
+    foot = ttk.Frame(win, padding=8)
+    foot.pack(fill="x")
+    ttk.Label(foot, textvariable=status).pack(side="left")
+    ttk.Button(foot, text="Zamknij", command=win.destroy).pack(side="right")
+
+    def refresh(*_):
+        with log_viewer.mapped(logfile) as mm:
+            run_start = log_viewer.find_run_start(mm, start) if (mm is not None and only_run.get()) else 0
+        lines, cut = log_viewer.scan(logfile, run_start, level.get() or None, text.get().strip(), limit)
+        view.configure(state="normal")
+        view.delete("1.0", tk.END)
+        for line in lines:
+            tag = next((lvl for lvl in ("CRITICAL", "ERROR", "WARNING") if f"[{lvl}]" in line), "")
+            view.insert(tk.END, line + "\n", tag)
+        view.configure(state="disabled")
+        view.see(tk.END)
+        status.set(f"Wierszy: {len(lines)}" + (f" (ostatnie {limit})" if cut else ""))
+
+    ttk.Button(foot, text="Odśwież", command=refresh).pack(side="right", padx=(0, 6))
+    level.trace_add("write", refresh)
+    only_run.trace_add("write", refresh)
+    entry.bind("<Return>", refresh)
+    win.bind("<Escape>", lambda e: win.destroy())
+    refresh()
+
 
 # ---------- GUI: jedno okno z datą i checkboxem dry-run ----------
 def _parse_user_date(s: str) -> datetime.date:
-    s = s.strip()
-    # 1) ISO: YYYY-MM-DD
-    try:
-        return datetime.fromisoformat(s).date()
-    except Exception:
-        pass
-    # 2) DD.MM.YYYY
-    try:
-        return datetime.strptime(s, "%d.%m.%Y").date()
-    except Exception:
-        pass
-    # 3) DD/MM/YYYY
-    try:
-        return datetime.strptime(s, "%d/%m/%Y").date()
-    except Exception:
-        pass
-    raise ValueError("Nieprawidłowy format daty. Użyj YYYY-MM-DD lub DD.MM.YYYY")
+    return parse_date(s)
+
+
+# ---------- GUI: wybór wzorca wydruku ----------
+_PL_FOLD = str.maketrans({"ł": "l", "Ł": "L"})
+
+def fold_text(s: str) -> str:
+    """Tekst do porównań: bez polskich znaków diakrytycznych, bez wielkości liter."""
+    s = unicodedata.normalize("NFKD", str(s).translate(_PL_FOLD))
+    return "".join(c for c in s if not unicodedata.combining(c)).casefold()
+
+
+class _WzorPicker:
+    """
+    Okno wyboru wzorca tworzone raz na listę wzorców i ukrywane między
+    kontrahentami. Wiersze wstawiane są jeden raz; filtr działa na gotowym
+    indeksie (nazwa bez ogonków + ID), z opóźnieniem i tylko odłącza/dołącza
+    wiersze, które zmieniają widoczność.
+    """
+
+    DEBOUNCE_MS = 120
+    CANCEL_POLL_MS = 250
+
+    def __init__(self, items: list[dict]):
+        self.items = items
+        self.by_iid = {str(it["wzw_Id"]): it for it in items}
+        self.order = [str(it["wzw_Id"]) for it in items]
+        self.keys = {str(it["wzw_Id"]): f'{fold_text(it["wzw_Nazwa"])} {it["wzw_Id"]}' for it in items}
+        self.visible = list(self.order)
+        self.last_query = ""
+        self.result: Optional[dict] = None
+        self.preselect_iid: Optional[str] = None
+        self.on_remember: Optional[Callable[[int], None]] = None
+        self._after_id = None
+        self._watch_id = None
+        self._build()
+
+    def _build(self):
+        win = self.win = tk.Toplevel(get_root())
+        win.geometry("700x520")
+        win.minsize(560, 400)
+        win.withdraw()
+
+        frame = ttk.Frame(win, padding=12)
+        frame.pack(fill="both", expand=True)
+
+        self.header = ttk.Label(frame, font=("Segoe UI", 11, "bold"), wraplength=650, justify="left")
+        self.header.pack(anchor="w", pady=(0, 8))
+
+        # filtr
+        filter_frame = ttk.Frame(frame)
+        filter_frame.pack(fill="x", pady=(0, 6))
+        ttk.Label(filter_frame, text="Filtruj:").pack(side="left")
+        self.filter_var = tk.StringVar()
+        self.filter_entry = ttk.Entry(filter_frame, textvariable=self.filter_var)
+        self.filter_entry.pack(side="left", fill="x", expand=True, padx=(6, 0))
+
+        # lista
+        columns = ("id", "nazwa")
+        tree = self.tree = ttk.Treeview(frame, columns=columns, show="headings", selectmode="browse")
+        tree.heading("id", text="ID")
+        tree.heading("nazwa", text="Nazwa wzorca")
+        tree.column("id", width=90, anchor="center")
+        tree.column("nazwa", anchor="w")
+        tree.pack(fill="both", expand=True)
+
+        vsb = ttk.Scrollbar(tree, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=vsb.set)
+        vsb.pack(side="right", fill="y")
+
+        for iid in self.order:
+            it = self.by_iid[iid]
+            tree.insert("", "end", iid=iid, values=(it["wzw_Id"], it["wzw_Nazwa"]))
+
+        self.filter_var.trace_add("write", self._schedule_filter)
+
+        # checkbox "Zapamiętaj"
+        self.remember_var = tk.BooleanVar()
+        self.remember_chk = ttk.Checkbutton(frame, variable=self.remember_var)
+        self.remember_chk.pack(anchor="w", pady=(8, 0))
+
+        # przyciski
+        btns = ttk.Frame(frame)
+        btns.pack(fill="x", pady=(10, 0))
+        ttk.Button(btns, text="Anuluj", command=self._cancel).pack(side="right")
+        ttk.Button(btns, text="OK", command=self._pick_current).pack(side="right", padx=(0, 8))
+
+        tree.bind("<Double-1>", lambda _: self._pick_current())
+        win.bind("<Return>", lambda _: self._pick_current())
+        win.bind("<Escape>", lambda _: self._cancel())
+        win.protocol("WM_DELETE_WINDOW", self._cancel)
+        self.done = tk.BooleanVar(value=False)
+
+    # --- filtr ---
+    def _schedule_filter(self, *_):
+        if self._after_id is not None:
+            self.win.after_cancel(self._after_id)
+        self._after_id = self.win.after(self.DEBOUNCE_MS, self._apply_filter)
+
+    def _apply_filter(self):
+        self._after_id = None
+        q = fold_text(self.filter_var.get().strip())
+        # zawężanie zapytania: szukamy tylko wśród aktualnie widocznych
+        pool = self.visible if q.startswith(self.last_query) else self.order
+        new_visible = [iid for iid in pool if q in self.keys[iid]] if q else list(self.order)
+        self._show(new_visible)
+        self.last_query = q
+        self._preselect()
+
+    def _show(self, new_visible: list[str]):
+        new_set = set(new_visible)
+        hidden = [iid for iid in self.visible if iid not in new_set]
+        if hidden:
+            self.tree.detach(*hidden)
+        old_set = set(self.visible) - set(hidden)
+        for idx, iid in enumerate(new_visible):
+            if iid not in old_set:
+                self.tree.move(iid, "", idx)
+        self.visible = new_visible
+
+    def _preselect(self):
+        iid = self.preselect_iid
+        if iid is None or iid not in self.visible:
+            iid = self.visible[0] if self.visible else None
+        if iid is None:
+            return
+        self.tree.selection_set(iid)
+        self.tree.focus(iid)
+        self.tree.see(iid)
+
+    # --- wynik ---
+    def _pick_current(self):
+        sel = self.tree.selection()
+        if not sel:
+            messagebox.showinfo("Wybór", "Zaznacz wzór z listy.", parent=self.win)
+            return
+        wz = dict(self.by_iid[sel[0]])
+        self.result = wz
+        try:
+            if self.remember_var.get() and callable(self.on_remember):
+                self.on_remember(wz["wzw_Id"])
+        finally:
+            self.done.set(True)
+
+    def _cancel(self):
+        self.result = None
+        self.done.set(True)
 
+    def _watch_cancel(self):
+        # anulowanie przebiegu (okno postępu) zamyka też otwarty wybór wzorca
+        import scheduler
+        if self.done.get():
+            return
+        if scheduler.cancel_requested():
+            self._cancel()
+        else:
+            self._watch_id = self.win.after(self.CANCEL_POLL_MS, self._watch_cancel)
+
+    def ask(self, nazwa_kontrahenta: str, num: int, total: int, kh_id: Optional[int],
+            preselect_wzw_id: Optional[int], remember_default: bool,
+            on_remember: Optional[Callable[[int], None]]) -> Optional[dict]:
+        win = self.win
+        win.title(f"Wybierz wzór wydruku ({num}/{total})")
+        self.header.configure(text=f'Wybierz wzór wydruku dla kontrahenta: "{nazwa_kontrahenta}"')
+        self.remember_chk.configure(
+            text=f"Zapamiętaj wybór dla kontrahenta (ID: {kh_id})" if kh_id is not None else "Zapamiętaj wybór"
+        )
+        self.remember_var.set(bool(remember_default))
+        self.on_remember = on_remember
+        self.preselect_iid = str(int(preselect_wzw_id)) if preselect_wzw_id is not None else None
+        self.result = None
+        self.done.set(False)
+
+        # wyczyść filtr bez czekania na debounce
+        if self.filter_var.get():
+            self.filter_var.set("")
+        if self._after_id is not None:
+            win.after_cancel(self._after_id)
+            self._after_id = None
+        self._show(list(self.order))
+        self.last_query = ""
+        self._preselect()
+
+        win.deiconify()
+        win.lift()
+        win.attributes("-topmost", True)
+        win.after(300, lambda: win.attributes("-topmost", False))
+        win.focus_force()
+        self.filter_entry.focus_set()
+        # bez grab_set: "Anuluj" w oknie postępu ma działać także w trakcie wyboru
+        self._watch_id = win.after(self.CANCEL_POLL_MS, self._watch_cancel)
+        win.wait_variable(self.done)
+        win.after_cancel(self._watch_id)
+        win.withdraw()
+        return self.result
+
+
+_pickers: dict[tuple, _WzorPicker] = {}
 
 def choose_wzor_wydruku(
     nazwa_kontrahenta: str,
@@ -147,7 +627,7 @@ def choose_wzor_wydruku(
     remember_default: bool = True,
     on_remember: Optional[Callable[[int], None]] = None,
 ) -> Optional[dict]:
-    """Okno wyboru wzorca wydruku."""
+    """Okno wyboru wzorca wydruku (jedno okno na listę wzorców, używane ponownie)."""
     # normalize
     items: list[dict] = []
     for w in wzorce or []:
@@ -156,142 +636,14 @@ def choose_wzor_wydruku(
         except Exception:
             pass
     if not items:
-        messagebox.showwarning("Brak wzorców", "Nie znaleziono żadnych wzorców wydruku.")
+        messagebox.showwarning("Brak wzorców", "Nie znaleziono żadnych wzorców wydruku.", parent=get_root())
         return None
 
-    selection_holder: dict[str, Optional[dict]] = {"value": None}
-
-    root = tk.Tk()
-    root.title(f"Wybierz wzór wydruku ({num}/{total})")
-    root.geometry("700x520")
-    root.minsize(560, 400)
-    root.lift()
-    root.attributes("-topmost", True)
-    root.after(300, lambda: root.attributes("-topmost", False))
-    root.focus_force()
-    root.grab_set()
-
-    frame = ttk.Frame(root, padding=12)
-    frame.pack(fill="both", expand=True)
-
-    ttk.Label(
-        frame,
-        text=f'Wybierz wzór wydruku dla kontrahenta: "{nazwa_kontrahenta}"',
-        font=("Segoe UI", 11, "bold"),
-        wraplength=650,
-        justify="left",
-    ).pack(anchor="w", pady=(0, 8))
-
-    # filtr
-    filter_frame = ttk.Frame(frame)
-    filter_frame.pack(fill="x", pady=(0, 6))
-    ttk.Label(filter_frame, text="Filtruj:").pack(side="left")
-    filter_var = tk.StringVar()
-    filter_entry = ttk.Entry(filter_frame, textvariable=filter_var)
-    filter_entry.pack(side="left", fill="x", expand=True, padx=(6, 0))
-
-    # lista
-    columns = ("id", "nazwa")
-    tree = ttk.Treeview(frame, columns=columns, show="headings", selectmode="browse")
-    tree.heading("id", text="ID")
-    tree.heading("nazwa", text="Nazwa wzorca")
-    tree.column("id", width=90, anchor="center")
-    tree.column("nazwa", anchor="w")
-    tree.pack(fill="both", expand=True)
-
-    vsb = ttk.Scrollbar(tree, orient="vertical", command=tree.yview)
-    tree.configure(yscrollcommand=vsb.set)
-    vsb.pack(side="right", fill="y")
-
-    filtered = list(items)
-
-    def refresh_tree():
-        tree.delete(*tree.get_children())
-        for it in filtered:
-            tree.insert("", "end", values=(it["wzw_Id"], it["wzw_Nazwa"]))
-
-    def _preselect(wzw_id: Optional[int]):
-        try:
-            if wzw_id is None:
-                first = tree.get_children()
-                if first:
-                    tree.selection_set(first[0])
-                    tree.focus(first[0])
-                return
-            for iid in tree.get_children():
-                vals = tree.item(iid)["values"]
-                if int(vals[0]) == int(wzw_id):
-                    tree.selection_set(iid)
-                    tree.focus(iid)
-                    tree.see(iid)
-                    return
-            # fallback: pierwszy
-            first = tree.get_children()
-            if first:
-                tree.selection_set(first[0])
-                tree.focus(first[0])
-        except Exception:
-            pass
-
-    def on_filter_change(*_):
-        q = filter_var.get().strip().lower()
-        filtered.clear()
-        if not q:
-            filtered.extend(items)
-        else:
-            for it in items:
-                if q in it["wzw_Nazwa"].lower() or q in str(it["wzw_Id"]):
-                    filtered.append(it)
-        refresh_tree()
-        _preselect(preselect_wzw_id)
-
-    filter_var.trace_add("write", on_filter_change)
-
-    # checkbox "Zapamiętaj"
-    remember_var = tk.BooleanVar(value=bool(remember_default))
-    chk_text = f"Zapamiętaj wybór dla kontrahenta (ID: {kh_id})" if kh_id is not None else "Zapamiętaj wybór"
-    ttk.Checkbutton(frame, text=chk_text, variable=remember_var).pack(anchor="w", pady=(8, 0))
-
-    # przyciski
-    btns = ttk.Frame(frame)
-    btns.pack(fill="x", pady=(10, 0))
-    btn_ok = ttk.Button(btns, text="OK")
-    btn_cancel = ttk.Button(btns, text="Anuluj")
-    btn_cancel.pack(side="right")
-    btn_ok.pack(side="right", padx=(0, 8))
-
-    def pick_current():
-        sel = tree.selection()
-        if not sel:
-            messagebox.showinfo("Wybór", "Zaznacz wzór z listy.")
-            return
-        values = tree.item(sel[0])["values"]
-        wz = {"wzw_Id": int(values[0]), "wzw_Nazwa": str(values[1])}
-        selection_holder["value"] = wz
-        try:
-            if remember_var.get() and callable(on_remember):
-                on_remember(wz["wzw_Id"])
-        finally:
-            root.destroy()
-
-    def on_double_click(_): pick_current()
-    def on_return(_):       pick_current()
-    def on_escape(_):
-        selection_holder["value"] = None
-        root.destroy()
-
-    btn_ok.configure(command=pick_current)
-    btn_cancel.configure(command=lambda: on_escape(None))
-    tree.bind("<Double-1>", on_double_click)
-    root.bind("<Return>", on_return)
-    root.bind("<Escape>", on_escape)
-
-    refresh_tree()
-    _preselect(preselect_wzw_id)
-    filter_entry.focus_set()
-
-    root.mainloop()
-    return selection_holder["value"]  # dict lub None
+    key = tuple((it["wzw_Id"], it["wzw_Nazwa"]) for it in items)
+    picker = _pickers.get(key)
+    if picker is None or not picker.win.winfo_exists():
+        picker = _pickers[key] = _WzorPicker(items)
+    return picker.ask(nazwa_kontrahenta, num, total, kh_id, preselect_wzw_id, remember_default, on_remember)
 
 
 def ask_delay_seconds(
@@ -302,14 +654,8 @@ def ask_delay_seconds(
     """Modalny dialog: opóźnienie (sekundy) między wydrukami."""
     result = {"value": None}
 
-    root = tk.Tk()
-    root.title("Opóźnienie między wydrukami")
+    root = _dialog("Opóźnienie między wydrukami")
     root.resizable(False, False)
-    root.lift()
-    root.attributes("-topmost", True)
-    root.after(250, lambda: root.attributes("-topmost", False))
-    root.focus_force()
-    root.grab_set()
 
     frm = ttk.Frame(root, padding=12)
     frm.pack(fill="both", expand=True)
@@ -344,15 +690,15 @@ def ask_delay_seconds(
     def ok():
         s = val_var.get().strip()
         if not s:
-            messagebox.showinfo("Wartość wymagana", "Podaj liczbę sekund.")
+            messagebox.showinfo("Wartość wymagana", "Podaj liczbę sekund.", parent=root)
             return
         try:
             n = int(s)
         except ValueError:
-            messagebox.showerror("Błąd", "Wpisz liczbę całkowitą.")
+            messagebox.showerror("Błąd", "Wpisz liczbę całkowitą.", parent=root)
             return
         if not (min_seconds <= n <= max_seconds):
-            messagebox.showerror("Zakres", f"Podaj wartość {min_seconds}–{max_seconds}.")
+            messagebox.showerror("Zakres", f"Podaj wartość {min_seconds}–{max_seconds}.", parent=root)
             return
         result["value"] = n
         root.destroy()
@@ -370,16 +716,23 @@ def ask_delay_seconds(
     entry.focus_set()
     entry.select_range(0, tk.END)
 
-    root.mainloop()
+    _run_modal(root)
     return result["value"]
 
 def choose_output_dir(default_dir: Path) -> Path:
     try:
-        from tkinter import Tk, filedialog
-        root = Tk(); root.withdraw()
-        chosen = filedialog.askdirectory(initialdir=str(default_dir), title="Wybierz folder zapisu")
-        root.destroy()
+        from tkinter import filedialog
+        chosen = filedialog.askdirectory(parent=get_root(), initialdir=str(default_dir), title="Wybierz folder zapisu")
         return Path(chosen) if chosen else default_dir
     except Exception:
         # brak tkinter/GUI — użyj domyślnego
-        return default_dir
\ No newline at end of file
+        return default_dir
+
+
+def choose_input_file(title: str = "Wybierz plik", filetypes=(("Wszystkie pliki", "*.*"),)) -> Optional[Path]:
+    try:
+        from tkinter import filedialog
+        chosen = filedialog.askopenfilename(parent=get_root(), title=title, filetypes=list(filetypes))
+        return Path(chosen) if chosen else None
+    except Exception:
+        return None
@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+"""
+Seryjne tworzenie dokumentów ZK z plików zamówień (CSV, JSON, JSON Lines).
+Plik czytany jest strumieniowo - zamówienie po zamówieniu. Symbole towarów
+i ID kontrahentów sprawdzane są w indeksie w pamięci, wczytanym jednym
+zapytaniem wsadowym; dokumenty powstają w jednej sesji, bez okien.
+Wynik każdego zamówienia trafia do raportu CSV obok pliku wejściowego.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import logging
+import time
+import zlib
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Iterator, Optional
+
+from pywintypes import com_error
+
+import logowanie
+import metryki
+import replika
+import slowniki
+from com_worker import ComWorker
+from scheduler import report_progress
+
+logger = logging.getLogger(__name__)
+
+LOG_PREFIX = "ZK_IMPORT_"
+ZK_TYP = -8          # Dokumenty.Dodaj(-8) = zamówienie od klienta
+
+# Statusy w raporcie
+ST_CREATED = "utworzono"
+ST_INVALID = "odrzucono"     # błąd danych - dokument nie był tworzony
+ST_FAILED = "blad"           # błąd Sfery przy tworzeniu
+ST_CHECKED = "sprawdzono"    # dry-run
+
+# Kolumny pliku CSV (jeden wiersz = jedna pozycja; wiersze zamówienia kolejno po sobie)
+CSV_COLUMNS = ("zamowienie", "kontrahent", "symbol", "ilosc", "cena", "tytul", "uwagi")
+REPORT_COLUMNS = ("zamowienie", "status", "numer", "pozycje", "blad")
+
+# ============================================================================ #
+#                               ODCZYT ZAMÓWIEŃ
+# ============================================================================ #
+
+def read_orders(path: Path, delimiter: str = ";") -> Iterator[dict]:
+    """
+    Zamówienia z pliku: {"zamowienie", "kontrahent", "tytul", "uwagi",
+    "pozycje": [{"symbol", "ilosc", "cena"}, ...]}.
+    .csv i .jsonl czytane są strumieniowo; .json to lista zamówień.
+    Błąd danych jednego zamówienia (zły wiersz JSON, rozdzielone wiersze CSV)
+    nie przerywa odczytu - zamówienie dostaje pole "blad" i trafia do raportu
+    jako odrzucone.
+    """
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        yield from _read_csv(path, delimiter)
+    elif suffix in (".jsonl", ".ndjson"):
+        with path.open("r", encoding="utf-8-sig") as f:
+            for n, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    order = json.loads(line)
+                except ValueError as e:
+                    yield _invalid(f"wiersz {n}", f"niepoprawny JSON: {e}")
+                    continue
+                yield _order_from_json(order, f"wiersz {n}")
+    elif suffix == ".json":
+        data = json.loads(path.read_text(encoding="utf-8-sig"))
+        for n, order in enumerate(data.get("zamowienia", []) if isinstance(data, dict) else data, start=1):
+            yield _order_from_json(order, f"pozycja {n}")
+    else:
+        raise ValueError(f"Nieobsługiwany format pliku zamówień: {path.suffix} (csv, json, jsonl).")
+
+
+def _invalid(key: str, error: str) -> dict:
+    return {"zamowienie": key, "kontrahent": None, "tytul": "", "uwagi": "", "pozycje": [], "blad": error}
+
+
+def _order_from_json(order, where: str) -> dict:
+    if not isinstance(order, dict):
+        return _invalid(where, "zamówienie nie jest obiektem JSON")
+    key = str(order.get("zamowienie") or where)
+    pozycje = order.get("pozycje") or []
+    if not isinstance(pozycje, list):
+        return _invalid(key, "pole 'pozycje' nie jest listą")
+    return {
+        "zamowienie": key,
+        "kontrahent": order.get("kontrahent"),
+        "tytul": order.get("tytul") or "",
+        "uwagi": order.get("uwagi") or "",
+        "pozycje": pozycje,
+    }
+
+
+def _read_csv(path: Path, delimiter: str) -> Iterator[dict]:
+    seen: set[str] = set()
+    order: Optional[dict] = None
+    with path.open("r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f, delimiter=delimiter)
+        missing = {"zamowienie", "kontrahent", "symbol", "ilosc"} - set(reader.fieldnames or ())
+        if missing:
+            raise ValueError(f"Brak kolumn w pliku {path.name}: {', '.join(sorted(missing))}")
+        for row in reader:
+            key = (row.get("zamowienie") or "").strip()
+            if order is None or key != order["zamowienie"]:
+                if order is not None:
+                    yield order
+                order = {"zamowienie": key, "kontrahent": row.get("kontrahent"),
+                         "tytul": row.get("tytul") or "", "uwagi": row.get("uwagi") or "", "pozycje": []}
+                if key in seen:
+                    # część zamówienia już wczytana (i być może utworzona) - tej reszty nie łączymy
+                    order["blad"] = f"wiersze zamówienia nie są kolejno po sobie (wiersz {reader.line_num})"
+                seen.add(key)
+            order["pozycje"].append({"symbol": row.get("symbol"), "ilosc": row.get("ilosc"), "cena": row.get("cena")})
+        if order is not None:
+            yield order
+
+# ============================================================================ #
+#                                   INDEKS
+# ============================================================================ #
+
+class OrderIndex:
+    """Towary (po symbolu, bez względu na wielkość liter) i kontrahenci (po ID) w pamięci."""
+
+    def __init__(self, towary, kontrahenci):
+        self._towary = {t.symbol.strip().casefold(): t for t in towary}
+        self._kontrahenci = kontrahenci
+
+    @classmethod
+    def load(cls, src) -> "OrderIndex":
+        s = replika.load(src, ["towary", "kontrahenci"])
+        logger.info("Indeks: %d towarów, %d kontrahentów.", len(s["towary"]), len(s["kontrahenci"]))
+        return cls(s["towary"], s["kontrahenci"])
+
+    def towar(self, symbol: str) -> Optional[slowniki.Towar]:
+        return self._towary.get(str(symbol or "").strip().casefold())
+
+    def has_kontrahent(self, kh_id: int) -> bool:
+        return self._kontrahenci.get(kh_id) is not None
+
+
+class FakeIndex(OrderIndex):
+    """Indeks testowy: każdy symbol i każdy kontrahent istnieje (ID wyliczane z symbolu)."""
+
+    def __init__(self):
+        super().__init__([], None)
+
+    def towar(self, symbol: str) -> Optional[slowniki.Towar]:
+        symbol = str(symbol or "").strip()
+        if not symbol:
+            return None
+        key = symbol.casefold()
+        if key not in self._towary:
+            self._towary[key] = slowniki.Towar(zlib.crc32(key.encode("utf-8")), symbol, symbol)
+        return self._towary[key]
+
+    def has_kontrahent(self, kh_id: int) -> bool:
+        return True
+
+
+def _number(value, name: str) -> Optional[Decimal]:
+    if value in (None, ""):
+        return None
+    try:
+        return Decimal(str(value).strip().replace(",", "."))
+    except InvalidOperation:
+        raise ValueError(f"niepoprawna wartość '{value}' w polu {name}") from None
+
+
+def resolve_order(order: dict, index: OrderIndex) -> dict:
+    """Zamienia symbole i kontrahenta na ID; błąd danych -> ValueError z opisem."""
+    if order.get("blad"):
+        raise ValueError(order["blad"])
+    try:
+        kh_id = int(str(order["kontrahent"]).strip())
+    except (TypeError, ValueError):
+        raise ValueError(f"niepoprawne ID kontrahenta '{order['kontrahent']}'") from None
+    if not index.has_kontrahent(kh_id):
+        raise ValueError(f"nie ma kontrahenta o ID {kh_id}")
+    if not order["pozycje"]:
+        raise ValueError("zamówienie bez pozycji")
+    pozycje = []
+    for n, p in enumerate(order["pozycje"], start=1):
+        if not isinstance(p, dict):
+            raise ValueError(f"pozycja {n} nie jest obiektem (symbol, ilosc, cena)")
+        tw = index.towar(p.get("symbol"))
+        if tw is None:
+            raise ValueError(f"nie ma towaru o symbolu '{p.get('symbol')}'")
+        ilosc = _number(p.get("ilosc"), "ilosc")
+        if ilosc is None or ilosc <= 0:
+            raise ValueError(f"niepoprawna ilość dla '{tw.symbol}'")
+        pozycje.append({"tw_id": tw.id, "symbol": tw.symbol, "ilosc": ilosc, "cena": _number(p.get("cena"), "cena")})
+    return {**order, "kh_id": kh_id, "pozycje": pozycje}
+
+# ============================================================================ #
+#                                   BACKENDY
+# ============================================================================ #
+
+class SferaBackend:
+    """Tworzy ZK przez Sferę w podanej (już zalogowanej) sesji."""
+
+    def __init__(self, sub, kategoria_id: Optional[int] = None):
+        self.sub = sub
+        self.kategoria_id = kategoria_id
+
+    def create(self, order: dict) -> str:
+        doc = self.sub.Dokumenty.Dodaj(ZK_TYP)
+        try:
+            doc.KontrahentId = order["kh_id"]
+            if self.kategoria_id:
+                doc.KategoriaId = self.kategoria_id
+            if order["tytul"]:
+                doc.Tytul = order["tytul"]
+            doc.Uwagi = order["uwagi"] or f"Import zamówienia {order['zamowienie']}"
+            for p in order["pozycje"]:
+                poz = doc.Pozycje.Dodaj(p["tw_id"])
+                poz.IloscJm = float(p["ilosc"])
+                if p["cena"] is not None:
+                    poz.CenaNettoPrzedRabatem = float(p["cena"])
+            doc.Zapisz()
+            return str(doc.NumerPelny)
+        finally:
+            try:
+                doc.Zamknij()
+            except Exception:
+                pass
+
+
+class FakeBackend:
+    """Backend testowy do pomiaru przepustowości importu bez Sfery."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.created: list[dict] = []
+
+    def create(self, order: dict) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        self.created.append(order)
+        return f"ZK {len(self.created)}/FAKE"
+
+# ============================================================================ #
+#                                    IMPORT
+# ============================================================================ #
+
+def report_path(path: Path) -> Path:
+    stamp = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+    return path.with_name(f"{path.stem}_wynik_{stamp}.csv")
+
+
+def import_orders(orders: Iterator[dict], index: OrderIndex, backend, report: Path,
+                  dry_run: bool = False) -> dict:
+    """
+    Tworzy ZK dla kolejnych zamówień; raport zapisywany wiersz po wierszu.
+    Zwraca podsumowanie: liczby wg statusu, pozycje, czas i tempo.
+    """
+    stats = {ST_CREATED: 0, ST_INVALID: 0, ST_FAILED: 0, ST_CHECKED: 0, "pozycje": 0}
+    t0 = time.perf_counter()
+    done = 0
+    with report.open("w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(REPORT_COLUMNS)
+        for order in orders:
+            t_item = time.perf_counter()
+            numer, error = "", ""
+            try:
+                resolved = resolve_order(order, index)
+            except ValueError as e:
+                status, error = ST_INVALID, str(e)
+            else:
+                if dry_run:
+                    status = ST_CHECKED
+                else:
+                    try:
+                        numer = backend.create(resolved)
+                        status = ST_CREATED
+                        stats["pozycje"] += len(resolved["pozycje"])
+                    except com_error as e:
+                        status, error = ST_FAILED, str(e)
+            if error:
+                logger.warning("Zamówienie %s: %s (%s)", order["zamowienie"], status, error)
+            stats[status] += 1
+            metryki.current().item(time.perf_counter() - t_item, ok=status in (ST_CREATED, ST_CHECKED))
+            writer.writerow((order["zamowienie"], status, numer, len(order["pozycje"]), error))
+            f.flush()
+            done += 1
+            report_progress(done, 0)
+
+    elapsed = time.perf_counter() - t0
+    stats["zamowienia"] = done
+    stats["czas_s"] = round(elapsed, 3)
+    stats["zamowien_na_s"] = round(done / elapsed, 2) if elapsed > 0 else 0.0
+    stats["pozycji_na_s"] = round(stats["pozycje"] / elapsed, 2) if elapsed > 0 else 0.0
+    logger.info("Import: %d zamówień w %.2f s (%.2f zam./s, %.2f poz./s); utworzono %d, odrzucono %d, błędy %d.",
+                done, elapsed, stats["zamowien_na_s"], stats["pozycji_na_s"],
+                stats[ST_CREATED], stats[ST_INVALID], stats[ST_FAILED])
+    return stats
+
+
+def import_file_sfera(sub, path: Path, report: Path, delimiter: str, kategoria: Optional[str],
+                      dry_run: bool) -> dict:
+    """(wątek COM) Indeks jednym zapytaniem, potem import w tej samej sesji."""
+    with metryki.current().stage("indeks"):
+        index = OrderIndex.load(sub)
+    kategoria_id = None
+    if kategoria:
+        kat = replika.katalog(sub, ["kategorie"]).by("kategorie", "nazwa", kategoria)
+        if kat is None:
+            logger.warning("Nie znaleziono kategorii o nazwie '%s', zostanie użyta domyślna.", kategoria)
+        else:
+            kategoria_id = kat.id
+    backend = SferaBackend(sub, kategoria_id)
+    return import_orders(read_orders(path, delimiter), index, backend, report, dry_run)
+
+# ============================================================================ #
+#                                    MAIN
+# ============================================================================ #
+
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Seryjne tworzenie ZK z pliku zamówień (CSV/JSON/JSONL).")
+    ap.add_argument("--plik", help="Plik zamówień; bez niego - okno wyboru pliku.")
+    ap.add_argument("--separator", default=";", help="Separator kolumn CSV (domyślnie ';').")
+    ap.add_argument("--kategoria", default="Magazyn", help="Nazwa kategorii nowych dokumentów.")
+    ap.add_argument("--raport", help="Plik raportu CSV (domyślnie obok pliku zamówień).")
+    ap.add_argument("--dry-run", dest="dry_run", action="store_true", help="Tylko sprawdzenie danych, bez tworzenia ZK.")
+    ap.add_argument("--fake", action="store_true", help="Backend testowy bez Sfery (pomiar przepustowości).")
+    ap.add_argument("--fake-opoznienie", dest="fake_latency", type=float, default=0.0,
+                    help="Sztuczny czas tworzenia jednego ZK w backendzie testowym [s].")
+    return ap.parse_args(argv)
+
+
+def main(args: argparse.Namespace):
+    path = Path(args.plik) if args.plik else None
+    if path is None:
+        from gui import choose_input_file
+        path = choose_input_file("Wybierz plik zamówień", (("Zamówienia", "*.csv *.json *.jsonl"),
+                                                            ("Wszystkie pliki", "*.*")))
+        if path is None:
+            logger.warning("Anulowano przez użytkownika.")
+            return
+    report = Path(args.raport) if args.raport else report_path(path)
+    logger.info("Import zamówień z %s, raport: %s", path, report)
+
+    if args.fake:
+        backend = FakeBackend(args.fake_latency)
+        import_orders(read_orders(path, args.separator), FakeIndex(), backend, report, args.dry_run)
+        return
+
+    worker = ComWorker()
+    try:
+        worker.submit(import_file_sfera, path, report, args.separator, args.kategoria, args.dry_run).result()
+    except com_error as e:
+        logger.exception("Błąd COM: %s", e)
+    except Exception as e:
+        logger.exception("Błąd krytyczny: %s", e)
+    finally:
+        worker.shutdown()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logfile = logowanie.setup_logging(LOG_PREFIX = LOG_PREFIX)
+    logger.info("Start aplikacji. Logi zapisuję do pliku: %s", logfile)
+    metryki.start("import_zk", LOG_PREFIX)
+    try:
+        main(args)
+    finally:
+        metryki.finish(Path(logfile).parent)
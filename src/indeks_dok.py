@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+"""
+Lokalny indeks dokumentów (SQLite) do szybkiego wyszukiwania po numerze,
+dacie, typie i nazwie kontrahenta - bez okna Wybierz() i filtra miesiąca.
+Numery i kontrahenci w indeksie trigramowym (FTS5, wyszukiwanie dowolnego
+fragmentu), krótkie frazy po prefiksie numeru (indeks NOCASE).
+
+Budowa jednym zapytaniem; odświeżanie przyrostowe jak w replice słowników:
+nowe dokumenty (ID powyżej ostatniego) i sumy kontrolne ostatnich
+REFRESH_DAYS dni w jednej podróży, pełne wiersze zmienionych w drugiej.
+
+    python src\\indeks_dok.py --odswiez
+    python src\\indeks_dok.py --szukaj "FS 12/2024"
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+import logowanie
+import metryki
+from replika import IN_CHUNK
+from sql_pool import ReadPath
+from utils import run_sql_batch
+
+logger = logging.getLogger(__name__)
+
+LOG_PREFIX = "INDEKS_"
+DEFAULT_PATH = Path(os.getenv("SFERA_INDEKS_DOK") or Path("..") / "cache" / "dokumenty.sqlite")
+REFRESH_DAYS = 60           # okno dat sprawdzanych przy odświeżaniu (zmiany i usunięcia)
+DEFAULT_LIMIT = 50
+DOC_TYPE_NAMES = {2: "FS", 9: "MM"}
+
+COLUMNS = ("numer", "typ", "data", "kh_id", "kontrahent")
+
+SOURCE = """
+    SELECT d.dok_Id         AS id,
+           d.dok_NrPelny    AS numer,
+           d.dok_Typ        AS typ,
+           d.dok_DataWyst   AS data,
+           d.dok_OdbiorcaId AS kh_id,
+           a.adr_Nazwa      AS kontrahent
+      FROM dok__Dokument d
+      LEFT JOIN adr__Ewid a ON a.adr_IdObiektu = d.dok_OdbiorcaId AND a.adr_TypAdresu = 1
+"""
+
+_CHK = f"BINARY_CHECKSUM({', '.join('s.' + c for c in COLUMNS)})"
+_DATE_TERM = re.compile(r"^\d{4}-\d{2}(-\d{2})?$")
+
+
+def _rows_sql(where: str = "") -> str:
+    return f"SELECT s.*, {_CHK} AS chk FROM ({SOURCE.strip()}) s" + (f" WHERE {where}" if where else "")
+
+
+def _checksum_sql(where: str) -> str:
+    return f"SELECT s.id, {_CHK} AS chk FROM ({SOURCE.strip()}) s WHERE {where}"
+
+
+def _date(v) -> Optional[str]:
+    if v is None:
+        return None
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()[:10]
+    return str(v)[:10]
+
+
+def _row(r: dict) -> tuple:
+    return (int(r["id"]), None if r["numer"] is None else str(r["numer"]),
+            None if r["typ"] is None else int(r["typ"]), _date(r["data"]),
+            None if r["kh_id"] is None else int(r["kh_id"]),
+            None if r["kontrahent"] is None else str(r["kontrahent"]), int(r["chk"]))
+
+
+def type_name(typ: Optional[int]) -> str:
+    return DOC_TYPE_NAMES.get(typ, str(typ) if typ is not None else "")
+
+# ============================================================================ #
+#                                   INDEKS
+# ============================================================================ #
+
+class Indeks:
+    """Plik SQLite z indeksem dokumentów; bezpieczny dla wielu wątków (jedno połączenie pod blokadą)."""
+
+    def __init__(self, path: str | Path = DEFAULT_PATH):
+        self.path = Path(path)
+        if str(path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self.fts = False
+        self._init_schema()
+
+    def _init_schema(self) -> None:
+        with self._lock, self._db:
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, synced TEXT, rows INTEGER)")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS dokumenty (
+                    id INTEGER PRIMARY KEY, numer TEXT COLLATE NOCASE, typ INTEGER, data TEXT,
+                    kh_id INTEGER, kontrahent TEXT COLLATE NOCASE, chk INTEGER)""")
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_dokumenty_numer ON dokumenty (numer)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_dokumenty_data ON dokumenty (data)")
+            # trigramy (SQLite >= 3.34); starsze - wyszukiwanie LIKE po całej tabeli
+            try:
+                self._db.execute("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS dokumenty_fts USING fts5(
+                        numer, kontrahent, content='dokumenty', content_rowid='id', tokenize='trigram')""")
+            except sqlite3.OperationalError as e:
+                logger.debug("Indeks trigramowy niedostępny (%s) – wyszukiwanie LIKE.", e)
+                return
+            self.fts = True
+
+    # ------------------------------------------------------------- synchronizacja
+
+    def synced(self) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT synced FROM meta WHERE name = 'dokumenty'").fetchone()
+        return row["synced"] if row else None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM dokumenty").fetchone()[0]
+
+    def sync(self, src, full: bool = False, days: int = REFRESH_DAYS) -> dict:
+        """
+        Odświeża indeks z bazy Subiekta (src: sesja albo ReadPath). Pusty indeks
+        (albo full) - jedno zapytanie o wszystkie dokumenty. Zwraca {"nowe", "zmienione", "usuniete"}.
+        """
+        t0 = time.perf_counter()
+        full = full or self.synced() is None
+        if full:
+            rows = run_sql_batch(src, {"rows": _rows_sql()})["rows"]
+            stats = {"nowe": len(rows), "zmienione": 0, "usuniete": 0}
+            removed: list[int] = []
+        else:
+            since = (date.today() - timedelta(days=days)).isoformat()
+            with self._lock:
+                max_id = self._db.execute("SELECT COALESCE(MAX(id), 0) FROM dokumenty").fetchone()[0]
+                local = {r["id"]: r["chk"] for r in
+                         self._db.execute("SELECT id, chk FROM dokumenty WHERE data >= ?", (since,))}
+            # 1) nowe dokumenty + sumy kontrolne okna dat - jedna podróż
+            res = run_sql_batch(src, {
+                "new": _rows_sql(f"s.id > {int(max_id)}"),
+                "chk": _checksum_sql(f"s.data >= '{since}' AND s.id <= {int(max_id)}"),
+            })
+            remote = {int(r["id"]): int(r["chk"]) for r in res["chk"]}
+            # brak w oknie: usunięty albo z datą przeniesioną przed okno - rozstrzyga druga podróż
+            gone = [i for i in local if i not in remote]
+            fetch = [i for i, c in remote.items() if local.get(i) != c] + gone
+            # 2) pełne wiersze zmienionych - druga (i ostatnia) podróż
+            rows = list(res["new"])
+            if fetch:
+                parts = run_sql_batch(src, {
+                    f"rows:{n}": _rows_sql(f"s.id IN ({', '.join(str(i) for i in fetch[n:n + IN_CHUNK])})")
+                    for n in range(0, len(fetch), IN_CHUNK)})
+                rows += [r for part in parts.values() for r in part]
+            found = {int(r["id"]) for r in rows}
+            removed = [i for i in gone if i not in found]
+            stats = {"nowe": len(res["new"]), "zmienione": len(fetch) - len(removed), "usuniete": len(removed)}
+
+        now = datetime.now().isoformat(timespec="seconds")
+        data = [_row(r) for r in rows]
+        with self._lock, self._db:
+            if full:
+                self._db.execute("DELETE FROM dokumenty")
+            else:
+                # indeks trigramowy (external content) aktualizowany jawnie: stare wartości out, nowe in
+                drop = [(d[0],) for d in data] + [(i,) for i in removed]
+                if self.fts:
+                    self._db.executemany(
+                        "INSERT INTO dokumenty_fts (dokumenty_fts, rowid, numer, kontrahent) "
+                        "SELECT 'delete', id, numer, kontrahent FROM dokumenty WHERE id = ?", drop)
+                self._db.executemany("DELETE FROM dokumenty WHERE id = ?", drop)
+            self._db.executemany(
+                f"INSERT INTO dokumenty (id, {', '.join(COLUMNS)}, chk) VALUES (?, ?, ?, ?, ?, ?, ?)", data)
+            if self.fts and full:
+                self._db.execute("INSERT INTO dokumenty_fts (dokumenty_fts) VALUES ('rebuild')")
+            elif self.fts:
+                self._db.executemany("INSERT INTO dokumenty_fts (rowid, numer, kontrahent) VALUES (?, ?, ?)",
+                                     [(d[0], d[1], d[5]) for d in data])
+            count = self._db.execute("SELECT COUNT(*) FROM dokumenty").fetchone()[0]
+            self._db.execute("INSERT OR REPLACE INTO meta (name, synced, rows) VALUES ('dokumenty', ?, ?)",
+                             (now, count))
+        logger.info("Indeks dokumentów %s w %.2f s: +%d/~%d/-%d (razem %d).",
+                    "zbudowany" if full else "odświeżony", time.perf_counter() - t0,
+                    stats["nowe"], stats["zmienione"], stats["usuniete"], count)
+        return stats
+
+    # ------------------------------------------------------------- wyszukiwanie
+
+    def search(self, text: str, limit: int = DEFAULT_LIMIT, typ: Optional[int] = None) -> list[dict]:
+        """
+        Dokumenty pasujące do wszystkich słów frazy: fragment numeru lub nazwy
+        kontrahenta, data 'RRRR-MM[-DD]'. Najpierw numer równy frazie, potem
+        zaczynający się od niej, dalej od najnowszych.
+        Zwraca [{"id", "numer", "typ", "data", "kh_id", "kontrahent"}].
+        """
+        text = (text or "").strip()
+        if not text:
+            return []
+        terms = text.split()
+        where, params, fts_terms = [], [], []
+        for term in terms:
+            if _DATE_TERM.match(term):
+                where.append("d.data LIKE ?")
+                params.append(term + "%")
+            elif self.fts and len(term) >= 3:
+                fts_terms.append('"' + term.replace('"', '""') + '"')
+            else:
+                # krótka fraza (1-2 znaki) sama: prefiks (indeks NOCASE); w zdaniu albo bez FTS: fragment
+                pattern = f"{_like(term)}%" if len(terms) == 1 and len(term) < 3 else f"%{_like(term)}%"
+                where.append(r"(d.numer LIKE ? ESCAPE '\' OR d.kontrahent LIKE ? ESCAPE '\')")
+                params += [pattern, pattern]
+        if typ is not None:
+            where.append("d.typ = ?")
+            params.append(int(typ))
+
+        source = "dokumenty d"
+        if fts_terms:
+            source = "dokumenty_fts f JOIN dokumenty d ON d.id = f.rowid"
+            where.insert(0, "dokumenty_fts MATCH ?")
+            params.insert(0, " AND ".join(fts_terms))
+        cond = " AND ".join(where)
+
+        # kandydaci z zapytań zatrzymujących się po 'limit' wierszach (indeksy numer/data,
+        # w FTS - rowid malejąco, czyli najnowsze ID) zamiast sortowania wszystkich trafień
+        cols = "d.id, d.numer, d.typ, d.data, d.kh_id, d.kontrahent"
+        sel = f"SELECT {cols} FROM {source} WHERE {cond}"
+        newest = "f.rowid DESC" if fts_terms else "d.data DESC, d.id DESC"
+        # numer zaczynający się od całej frazy zawiera wszystkie jej słowa - bez FTS, sam indeks numeru
+        typ_cond, typ_params = ("AND d.typ = ?", (int(typ),)) if typ is not None else ("", ())
+        with self._lock:
+            prefix = self._db.execute(
+                f"SELECT {cols} FROM dokumenty d WHERE d.numer LIKE ? ESCAPE '\\' {typ_cond} "
+                "ORDER BY d.numer LIMIT ?",
+                (f"{_like(text)}%", *typ_params, int(limit))).fetchall()
+            recent = self._db.execute(f"{sel} ORDER BY {newest} LIMIT ?",
+                                      (*params, int(limit))).fetchall()
+        key = text.casefold()
+        found = {r["id"]: dict(r) for r in (*prefix, *recent)}
+        ranked = sorted(found.values(), key=lambda r: (
+            (r["numer"] or "").casefold() != key,
+            not (r["numer"] or "").casefold().startswith(key),
+            _desc(r["data"]), -r["id"]))
+        return ranked[:limit]
+
+    def get(self, id_: int) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute("SELECT id, numer, typ, data, kh_id, kontrahent FROM dokumenty WHERE id = ?",
+                                   (int(id_),)).fetchone()
+        return dict(row) if row else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def _desc(data: Optional[str]) -> tuple:
+    """Klucz sortowania malejąco po dacie ISO (brak daty na końcu)."""
+    return tuple(-ord(c) for c in data) if data else (1,)
+
+
+def _like(term: str) -> str:
+    """Fraza do LIKE ... ESCAPE '\\': '%' i '_' dosłownie, nie jako znaki wieloznaczne."""
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+# ============================================================================ #
+#                          DOMYŚLNY INDEKS PROCESU
+# ============================================================================ #
+
+_indeks: Optional[Indeks] = None
+_synced = False
+_init_lock = threading.Lock()
+
+
+def indeks(src=None) -> Indeks:
+    """
+    Indeks procesu; przy pierwszym użyciu z src - odświeżenie przyrostowe.
+    Gdy serwer nie odpowiada, a indeks ma dane - pracuje na nich (ostrzeżenie w logu).
+    """
+    global _indeks, _synced
+    with _init_lock:
+        if _indeks is None:
+            _indeks = Indeks()
+        if src is not None and not _synced:
+            try:
+                with metryki.current().stage("indeks"):
+                    _indeks.sync(src)
+            except Exception as e:
+                if _indeks.synced() is None:
+                    raise
+                logger.warning("Nie udało się odświeżyć indeksu dokumentów (%s) – używam danych lokalnych.", e)
+            _synced = True
+    return _indeks
+
+
+def search(text: str, limit: int = DEFAULT_LIMIT, typ: Optional[int] = None) -> list[dict]:
+    """Wyszukiwanie w indeksie procesu (bez odświeżania)."""
+    return indeks().search(text, limit, typ)
+
+# ============================================================================ #
+#                                    MAIN
+# ============================================================================ #
+
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Indeks dokumentów: odświeżenie i wyszukiwanie.")
+    ap.add_argument("--odswiez", action="store_true", help="Odśwież indeks przyrostowo z bazy.")
+    ap.add_argument("--pelna", action="store_true", help="Zbuduj indeks od nowa (jedno zapytanie).")
+    ap.add_argument("--szukaj", help="Fraza: fragment numeru lub nazwy kontrahenta, data RRRR-MM[-DD].")
+    ap.add_argument("--typ", type=int, help="Tylko dokumenty danego typu (np. 2 = FS, 9 = MM).")
+    ap.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    return ap.parse_args(argv)
+
+
+def main(args: argparse.Namespace) -> None:
+    idx = Indeks()
+    if args.odswiez or args.pelna or idx.synced() is None:
+        # odczyt bez logowania do Sfery; sesja COM tylko, gdy brak bezpośredniego SQL
+        worker = None
+
+        def com():
+            nonlocal worker
+            if worker is None:
+                from com_worker import ComWorker
+                worker = ComWorker()
+            return worker
+
+        reads = ReadPath.from_env(
+            fallback=lambda sql: com().run_sql_async(sql).result(),
+            fallback_batch=lambda queries: com().submit(run_sql_batch, queries).result(),
+        )
+        try:
+            idx.sync(reads, full=args.pelna)
+        finally:
+            reads.close()
+            if worker is not None:
+                worker.shutdown()
+    if args.szukaj:
+        t0 = time.perf_counter()
+        found = idx.search(args.szukaj, args.limit, args.typ)
+        for d in found:
+            logger.info("%8d  %-4s %-24s %s  %s", d["id"], type_name(d["typ"]), d["numer"], d["data"],
+                        d["kontrahent"] or "")
+        logger.info("Znaleziono %d dokumentów w %.1f ms.", len(found), (time.perf_counter() - t0) * 1000)
+    idx.close()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logfile = logowanie.setup_logging(LOG_PREFIX=LOG_PREFIX)
+    metryki.start("indeks_dok", LOG_PREFIX)
+    try:
+        main(args)
+    finally:
+        metryki.finish(Path(logfile).parent)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Dziennik zapisów masowych zmian (JSON Lines). Każdy wpis trafia na dysk
+(flush + fsync) zaraz po zapisie dokumentu, więc przerwany przebieg można
+wznowić od ostatniego zatwierdzonego dokumentu albo cofnąć.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from logowanie import create_unique
+
+# Statusy wpisów
+ST_SAVED = "zapisano"
+ST_FAILED = "blad"
+ST_UNDONE = "cofnieto"
+
+# Dokument uznany za obsłużony przy wznawianiu (dokumenty bez różnicy nie trafiają do planu)
+DONE_STATUSES = (ST_SAVED,)
+
+
+class Journal:
+    """
+    Pierwszy wiersz to nagłówek przebiegu ("plan": lista ID i parametry),
+    kolejne - wyniki dla dokumentów: id, numer, stara i nowa wartość, status.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._f = None
+
+    @classmethod
+    def create(cls, folder: str | Path, prefix: str, plan: dict) -> "Journal":
+        stamp = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+        j = cls(create_unique(folder, f"{prefix}dziennik_{stamp}", ".jsonl"))
+        j._write({"plan": plan, "created": datetime.now().isoformat(timespec="seconds")})
+        return j
+
+    # ------------------------------------------------------------- zapis
+
+    def record(self, doc_id: int, numer: str, old, new, status: str, **extra) -> None:
+        self._write({
+            "id": int(doc_id),
+            "numer": numer,
+            "old": old,
+            "new": new,
+            "status": status,
+            "ts": datetime.now().isoformat(timespec="seconds"),
+            **extra,
+        })
+
+    def _write(self, entry: dict) -> None:
+        if self._f is None:
+            self._f = self.path.open("a", encoding="utf-8")
+            if self._f.tell() and not self._ends_with_newline():
+                self._f.write("\n")    # urwany ostatni wiersz po awarii
+        self._f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def _ends_with_newline(self) -> bool:
+        with self.path.open("rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def close(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ------------------------------------------------------------- odczyt
+
+    def entries(self) -> list[dict]:
+        """Wszystkie wpisy dokumentów (bez nagłówka); urwany ostatni wiersz jest pomijany."""
+        out = []
+        for entry in self._read():
+            if "plan" not in entry:
+                out.append(entry)
+        return out
+
+    def plan(self) -> Optional[dict]:
+        for entry in self._read():
+            if "plan" in entry:
+                return entry["plan"]
+        return None
+
+    def last_status(self) -> dict[int, dict]:
+        """Ostatni wpis per dokument."""
+        return {int(e["id"]): e for e in self.entries()}
+
+    def done_ids(self) -> set[int]:
+        return {i for i, e in self.last_status().items() if e["status"] in DONE_STATUSES}
+
+    def pending_ids(self) -> list[int]:
+        """ID z planu, których nie zatwierdzono - w kolejności planu."""
+        plan = self.plan() or {}
+        done = self.done_ids()
+        return [int(i) for i in plan.get("ids", []) if int(i) not in done]
+
+    def undo_entries(self) -> list[dict]:
+        """Zapisane (i jeszcze niecofnięte) zmiany, od najnowszej."""
+        entries = self.entries()
+        last = {int(e["id"]): e for e in entries}
+        return [e for e in reversed(entries)
+                if e["status"] == ST_SAVED and last[int(e["id"])] is e]
+
+    def _read(self):
+        if not self.path.exists():
+            return
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
@@ -1,13 +1,20 @@
 import os
+import shlex
 import subprocess
 import sys
+import threading
 import tkinter as tk
 from pathlib import Path
 from tkinter import messagebox, ttk
 
+import indeks_dok
+from scheduler import STATUS_ENV, Job, JobScheduler
+from sql_pool import ReadPath
+
 # ===== KONFIGURACJA APLIKACJI =====
 # Możesz dopisać kolejne pozycje. Ścieżki względne liczone są od folderu tego pliku.
 # 'python' (opcjonalny) pozwala wskazać inny interpreter, np. 32-bitowy venv.
+# 'sfera' (domyślnie True) - narzędzie zajmuje stanowisko licencji Sfery w kolejce zadań.
 APPS = [
     {
         "id": "drukuj_fs",
@@ -23,12 +30,23 @@ APPS = [
         "id": "wydruk_pdf",
         "label": "Seryjne drukowanie PDF",
         "script": "druk_pdf.py",
+        "sfera": False,
     },
     {
         "id": "stworz_zk",
         "label": "Tworzenie dokumentu ZK",
         "script": "stworz_zk.py",
     },
+    {
+        "id": "import_zk",
+        "label": "Import zamówień ZK z pliku",
+        "script": "import_zk.py",
+    },
+    {
+        "id": "raporty",
+        "label": "Raporty zbiorcze FS/MM",
+        "script": "raporty.py",
+    },
 ]
 
 # ====== LAUNCHER ======
@@ -39,40 +57,206 @@ def resolve_script_path(p: str) -> Path:
     path = Path(p)
     return path if path.is_absolute() else (BASE_DIR / path)
 
-def launch_app(app: dict):
-    try:
-        script_path = resolve_script_path(app["script"])
-        if not script_path.exists():
-            raise FileNotFoundError(f"Nie znaleziono skryptu: {script_path}")
-
-        # Interpreter: domyślnie ten sam, ale można nadpisać w configu.
-        python_exe = Path(app.get("python") or sys.executable)
-        if not python_exe.exists():
-            raise FileNotFoundError(f"Nie znaleziono interpretera Pythona: {python_exe}")
-
-        args = list(map(str, app.get("args", [])))
-        cwd = Path(app.get("cwd") or script_path.parent)
-        env = os.environ.copy()
-        env.update(app.get("env", {}))
-
-        creationflags = getattr(subprocess, "CREATE_NEW_CONSOLE", 0)  # Windows: nowe okno konsoli
-
-        proc = subprocess.Popen(
-            [str(python_exe), str(script_path), *args],
-            cwd=str(cwd),
-            env=env,
-            creationflags=creationflags,
-        )
-        # messagebox.showinfo("Uruchomiono",
-        #                     f"'{app['label']}' wystartowała.\nPID: {proc.pid}\n\n"
-        #                     f"Skrypt: {script_path}\nInterpreter: {python_exe}")
-    except Exception as e:
-        messagebox.showerror("Błąd uruchamiania", str(e))
-
-def build_ui(root: tk.Tk):
+def start_process(app: dict, extra_args: list[str] | None = None,
+                  extra_env: dict | None = None) -> subprocess.Popen:
+    script_path = resolve_script_path(app["script"])
+    if not script_path.exists():
+        raise FileNotFoundError(f"Nie znaleziono skryptu: {script_path}")
+
+    # Interpreter: domyślnie ten sam, ale można nadpisać w configu.
+    python_exe = Path(app.get("python") or sys.executable)
+    if not python_exe.exists():
+        raise FileNotFoundError(f"Nie znaleziono interpretera Pythona: {python_exe}")
+
+    args = list(map(str, app.get("args", []))) + list(map(str, extra_args or []))
+    cwd = Path(app.get("cwd") or script_path.parent)
+    env = os.environ.copy()
+    env.update(app.get("env", {}))
+    env.update(extra_env or {})
+
+    creationflags = getattr(subprocess, "CREATE_NEW_CONSOLE", 0)  # Windows: nowe okno konsoli
+
+    return subprocess.Popen(
+        [str(python_exe), str(script_path), *args],
+        cwd=str(cwd),
+        env=env,
+        creationflags=creationflags,
+    )
+
+def launch_job(job: Job) -> subprocess.Popen:
+    """Uruchamia zadanie z kolejki; postęp narzędzie zapisuje do job.status_file."""
+    return start_process(job.app, job.args, {STATUS_ENV: job.status_file})
+
+def split_args(text: str) -> list[str]:
+    """
+    Parametry z pola tekstowego jak w wierszu poleceń Windows: cudzysłowy grupują
+    i są zdejmowane, '\\' bez zmian (shlex POSIX bez znaku ucieczki).
+    """
+    lex = shlex.shlex(text, posix=True)
+    lex.whitespace_split = True
+    lex.commenters = ""
+    lex.escape = ""
+    return list(lex)
+
+def _fmt_elapsed(seconds: float) -> str:
+    m, s = divmod(int(seconds), 60)
+    h, m = divmod(m, 60)
+    return f"{h:d}:{m:02d}:{s:02d}"
+
+def build_queue_ui(parent: ttk.Frame, scheduler: JobScheduler) -> tk.StringVar:
+    """Panel kolejki: dodawanie zadań z parametrami + podgląd statusu na żywo; zwraca pole parametrów."""
+    ttk.Label(parent, text=f"Kolejka zadań (stanowiska Sfery: {scheduler.seats}):",
+              font=("Segoe UI", 11, "bold")).pack(anchor="w", pady=(12, 6))
+
+    add = ttk.Frame(parent)
+    add.pack(fill="x")
+    labels = [a["label"] for a in APPS]
+    app_var = tk.StringVar(value=labels[0] if labels else "")
+    ttk.Combobox(add, textvariable=app_var, values=labels, state="readonly", width=30).pack(side="left")
+    args_var = tk.StringVar()
+    ttk.Entry(add, textvariable=args_var).pack(side="left", fill="x", expand=True, padx=6)
+
+    def add_job():
+        app = next((a for a in APPS if a["label"] == app_var.get()), None)
+        if app is None:
+            return
+        try:
+            args = split_args(args_var.get())
+        except ValueError as e:
+            messagebox.showerror("Błędne parametry", str(e))
+            return
+        scheduler.submit(app, args)
+        args_var.set("")
+        refresh()
+
+    ttk.Button(add, text="Dodaj do kolejki", command=add_job).pack(side="left")
+
+    columns = ("nr", "narzedzie", "parametry", "status", "czas", "postep", "szybkosc")
+    tree = ttk.Treeview(parent, columns=columns, show="headings", height=6)
+    for col, text, width in (
+        ("nr", "#", 40), ("narzedzie", "Narzędzie", 170), ("parametry", "Parametry", 160),
+        ("status", "Status", 90), ("czas", "Czas", 70), ("postep", "Postęp", 80),
+        ("szybkosc", "poz./s", 60),
+    ):
+        tree.heading(col, text=text)
+        tree.column(col, width=width, anchor="w" if col in ("narzedzie", "parametry") else "center")
+    tree.pack(fill="both", expand=True, pady=(6, 0))
+
+    def cancel_selected():
+        for iid in tree.selection():
+            job = next((j for j in scheduler.jobs if str(j.id) == iid), None)
+            if job is not None:
+                scheduler.cancel(job)
+        refresh()
+
+    ttk.Button(parent, text="Anuluj zaznaczone", command=cancel_selected).pack(anchor="e", pady=(6, 0))
+
+    def refresh():
+        for job in scheduler.jobs:
+            done, total = job.progress
+            values = (
+                job.id,
+                job.app["label"],
+                " ".join(job.args),
+                f"{job.status}: {job.error}" if job.error else job.status,
+                _fmt_elapsed(job.elapsed) if job.started else "",
+                f"{done}/{total}" if total else "",
+                f"{job.throughput:.2f}" if done else "",
+            )
+            iid = str(job.id)
+            if tree.exists(iid):
+                tree.item(iid, values=values)
+            else:
+                tree.insert("", "end", iid=iid, values=values)
+
+    def tick():
+        refresh()
+        parent.after(500, tick)
+
+    tick()
+    return args_var
+
+def refresh_index_async(idx: indeks_dok.Indeks, state: dict) -> None:
+    """Odświeżenie indeksu dokumentów w tle - tylko bezpośredni SQL (launcher nie loguje się do Sfery)."""
+    def work():
+        state["rows"] = idx.count()
+        reads = ReadPath.from_env()
+        if reads is None:
+            state["status"] = "bez odświeżania (brak bezpośredniego SQL)"
+            return
+        try:
+            state["status"] = "odświeżanie..."
+            idx.sync(reads)
+            state["status"] = "odświeżony"
+        except Exception as e:
+            state["status"] = f"błąd odświeżania: {e}"
+        finally:
+            reads.close()
+            state["rows"] = idx.count()
+
+    threading.Thread(target=work, name="indeks-dok", daemon=True).start()
+
+def build_search_ui(parent: ttk.Frame, args_var: tk.StringVar):
+    """Wyszukiwarka dokumentów (indeks_dok) z podpowiedziami; wybrane trafiają do parametrów jako --id."""
+    ttk.Label(parent, text="Szukaj dokumentu (numer, kontrahent, data RRRR-MM):",
+              font=("Segoe UI", 11, "bold")).pack(anchor="w", pady=(12, 6))
+    idx = indeks_dok.Indeks()
+    state = {"status": "", "rows": 0}
+    refresh_index_async(idx, state)
+
+    row = ttk.Frame(parent)
+    row.pack(fill="x")
+    query = tk.StringVar()
+    entry = ttk.Entry(row, textvariable=query)
+    entry.pack(side="left", fill="x", expand=True)
+    info = ttk.Label(row, foreground="#666")
+    info.pack(side="left", padx=6)
+
+    columns = ("numer", "typ", "data", "kontrahent")
+    tree = ttk.Treeview(parent, columns=columns, show="headings", height=5)
+    for col, text, width in (("numer", "Numer", 150), ("typ", "Typ", 50), ("data", "Data", 90),
+                             ("kontrahent", "Kontrahent", 260)):
+        tree.heading(col, text=text)
+        tree.column(col, width=width, anchor="w" if col in ("numer", "kontrahent") else "center")
+    tree.pack(fill="both", expand=True, pady=(6, 0))
+
+    pending = {"after": None}
+
+    def search():
+        pending["after"] = None
+        for iid in tree.get_children():
+            tree.delete(iid)
+        found = idx.search(query.get(), limit=50)
+        for d in found:
+            tree.insert("", "end", iid=str(d["id"]), values=(
+                d["numer"], indeks_dok.type_name(d["typ"]), d["data"] or "", d["kontrahent"] or ""))
+
+    def on_key(_event=None):
+        # podpowiedzi po krótkiej przerwie w pisaniu, nie przy każdym klawiszu
+        if pending["after"] is not None:
+            parent.after_cancel(pending["after"])
+        pending["after"] = parent.after(150, search)
+
+    entry.bind("<KeyRelease>", on_key)
+
+    def use_selected(_event=None):
+        ids = [f"--id {iid}" for iid in tree.selection()]
+        if ids:
+            args_var.set(" ".join([args_var.get().strip(), *ids]).strip())
+
+    tree.bind("<Double-1>", use_selected)
+    ttk.Button(parent, text="Dodaj zaznaczone do parametrów (--id)", command=use_selected).pack(anchor="e", pady=(6, 0))
+
+    def tick():
+        info.configure(text=f"{state['rows']} dok., {state['status'] or 'gotowy'}")
+        parent.after(1000, tick)
+
+    tick()
+
+def build_ui(root: tk.Tk, scheduler: JobScheduler):
     root.title("Sfera apps launcher by DevNorman")
-    root.geometry("420x260")
-    root.minsize(380, 220)
+    root.geometry("720x700")
+    root.minsize(560, 420)
     root.lift()
     root.attributes("-topmost", True)
     root.after(250, lambda: root.attributes("-topmost", False))
@@ -86,12 +270,13 @@ def build_ui(root: tk.Tk):
 
     # siatka przycisków
     grid = ttk.Frame(container)
-    grid.pack(fill="both", expand=True)
+    grid.pack(fill="x")
 
     max_cols = 2  # ile kolumn z przyciskami
     for i, app in enumerate(APPS):
         r, c = divmod(i, max_cols)
-        btn = ttk.Button(grid, text=app["label"], width=28, command=lambda a=app: launch_app(a))
+        # przez kolejkę: uruchomienie z przycisku też zajmuje stanowisko licencji Sfery
+        btn = ttk.Button(grid, text=app["label"], width=28, command=lambda a=app: scheduler.submit(a))
         btn.grid(row=r, column=c, padx=6, pady=6, sticky="nsew")
 
     # elastyczna siatka
@@ -101,6 +286,10 @@ def build_ui(root: tk.Tk):
     for j in range(max_cols):
         grid.columnconfigure(j, weight=1)
 
+    # kolejka zadań + wyszukiwarka dokumentów (wybrane jako --id w parametrach zadania)
+    args_var = build_queue_ui(container, scheduler)
+    build_search_ui(container, args_var)
+
     # pasek dolny
     bottom = ttk.Frame(container)
     bottom.pack(fill="x", pady=(8, 0))
@@ -115,8 +304,10 @@ def main():
         # style.theme_use("vista")
     except Exception:
         pass
-    build_ui(root)
+    scheduler = JobScheduler(launch=launch_job)
+    build_ui(root, scheduler)
     root.mainloop()
+    scheduler.stop()
 
 if __name__ == "__main__":
     main()
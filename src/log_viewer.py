@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Odczyt dużych plików logu bez wczytywania całości: plik mapowany w pamięci
+(mmap), wyszukiwanie po bajtach (poziom, numer dokumentu), ogon pliku
+czytany od końca. Okno podglądu jest w gui.show_log_viewer().
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import re
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+from logowanie import RUN_MARKER
+
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+ENCODING = "utf-8"
+CHUNK = 1 << 20         # [B] okno przeszukiwania od końca pliku
+
+
+@contextmanager
+def mapped(path: str | Path) -> Iterator[Optional[mmap.mmap]]:
+    """mmap tylko do odczytu; None dla pustego/nieistniejącego pliku."""
+    try:
+        f = open(path, "rb")
+    except OSError:
+        yield None
+        return
+    try:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:      # pusty plik
+            yield None
+            return
+        try:
+            yield mm
+        finally:
+            mm.close()
+    finally:
+        f.close()
+
+
+def _line_at(mm: mmap.mmap, pos: int, start: int = 0) -> tuple[int, int]:
+    """Granice [początek, koniec) wiersza zawierającego bajt pos."""
+    b = mm.rfind(b"\n", start, pos) + 1
+    if b == 0:
+        b = start
+    e = mm.find(b"\n", pos)
+    return b, (len(mm) if e < 0 else e)
+
+
+def _decode(raw: bytes) -> str:
+    return raw.decode(ENCODING, errors="replace").rstrip("\r")
+
+
+def find_run_start(mm: mmap.mmap, hint: int = 0, pid: Optional[int] = None) -> int:
+    """
+    Początek przebiegu tego procesu (znacznik z logowanie.setup_logging z jego pid):
+    pierwszy taki znacznik od hint (logowanie.run_offset). Plik dzienny dzielą narzędzia
+    z kolejki, więc późniejsze znaczniki należą do innych procesów.
+    """
+    tag = f" pid={os.getpid() if pid is None else pid} ".encode()
+    pos = mm.find(RUN_MARKER.encode(), hint)
+    while pos >= 0:
+        b, e = _line_at(mm, pos)
+        if tag in mm[b:e]:
+            return b
+        pos = mm.find(RUN_MARKER.encode(), e)
+    return hint
+
+
+def _level_needles(min_level: Optional[str]) -> list[bytes]:
+    if not min_level:
+        return []
+    i = LEVELS.index(min_level.upper())
+    return [f"[{lvl}]".encode() for lvl in LEVELS[i:]]
+
+
+def scan(path: str | Path, start: int = 0, min_level: Optional[str] = None, text: str = "",
+         limit: int = 2000) -> tuple[list[str], bool]:
+    """
+    Wiersze z [start, koniec pliku) pasujące do filtra: poziom >= min_level
+    i/lub fragment tekstu (np. numer dokumentu, bez rozróżniania wielkości liter,
+    także polskich). Zwraca ostatnie 'limit' pasujących wierszy i znacznik,
+    czy wynik obcięto.
+    Przeszukiwanie idzie od końca pliku oknami po CHUNK bajtów (find albo wzorzec re
+    na bajtach) i kończy się po znalezieniu 'limit' wierszy - plik nie jest czytany
+    ani dekodowany w całości.
+    """
+    with mapped(path) as mm:
+        if mm is None:
+            return [], False
+        start = max(0, min(start, len(mm)))
+        needles = _level_needles(min_level)
+        if not needles and not text:
+            return _tail(mm, start, limit)
+
+        # najrzadszy warunek wyszukiwany w oknie, pozostałe sprawdzane w znalezionym wierszu
+        primary = [_text_needle(text)] if text else needles
+        out: list[str] = []
+        end = len(mm)
+        while end > start and len(out) <= limit:
+            b = max(start, end - CHUNK)
+            if b > start:
+                b = mm.rfind(b"\n", start, b) + 1 or start     # okno od początku wiersza
+            window = mm[b:end]
+            lines: dict[int, int] = {}
+            for needle in primary:
+                _collect(window, needle, 0, lines)
+            found = []
+            for lb in sorted(lines):
+                raw = window[lb:lines[lb]]
+                if text and needles and not any(n in raw for n in needles):
+                    continue
+                found.append(_decode(raw))
+            out[:0] = found
+            end = b
+        return out[-limit:], len(out) > limit
+
+
+def _text_needle(text: str) -> bytes | re.Pattern[bytes]:
+    """
+    Tekst do wyszukania bez względu na wielkość liter: wzorzec z wariantami każdej
+    litery (zakodowanymi jak plik, więc działa też dla ą/Ą, ó/Ó); bez liter - same bajty.
+    """
+    parts, cased = [], False
+    for ch in text:
+        forms = sorted({ch, ch.lower(), ch.upper()})
+        cased |= len(forms) > 1
+        parts.append(b"(?:" + b"|".join(re.escape(f.encode(ENCODING)) for f in forms) + b")")
+    return re.compile(b"".join(parts)) if cased else text.encode(ENCODING)
+
+
+def _find(mm: mmap.mmap | bytes, needle: bytes | re.Pattern[bytes], pos: int) -> int:
+    if isinstance(needle, bytes):
+        return mm.find(needle, pos)
+    m = needle.search(mm, pos)
+    return m.start() if m else -1
+
+
+def _collect(mm: mmap.mmap | bytes, needle: bytes | re.Pattern[bytes], start: int, lines: dict[int, int]) -> None:
+    pos = _find(mm, needle, start)
+    while pos >= 0:
+        b, e = _line_at(mm, pos, start)
+        lines[b] = e
+        pos = _find(mm, needle, e)
+
+
+def _tail(mm: mmap.mmap, start: int, limit: int) -> tuple[list[str], bool]:
+    """Ostatnie 'limit' wierszy od końca pliku (nie dalej niż start)."""
+    end = len(mm)
+    if end > start and mm[end - 1:end] == b"\n":
+        end -= 1
+    out = []
+    while end > start and len(out) < limit:
+        b = mm.rfind(b"\n", start, end) + 1
+        if b == 0:
+            b = start
+        out.append(_decode(mm[b:end]))
+        end = b - 1
+    return out[::-1], end > start
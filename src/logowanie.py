@@ -1,16 +1,39 @@
 # ============================================================================ #
-#                                  LOGOWANIE                                   
+#                                  LOGOWANIE
 # ============================================================================ #
 import builtins
+import gzip
 import logging
 import os
+import re
+import shutil
 import sys
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
 
+# Rotacja: bieżący plik dzienny większy niż LOG_MAX_MB jest odkładany przy starcie,
+# pliki z poprzednich dni pakowane do logs/archiwum/*.gz (w tle), archiwa starsze
+# niż LOG_KEEP_DAYS usuwane (0 = bez usuwania).
+LOG_MAX_MB = float(os.getenv("SFERA_LOG_MAX_MB") or 50)
+LOG_KEEP_DAYS = int(os.getenv("SFERA_LOG_KEEP_DAYS") or 90)
+ARCHIVE_DIR = "archiwum"
+STALE_TMP_S = 600       # [s] niedokończone archiwum .tmp starsze niż to - porzucone, do usunięcia
+
+# Folder logów (oraz dzienników, metryk i list nieudanych); SFERA_LOG_DIR - np. osobny folder per baza
+LOG_DIR = os.getenv("SFERA_LOG_DIR") or os.path.join("..", "logs")
+
+RUN_MARKER = "===== START"
+
+# Przesunięcie (bajty) początku bieżącego przebiegu w pliku logu - dla podglądu logu
+run_offset: int = 0
+
+_LOG_RE = re.compile(r"^(?P<prefix>.*?)(?P<date>\d{4}-\d{2}-\d{2})(?P<part>_\d{6})?\.log$")
+
 
 def setup_logging(
-    log_dir: str = "..\logs",
+    log_dir: str = LOG_DIR,
     level: int = logging.INFO,
     echo_to_console: bool = True,
     capture_print: bool = True,
@@ -19,11 +42,15 @@ def setup_logging(
     """
     Logi do pliku logs/<PREFIX>YYYY-MM-DD.log (append) + opcjonalnie na konsolę.
     Przechwytuje print() -> logger.info() bez ręcznego echo na stdout (brak duplikatów).
+    Przed otwarciem pliku wykonuje rotację (rotate_logs), archiwizacja idzie w tle.
     """
+    global run_offset
     date_str = datetime.now().strftime(f"{LOG_PREFIX}%Y-%m-%d")
     log_path = Path(log_dir) / f"{date_str}.log"
     log_path.parent.mkdir(parents=True, exist_ok=True)
+    rotate_logs(log_path, LOG_PREFIX)
 
+    run_offset = log_path.stat().st_size if log_path.exists() else 0
     handlers: list[logging.Handler] = [
         logging.FileHandler(log_path, mode="a", encoding="utf-8")
     ]
@@ -37,6 +64,8 @@ def setup_logging(
         handlers=handlers,
         force=True,
     )
+    logging.getLogger().info("%s %s pid=%d %s", RUN_MARKER, Path(sys.argv[0]).name, os.getpid(),
+                             datetime.now().isoformat(timespec="seconds"))
 
     if capture_print:
         _orig_print = builtins.print
@@ -52,3 +81,92 @@ def setup_logging(
         builtins.print = print_to_logger
 
     return str(log_path)
+
+# ============================================================================ #
+#                                   ROTACJA
+# ============================================================================ #
+
+def rotate_logs(log_path: Path, prefix: str, max_mb: float = LOG_MAX_MB,
+                keep_days: int = LOG_KEEP_DAYS, background: bool = True):
+    """
+    Rotacja przy starcie (plik dzienny dzielą procesy z kolejki, więc nie w trakcie):
+    - bieżący plik > max_mb -> zmiana nazwy na <PREFIX>YYYY-MM-DD_HHMMSS.log,
+    - pliki tego prefiksu z innych dni i odłożone części -> gzip do archiwum,
+    - archiwa starsze niż keep_days i porzucone pliki .tmp -> usunięte.
+    Wątek archiwizacji nie jest demonem - krótki przebieg kończy się po dokończeniu
+    kompresji, zamiast zostawiać niepełne archiwum. Zwraca ten wątek (albo None).
+    """
+    log_path = Path(log_path)
+    if max_mb and log_path.exists() and log_path.stat().st_size > max_mb * 2**20:
+        part = log_path.with_name(f"{log_path.stem}_{datetime.now():%H%M%S}.log")
+        try:
+            log_path.rename(part)
+        except OSError:
+            pass    # plik otwarty przez inny proces - rotacja przy kolejnym starcie
+
+    old = []
+    for p in log_path.parent.glob(f"{prefix}*.log"):
+        m = _LOG_RE.match(p.name)
+        if m and m.group("prefix") == prefix and p != log_path:
+            old.append(p)
+    if not old and not keep_days:
+        return None
+    if not background:
+        _archive(old, log_path.parent / ARCHIVE_DIR, prefix, keep_days)
+        return None
+    t = threading.Thread(target=_archive, args=(old, log_path.parent / ARCHIVE_DIR, prefix, keep_days),
+                         name="logi-archiwum", daemon=False)
+    t.start()
+    return t
+
+
+def _archive(files: list[Path], archive_dir: Path, prefix: str, keep_days: int) -> None:
+    # .tmp po przerwanym procesie; świeże mogą należeć do równoległego narzędzia
+    for tmp in archive_dir.glob(f"{prefix}*.tmp"):
+        try:
+            if tmp.stat().st_mtime < time.time() - STALE_TMP_S:
+                tmp.unlink()
+        except OSError:
+            continue
+    for p in files:
+        try:
+            archive_dir.mkdir(parents=True, exist_ok=True)
+            target = archive_dir / f"{p.name}.gz"
+            if target.exists():
+                target = archive_dir / f"{p.stem}_{int(time.time())}.log.gz"
+            tmp = target.with_suffix(".tmp")
+            with p.open("rb") as src, gzip.open(tmp, "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.replace(tmp, target)
+            p.unlink()
+        except OSError:
+            continue    # w użyciu (np. drugi proces) - spróbujemy przy następnym starcie
+    if keep_days:
+        limit = time.time() - keep_days * 86400
+        for gz in archive_dir.glob(f"{prefix}*.gz"):
+            try:
+                if gz.stat().st_mtime < limit:
+                    gz.unlink()
+            except OSError:
+                continue
+
+# ============================================================================ #
+#                               PLIKI PRZEBIEGU
+# ============================================================================ #
+
+def create_unique(folder: str | Path, stem: str, suffix: str) -> Path:
+    """
+    Tworzy nowy, pusty plik folder/<stem>_<pid><suffix> (tryb "x") i zwraca jego ścieżkę;
+    przy kolizji dopisuje kolejny numer. Znacznik czasu co do sekundy nie wystarcza -
+    kolejka zadań uruchamia narzędzia tuż po sobie.
+    """
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    n = 0
+    while True:
+        path = folder / f"{stem}_{os.getpid()}{f'_{n}' if n else ''}{suffix}"
+        try:
+            path.open("x").close()
+            return path
+        except FileExistsError:
+            n += 1
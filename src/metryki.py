@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+Metryki przebiegu: czasy etapów (logowanie, słowniki, wybór dokumentów, ...),
+opóźnienia pojedynczych pozycji (p50/p95), tempo, błędy i szczytowe zużycie
+pamięci. Po zakończeniu zapisywane obok logu jako JSON (jeden plik na przebieg)
+i w formacie Prometheus textfile (ostatni przebieg narzędzia).
+
+Porównanie dwóch przebiegów:
+    python src\\metryki.py ..\\logs\\FS_metryki_A.json ..\\logs\\FS_metryki_B.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+from logowanie import LOG_DIR
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================ #
+#                                  POMIARY
+# ============================================================================ #
+
+def percentile(values: list[float], q: float) -> Optional[float]:
+    """Percentyl metodą najbliższej rangi; None dla pustej listy."""
+    if not values:
+        return None
+    s = sorted(values)
+    # ranga = ceil(q*n); round() przed ceil chroni przed błędem zmiennoprzecinkowym (0.07*100 = 7.000…1)
+    k = max(0, min(len(s) - 1, math.ceil(round(q * len(s), 9)) - 1))
+    return s[k]
+
+
+def peak_memory_bytes() -> Optional[int]:
+    """Szczytowy zestaw roboczy procesu (Windows) albo maxrss (Unix)."""
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                            ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                            ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return int(counters.PeakWorkingSetSize)
+        except Exception:
+            return None
+        return None
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return int(rss) if sys.platform == "darwin" else int(rss) * 1024
+    except Exception:
+        return None
+
+
+class RunMetrics:
+    """Metryki jednego uruchomienia narzędzia; bezpieczne dla wielu wątków."""
+
+    def __init__(self, tool: str, prefix: str = ""):
+        self.tool = tool
+        self.prefix = prefix
+        self.started = datetime.now()
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages: dict[str, float] = {}
+        self.latencies: list[float] = []
+        self.ok = 0
+        self.errors = 0
+        self.counters: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - t0)
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def item(self, seconds: float, ok: bool = True) -> None:
+        """Czas przetworzenia jednej pozycji (dokumentu, pliku, zamówienia)."""
+        with self._lock:
+            self.latencies.append(seconds)
+            if ok:
+                self.ok += 1
+            else:
+                self.errors += 1
+
+    def count(self, name: str, n: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self) -> dict:
+        with self._lock:
+            duration = time.perf_counter() - self._t0
+            lat = list(self.latencies)
+            items = self.ok + self.errors
+            return {
+                "tool": self.tool,
+                "started": self.started.isoformat(timespec="seconds"),
+                "duration_s": round(duration, 3),
+                "stages_s": {k: round(v, 3) for k, v in self.stages.items()},
+                "items": {
+                    "count": items,
+                    "ok": self.ok,
+                    "errors": self.errors,
+                    "p50_s": _round(percentile(lat, 0.50)),
+                    "p95_s": _round(percentile(lat, 0.95)),
+                    "max_s": _round(max(lat) if lat else None),
+                    "per_sec": round(items / duration, 3) if duration > 0 else 0.0,
+                },
+                "counters": dict(self.counters),
+                "peak_memory_bytes": peak_memory_bytes(),
+            }
+
+
+def _round(v: Optional[float]) -> Optional[float]:
+    return None if v is None else round(v, 6)
+
+# ============================================================================ #
+#                         BIEŻĄCY PRZEBIEG PROCESU
+# ============================================================================ #
+
+_current: Optional[RunMetrics] = None
+
+
+def start(tool: str, prefix: str = "") -> RunMetrics:
+    """Rozpoczyna zbieranie metryk procesu (wołane w __main__ narzędzia)."""
+    global _current
+    _current = RunMetrics(tool, prefix)
+    return _current
+
+
+def current() -> RunMetrics:
+    """Metryki bieżącego przebiegu; bez start() - niezapisywany zbiornik."""
+    global _current
+    if _current is None:
+        _current = RunMetrics("nieznane")
+    return _current
+
+
+def finish(log_dir: str | Path = LOG_DIR) -> Optional[Path]:
+    """Zapisuje metryki bieżącego przebiegu (JSON + .prom) obok logów; zwraca ścieżkę JSON."""
+    m = _current
+    if m is None or m.tool == "nieznane":
+        return None
+    data = m.summary()
+    log_dir = Path(log_dir)
+    try:
+        log_dir.mkdir(parents=True, exist_ok=True)
+        stamp = m.started.strftime("%Y-%m-%d_%H%M%S")
+        json_path = log_dir / f"{m.prefix}metryki_{stamp}.json"
+        _atomic_write(json_path, json.dumps(data, ensure_ascii=False, indent=1))
+        _atomic_write(log_dir / f"{m.prefix}metryki.prom", to_prometheus(data))
+    except OSError as e:
+        logger.warning("Nie udało się zapisać metryk: %s", e)
+        return None
+    it = data["items"]
+    logger.info("Metryki: %d pozycji (%d błędów) w %.1f s, %.2f poz./s, p50 %s s, p95 %s s -> %s",
+                it["count"], it["errors"], data["duration_s"], it["per_sec"], it["p50_s"], it["p95_s"], json_path)
+    return json_path
+
+
+def _atomic_write(path: Path, text: str) -> None:
+    fd, tmp = tempfile.mkstemp(prefix=path.stem + "_", suffix=".tmp", dir=str(path.parent))
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+# ============================================================================ #
+#                                  FORMATY
+# ============================================================================ #
+
+def _label(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def to_prometheus(data: dict) -> str:
+    """Podsumowanie w formacie textfile (node_exporter / windows_exporter)."""
+    tool = _label(data["tool"])
+    it = data["items"]
+    lines = []
+
+    def metric(name: str, kind: str, help_: str, samples: list[tuple[str, object]]) -> None:
+        lines.append(f"# HELP sfera_{name} {help_}")
+        lines.append(f"# TYPE sfera_{name} {kind}")
+        for labels, value in samples:
+            if value is None:
+                continue
+            extra = f",{labels}" if labels else ""
+            lines.append(f'sfera_{name}{{tool="{tool}"{extra}}} {value}')
+
+    started = datetime.fromisoformat(data["started"]).timestamp()
+    metric("run_start_timestamp_seconds", "gauge", "Start przebiegu (unix).", [("", int(started))])
+    metric("run_duration_seconds", "gauge", "Czas trwania przebiegu.", [("", data["duration_s"])])
+    metric("stage_duration_seconds", "gauge", "Czas etapów przebiegu.",
+           [(f'stage="{_label(k)}"', v) for k, v in data["stages_s"].items()])
+    metric("items", "gauge", "Przetworzone pozycje wg wyniku.",
+           [('result="ok"', it["ok"]), ('result="error"', it["errors"])])
+    metric("item_latency_seconds", "gauge", "Czas jednej pozycji (percentyle).",
+           [('quantile="0.5"', it["p50_s"]), ('quantile="0.95"', it["p95_s"]), ('quantile="1"', it["max_s"])])
+    metric("items_per_second", "gauge", "Tempo przebiegu.", [("", it["per_sec"])])
+    metric("peak_memory_bytes", "gauge", "Szczytowe zużycie pamięci procesu.", [("", data["peak_memory_bytes"])])
+    if data.get("counters"):
+        metric("counter", "gauge", "Liczniki narzędzia.",
+               [(f'name="{_label(k)}"', v) for k, v in data["counters"].items()])
+    return "\n".join(lines) + "\n"
+
+
+def _flatten(data: dict) -> dict[str, float]:
+    out = {"czas przebiegu [s]": data.get("duration_s")}
+    for k, v in (data.get("stages_s") or {}).items():
+        out[f"etap {k} [s]"] = v
+    it = data.get("items") or {}
+    out.update({
+        "pozycje": it.get("count"),
+        "błędy": it.get("errors"),
+        "p50 [s]": it.get("p50_s"),
+        "p95 [s]": it.get("p95_s"),
+        "poz./s": it.get("per_sec"),
+        "pamięć [MB]": round(data["peak_memory_bytes"] / 2**20, 1) if data.get("peak_memory_bytes") else None,
+    })
+    for k, v in (data.get("counters") or {}).items():
+        out[k] = v
+    return out
+
+
+def compare(a: dict, b: dict) -> list[tuple[str, Optional[float], Optional[float], Optional[float]]]:
+    """Wiersze (metryka, A, B, zmiana %) dla dwóch podsumowań."""
+    fa, fb = _flatten(a), _flatten(b)
+    rows = []
+    for key in list(fa) + [k for k in fb if k not in fa]:
+        va, vb = fa.get(key), fb.get(key)
+        change = None
+        if isinstance(va, (int, float)) and isinstance(vb, (int, float)) and va:
+            change = (vb - va) / va * 100
+        rows.append((key, va, vb, change))
+    return rows
+
+
+def _fmt(v) -> str:
+    if v is None:
+        return "-"
+    return f"{v:.6g}" if isinstance(v, float) else str(v)
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Porównanie metryk dwóch przebiegów (pliki *_metryki_*.json).")
+    ap.add_argument("a", help="Przebieg bazowy (JSON).")
+    ap.add_argument("b", help="Przebieg porównywany (JSON).")
+    args = ap.parse_args(argv)
+    a = json.loads(Path(args.a).read_text(encoding="utf-8"))
+    b = json.loads(Path(args.b).read_text(encoding="utf-8"))
+    print(f"A: {a.get('tool')} {a.get('started')}   B: {b.get('tool')} {b.get('started')}")
+    width = max(len(r[0]) for r in compare(a, b))
+    print(f"{'metryka':<{width}}  {'A':>12}  {'B':>12}  {'zmiana':>9}")
+    for key, va, vb, change in compare(a, b):
+        ch = f"{change:+.1f}%" if change is not None else ""
+        print(f"{key:<{width}}  {_fmt(va):>12}  {_fmt(vb):>12}  {ch:>9}")
+
+
+if __name__ == "__main__":
+    main()
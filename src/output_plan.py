@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Planowanie ścieżek eksportu przed renderowaniem: wszystkie nazwy liczone
+z góry, kolizje rozwiązywane deterministycznie, katalogi (np. układ
+'{year}/{month}/{contractor}') zakładane jednym przebiegiem.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import string
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from utils import safe_name
+
+# Pola dostępne w układzie katalogów
+LAYOUT_FIELDS = ("year", "month", "day", "contractor", "kh_id")
+
+MANIFEST_NAME = "manifest.json"
+
+
+def validate_layout(layout: str) -> str:
+    """Sprawdza szablon układu katalogów; zwraca go bez ukośników na brzegach."""
+    layout = (layout or "").replace("\\", "/").strip("/")
+    for _, field, _, _ in string.Formatter().parse(layout):
+        if field is not None and field not in LAYOUT_FIELDS:
+            raise ValueError(f"Nieznane pole układu: {{{field}}} (dostępne: {', '.join(LAYOUT_FIELDS)})")
+    return layout
+
+
+def _layout_values(item: dict) -> dict:
+    d = item.get("data")
+    return {
+        "year": f"{d.year:04d}" if d else "bez-daty",
+        "month": f"{d.month:02d}" if d else "00",
+        "day": f"{d.day:02d}" if d else "00",
+        "contractor": item.get("kontrahent") or f"KH {item.get('kh_id')}",
+        "kh_id": str(item.get("kh_id")),
+    }
+
+
+def plan_output_paths(items: list[dict], out_dir: Path, layout: str = "", ext: str = "pdf",
+                      create_dirs: bool = True) -> list[dict]:
+    """
+    Ustala item["path"] dla każdego dokumentu (wymagane klucze: numer; opcjonalnie
+    id, data, kh_id, kontrahent). Nazwy, które po oczyszczeniu są takie same
+    (bez względu na wielkość liter, jak w Windows), dostają sufiks ' (2)', ' (3)', ...
+    w kolejności (numer, id) - wynik nie zależy od kolejności zaznaczenia.
+    Zakłada wszystkie potrzebne katalogi (create_dirs). Zwraca tę samą listę.
+    """
+    layout = validate_layout(layout)
+    out_dir = Path(out_dir)
+
+    groups: dict[str, list[tuple[Path, str, dict]]] = {}
+    for it in items:
+        rel_dir = Path()
+        if layout:
+            values = _layout_values(it)
+            parts = layout.format(**{k: safe_name(v, maxlen=80) or "_" for k, v in values.items()}).split("/")
+            rel_dir = Path(*[p for p in parts if p])
+        stem = safe_name(str(it["numer"])) or "_"
+        target = rel_dir / stem
+        groups.setdefault(str(target).casefold(), []).append((rel_dir, stem, it))
+
+    taken = set(groups)
+    for key, group in groups.items():
+        group.sort(key=lambda g: (str(g[2]["numer"]), g[2].get("id") or 0))
+        for n, (rel_dir, stem, it) in enumerate(group, start=1):
+            name = stem
+            if n > 1:
+                k = n
+                while str(rel_dir / f"{stem} ({k})").casefold() in taken:
+                    k += 1
+                name = f"{stem} ({k})"
+                taken.add(str(rel_dir / name).casefold())
+            it["path"] = out_dir / rel_dir / f"{name}.{ext}"
+
+    if create_dirs:
+        for d in sorted({it["path"].parent for it in items}):
+            d.mkdir(parents=True, exist_ok=True)
+    return items
+
+
+def collisions(items: list[dict]) -> int:
+    """Ile dokumentów dostało sufiks z powodu kolizji nazw."""
+    return sum(1 for it in items if Path(it["path"]).stem != safe_name(str(it["numer"])))
+
+
+def write_manifest(items: list[dict], out_dir: Path, extra: dict | None = None) -> Path:
+    """Zapisuje plan eksportu (manifest.json w folderze docelowym, atomowo)."""
+    out_dir = Path(out_dir)
+    docs = []
+    for it in items:
+        docs.append({
+            "id": it.get("id"),
+            "numer": it["numer"],
+            "kh_id": it.get("kh_id"),
+            "data": it["data"].isoformat() if it.get("data") else None,
+            "path": os.path.relpath(it["path"], out_dir),
+        })
+    data = {"created": datetime.now().isoformat(timespec="seconds"), **(extra or {}), "documents": docs}
+    target = out_dir / MANIFEST_NAME
+    fd, tmp = tempfile.mkstemp(prefix="manifest_", suffix=".json", dir=str(out_dir))
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, target)
+    return target
+
+
+def update_manifest(out_dir: Path, **extra) -> Path:
+    """Dopisuje pola najwyższego poziomu (np. paczki) do istniejącego manifestu, atomowo."""
+    out_dir = Path(out_dir)
+    target = out_dir / MANIFEST_NAME
+    data = json.loads(target.read_text(encoding="utf-8"))
+    data.update(extra)
+    fd, tmp = tempfile.mkstemp(prefix="manifest_", suffix=".json", dir=str(out_dir))
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, target)
+    return target
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Paczki PDF per kontrahent po eksporcie FS (np. do miesięcznej wysyłki):
+wyeksportowane faktury kontrahenta łączone w jeden plik z zakładką na każdy
+dokument. Etap działa strumieniowo - paczka kontrahenta powstaje w puli wątków,
+gdy tylko skończy się eksport jego dokumentów. PdfWriter trzyma strony do zapisu,
+więc duża paczka dzielona jest na części po najwyżej MAX_PAGES stron - w pamięci
+jest najwyżej jedna część na wątek.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+try:
+    from pypdf import PdfReader, PdfWriter  # opcjonalnie: łączenie PDF-ów
+except ImportError:
+    PdfReader = PdfWriter = None
+
+from utils import safe_filename
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_DIR = "paczki"          # podkatalog folderu eksportu
+DEFAULT_WORKERS = 4
+MAX_PAGES = 500                # stron w jednym pliku paczki (dokument nie jest dzielony)
+
+
+def available() -> bool:
+    return PdfWriter is not None
+
+
+def bundle_name(kh_id: int, kontrahent: Optional[str]) -> str:
+    return safe_filename(f"{kontrahent or 'KH'} {kh_id}")
+
+
+def write_bundle(docs: list[dict], target: Path, max_pages: int = MAX_PAGES) -> dict:
+    """
+    Łączy PDF-y dokumentów (item["path"], item["numer"]) w target z zakładkami.
+    Powyżej max_pages stron - części "<nazwa> cz1.pdf", "cz2", ... (dokument w całości
+    w jednej części). Zapis atomowy (pliki tymczasowe + os.replace po wszystkich częściach).
+    Zwraca {"dokumenty", "strony", "czesci": [ścieżki]}.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmps: list[Path] = []
+    writer, part_pages, pages = None, 0, 0
+
+    def flush():
+        tmp = target.with_name(f"{target.stem}.{len(tmps) + 1}.tmp")
+        tmps.append(tmp)
+        with open(tmp, "wb") as f:
+            writer.write(f)
+
+    try:
+        for it in docs:
+            reader = PdfReader(str(it["path"]))
+            n = len(reader.pages)
+            if writer is not None and part_pages + n > max_pages:
+                flush()
+                writer = None
+            if writer is None:
+                writer, part_pages = PdfWriter(), 0
+            start = part_pages
+            for page in reader.pages:
+                writer.add_page(page)
+            part_pages += n
+            pages += n
+            writer.add_outline_item(str(it["numer"]), start)
+        if writer is not None:
+            flush()
+    except BaseException:
+        for tmp in tmps:
+            tmp.unlink(missing_ok=True)
+        raise
+    if len(tmps) == 1:
+        parts = [target]
+    else:
+        parts = [target.with_name(f"{target.stem} cz{i}{target.suffix}") for i in range(1, len(tmps) + 1)]
+    for tmp, part in zip(tmps, parts):
+        os.replace(tmp, part)
+    return {"dokumenty": len(docs), "strony": pages, "czesci": parts}
+
+
+class BundleStage:
+    """
+    Etap paczek: expect(item) przy zleceniu eksportu, done(item, ok) po jego zakończeniu
+    (dowolny wątek), seal() gdy zlecono już wszystko. Paczka kontrahenta startuje w puli,
+    gdy wszystkie jego dokumenty są gotowe; close() czeka i zwraca opisy paczek.
+    """
+
+    def __init__(self, out_dir: Path, workers: int = DEFAULT_WORKERS):
+        if PdfWriter is None:
+            raise RuntimeError("Paczki PDF wymagają pakietu pypdf (pip install pypdf).")
+        self.out_dir = Path(out_dir)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="paczki")
+        self._lock = threading.Condition()
+        self._pending: dict[int, int] = {}
+        self._docs: dict[int, list[dict]] = {}
+        self._names: dict[int, Optional[str]] = {}
+        self._sealed = False
+        self._aborted = False
+        self._futures: list[tuple[int, Future]] = []
+
+    def expect(self, item: dict) -> None:
+        with self._lock:
+            kh = item["kh_id"]
+            self._pending[kh] = self._pending.get(kh, 0) + 1
+            self._docs.setdefault(kh, [])
+            self._names[kh] = item.get("kontrahent")
+
+    def done(self, item: dict, ok: bool) -> None:
+        with self._lock:
+            kh = item["kh_id"]
+            if ok and Path(item["path"]).exists():
+                self._docs[kh].append(item)
+            self._pending[kh] -= 1
+            ready = self._sealed and self._pending[kh] == 0
+            self._lock.notify_all()
+        if ready:
+            self._start(kh)
+
+    def seal(self) -> None:
+        with self._lock:
+            self._sealed = True
+            ready = [kh for kh, n in self._pending.items() if n == 0]
+        for kh in ready:
+            self._start(kh)
+
+    def _start(self, kh: int) -> None:
+        with self._lock:
+            docs = self._docs.pop(kh, None)
+            if not docs or self._aborted:
+                return      # już zlecona, brak udanych dokumentów albo eksport przerwany
+            docs.sort(key=lambda it: it.get("pos", 0))     # kolejność jak w manifeście
+            target = self.out_dir / BUNDLE_DIR / bundle_name(kh, self._names.get(kh))
+            # pod blokadą: abort() nie zamknie puli między sprawdzeniem a submit()
+            self._futures.append((kh, self._pool.submit(write_bundle, docs, target)))
+
+    def abort(self) -> None:
+        """Przerwany eksport: bez nowych paczek, niezaczęte anulowane (pliki .tmp nie zostają podmienione)."""
+        with self._lock:
+            self._aborted = True
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def close(self) -> list[dict]:
+        """
+        Czeka na paczki; zwraca [{"kh_id", "kontrahent", "path", "dokumenty", "strony"}]
+        (+ "czesci", gdy paczka podzielona; błędy w logu).
+        """
+        self.seal()
+        # callbacki Future (done) mogą jeszcze trwać w wątku COM po zwolnieniu f.result()
+        with self._lock:
+            self._lock.wait_for(lambda: not any(self._pending.values()))
+        self._pool.shutdown(wait=True)
+        out = []
+        for kh, f in self._futures:
+            target = self.out_dir / BUNDLE_DIR / bundle_name(kh, self._names.get(kh))
+            try:
+                info = f.result()
+            except Exception as e:
+                logger.error("Paczka %s: %s", target.name, e)
+                continue
+            parts = [os.path.relpath(p, self.out_dir) for p in info.pop("czesci")]
+            bundle = {"kh_id": kh, "kontrahent": self._names.get(kh), "path": parts[0], **info}
+            if len(parts) > 1:
+                bundle["czesci"] = parts
+            out.append(bundle)
+        return sorted(out, key=lambda b: b["path"])
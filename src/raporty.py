@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+Raporty zbiorcze FS i MM liczone po stronie serwera: sumy per kontrahent,
+miesiąc i magazyn - jedno zapytanie GROUP BY na raport, wszystkie raporty
+jedną podróżą do bazy (utils.run_sql_batch) zamiast odczytu właściwości COM
+dokument po dokumencie. Wynik w postaci kolumnowej, zapis do CSV albo XLSX.
+
+    python src\\raporty.py --typ FS --od 2024-01-01 --do 2024-12-31 --format xlsx
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+try:
+    import openpyxl  # opcjonalnie: zapis .xlsx
+except ImportError:
+    openpyxl = None
+
+import logowanie
+import metryki
+from cli import add_common_args, doc_filter, resolve_runs
+from sql_pool import ReadPath
+from utils import doc_where, run_sql_batch
+
+logger = logging.getLogger(__name__)
+
+LOG_PREFIX = "RAPORT_"
+OUT_DIR = Path("..") / "raporty"
+DOC_TYPES = {"FS": 2, "MM": 9}
+
+# Sumy wspólne dla wszystkich raportów
+_SUMS = """
+       COUNT(*)                                    AS dokumenty,
+       CAST(SUM(d.dok_WartNetto)  AS DECIMAL(18, 2)) AS netto,
+       CAST(SUM(d.dok_WartVat)    AS DECIMAL(18, 2)) AS vat,
+       CAST(SUM(d.dok_WartBrutto) AS DECIMAL(18, 2)) AS brutto"""
+
+# ============================================================================ #
+#                                 DEFINICJE
+# ============================================================================ #
+
+@dataclass(frozen=True)
+class RaportDef:
+    name: str
+    title: str
+    select: str          # kolumny grupujące (z aliasami)
+    joins: str           # dodatkowe JOIN-y do dok__Dokument d
+    group_by: str
+    order_by: str
+
+
+RAPORTY: dict[str, RaportDef] = {}
+
+
+def register(d: RaportDef) -> RaportDef:
+    RAPORTY[d.name] = d
+    return d
+
+
+register(RaportDef(
+    "kontrahenci",
+    "Sumy per kontrahent",
+    "d.dok_OdbiorcaId AS kh_id, MAX(k.kh_Symbol) AS symbol, MAX(a.adr_Nazwa) AS nazwa",
+    """
+      LEFT JOIN kh__Kontrahent k ON k.kh_Id = d.dok_OdbiorcaId
+      LEFT JOIN adr__Ewid a ON a.adr_IdObiektu = k.kh_Id AND a.adr_TypAdresu = 1
+    """,
+    "d.dok_OdbiorcaId",
+    "brutto DESC",
+))
+
+register(RaportDef(
+    "miesiace",
+    "Sumy per miesiąc",
+    "YEAR(d.dok_DataWyst) AS rok, MONTH(d.dok_DataWyst) AS miesiac",
+    "",
+    "YEAR(d.dok_DataWyst), MONTH(d.dok_DataWyst)",
+    "rok, miesiac",
+))
+
+register(RaportDef(
+    "magazyny",
+    "Sumy per magazyn",
+    "d.dok_MagId AS mag_id, MAX(m.mag_Symbol) AS symbol, MAX(m.mag_Nazwa) AS nazwa",
+    "LEFT JOIN sl_Magazyn m ON m.mag_Id = d.dok_MagId",
+    "d.dok_MagId",
+    "symbol",
+))
+
+
+def report_sql(d: RaportDef, where: str) -> str:
+    return f"""
+        SELECT {d.select},{_SUMS}
+          FROM dok__Dokument d
+          {d.joins.strip()}
+         WHERE {where}
+         GROUP BY {d.group_by}
+         ORDER BY {d.order_by}
+    """
+
+# ============================================================================ #
+#                             WYNIK KOLUMNOWY
+# ============================================================================ #
+
+@dataclass
+class Wynik:
+    """Wynik raportu kolumnami: {kolumna: [wartości]} - bez słownika na każdy wiersz."""
+    name: str
+    title: str
+    columns: tuple[str, ...]
+    data: dict[str, list] = field(default_factory=dict)
+
+    @classmethod
+    def from_rows(cls, d: RaportDef, rows: list[dict]) -> "Wynik":
+        columns = tuple(rows[0]) if rows else ()
+        return cls(d.name, d.title, columns, {c: [_value(r[c]) for r in rows] for c in columns})
+
+    def __len__(self) -> int:
+        return len(self.data[self.columns[0]]) if self.columns else 0
+
+    def rows(self) -> Iterator[tuple]:
+        return zip(*(self.data[c] for c in self.columns))
+
+    def total(self, column: str) -> Any:
+        return sum(v for v in self.data.get(column, []) if v is not None)
+
+
+def _value(v):
+    """Decimal -> float (CSV/XLSX), liczby całkowite bez zmian."""
+    return float(v) if isinstance(v, Decimal) else v
+
+
+def run_reports(src, typ: int, filtr: dict, names: Optional[list[str]] = None) -> dict[str, Wynik]:
+    """Raporty dla dokumentów typu 'typ' z filtra - jedno zapytanie wsadowe (src: sesja albo ReadPath)."""
+    defs = [RAPORTY[n] for n in (names or RAPORTY)]
+    where = doc_where(typ, **filtr)
+    with metryki.current().stage("raporty"):
+        res = run_sql_batch(src, {d.name: report_sql(d, where) for d in defs})
+    return {d.name: Wynik.from_rows(d, res[d.name]) for d in defs}
+
+# ============================================================================ #
+#                                   ZAPIS
+# ============================================================================ #
+
+def write_csv(wynik: Wynik, path: Path, delimiter: str = ";") -> Path:
+    with path.open("w", encoding="utf-8-sig", newline="") as f:
+        w = csv.writer(f, delimiter=delimiter)
+        w.writerow(wynik.columns)
+        w.writerows(wynik.rows())
+    return path
+
+
+def write_xlsx(wyniki: dict[str, Wynik], path: Path) -> Path:
+    """Wszystkie raporty w jednym skoroszycie (arkusz na raport, tryb write_only)."""
+    if openpyxl is None:
+        raise RuntimeError("Zapis XLSX wymaga pakietu openpyxl (pip install openpyxl).")
+    wb = openpyxl.Workbook(write_only=True)
+    for wynik in wyniki.values():
+        ws = wb.create_sheet(wynik.name[:31])
+        ws.append(list(wynik.columns))
+        for row in wynik.rows():
+            ws.append(list(row))
+    wb.save(path)
+    return path
+
+
+def save_reports(wyniki: dict[str, Wynik], out_dir: Path, stem: str, fmt: str = "csv") -> list[Path]:
+    """CSV: plik na raport (<stem>_<raport>.csv); XLSX: jeden skoroszyt <stem>.xlsx."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if fmt == "xlsx":
+        return [write_xlsx(wyniki, out_dir / f"{stem}.xlsx")]
+    return [write_csv(w, out_dir / f"{stem}_{w.name}.csv") for w in wyniki.values()]
+
+# ============================================================================ #
+#                                    MAIN
+# ============================================================================ #
+
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Raporty zbiorcze FS/MM (sumy per kontrahent, miesiąc, magazyn).")
+    ap.add_argument("--typ", choices=sorted(DOC_TYPES), default="FS", help="Typ dokumentów.")
+    ap.add_argument("--raport", action="append", choices=sorted(RAPORTY), default=[],
+                    help="Raport (można podać kilka razy; domyślnie wszystkie).")
+    ap.add_argument("--format", choices=("csv", "xlsx"), default="csv", help="Format wyniku.")
+    ap.add_argument("--out-dir", dest="out_dir", help="Folder wyników (domyślnie ..\\raporty).")
+    add_common_args(ap)
+    return ap.parse_args(argv)
+
+
+def report_run(src, run: dict) -> list[Path]:
+    typ = str(run.get("typ") or "FS").upper()
+    names = run.get("raport") or None
+    if isinstance(names, str):
+        names = [names]
+    filtr = doc_filter(run)
+    wyniki = run_reports(src, DOC_TYPES[typ], filtr, names)
+    for w in wyniki.values():
+        logger.info("%s %s: %d wierszy, %s dokumentów, brutto %.2f",
+                    typ, w.title, len(w), w.total("dokumenty"), w.total("brutto"))
+    stem = f"{typ}_{datetime.now():%Y-%m-%d_%H%M%S}"
+    paths = save_reports(wyniki, Path(run.get("out_dir") or OUT_DIR), stem, run.get("format") or "csv")
+    for p in paths:
+        logger.info("Zapisano: %s", p)
+    return paths
+
+
+def main(args: argparse.Namespace) -> None:
+    # odczyt bez logowania do Sfery; sesja COM tylko, gdy brak bezpośredniego SQL
+    worker = None
+
+    def com():
+        nonlocal worker
+        if worker is None:
+            from com_worker import ComWorker
+            worker = ComWorker()
+        return worker
+
+    reads = ReadPath.from_env(
+        fallback=lambda sql: com().run_sql_async(sql).result(),
+        fallback_batch=lambda queries: com().submit(run_sql_batch, queries).result(),
+    )
+    try:
+        for run in resolve_runs(args):
+            report_run(reads, run)
+    except Exception as e:
+        logger.exception("Błąd raportu: %s", e)
+    finally:
+        reads.close()
+        if worker is not None:
+            worker.shutdown()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logfile = logowanie.setup_logging(LOG_PREFIX=LOG_PREFIX)
+    metryki.start("raporty", LOG_PREFIX)
+    try:
+        main(args)
+    finally:
+        metryki.finish(Path(logfile).parent)
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+Lokalna replika (SQLite) słowników kontrahentów, kategorii i towarów.
+Synchronizacja przyrostowa: jedno zapytanie wsadowe pobiera (id, BINARY_CHECKSUM)
+wszystkich wierszy, drugie - pełne dane tylko nowych i zmienionych; usunięte
+wiersze znikają z repliki. Wyszukiwanie idzie do lokalnej bazy z indeksami
+(id, symbol, nazwa), więc działa także przy wolnym lub niedostępnym serwerze.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+import metryki
+import slowniki
+from utils import run_sql_batch
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = Path(os.getenv("SFERA_KATALOG") or Path("..") / "cache" / "katalog.sqlite")
+IN_CHUNK = 1000     # ID w jednym IN (...)
+
+# ============================================================================ #
+#                                 DEFINICJE
+# ============================================================================ #
+
+@dataclass(frozen=True)
+class ReplikaDef:
+    name: str                      # nazwa słownika (jak w slowniki.REGISTRY)
+    source: str                    # SELECT z kolumną 'id' i kolumnami 'columns'
+    columns: tuple[str, ...]       # kolumny poza id
+    indexes: tuple[str, ...]       # kolumny z indeksem (wyszukiwanie bez rozróżniania wielkości liter)
+    row: Callable[[dict], object]  # wiersz -> rekord słownika
+
+
+REPLIKI: dict[str, ReplikaDef] = {}
+
+
+def register(d: ReplikaDef) -> ReplikaDef:
+    REPLIKI[d.name] = d
+    return d
+
+
+register(ReplikaDef(
+    "kontrahenci",
+    """
+    SELECT k.kh_Id           AS id,
+           k.kh_Symbol       AS symbol,
+           a.adr_Nazwa       AS nazwa,
+           a.adr_Adres       AS adres,
+           a.adr_Miejscowosc AS miejscowosc
+      FROM kh__Kontrahent k
+      JOIN adr__Ewid a ON k.kh_Id = a.adr_IdObiektu
+     WHERE a.adr_TypAdresu = 1
+    """,
+    ("symbol", "nazwa", "adres", "miejscowosc"),
+    ("symbol", "nazwa"),
+    lambda r: slowniki.Kontrahent(int(r["id"]), str(r["nazwa"]), str(r["adres"]), str(r["miejscowosc"])),
+))
+
+register(ReplikaDef(
+    "kategorie",
+    "SELECT kat_Id AS id, kat_Nazwa AS nazwa FROM sl_Kategoria",
+    ("nazwa",),
+    ("nazwa",),
+    lambda r: slowniki.Kategoria(int(r["id"]), str(r["nazwa"])),
+))
+
+register(ReplikaDef(
+    "towary",
+    """
+    SELECT tw_Id     AS id,
+           tw_Symbol AS symbol,
+           tw_Nazwa  AS nazwa
+      FROM tw__Towar
+     WHERE tw_Zablokowany = 0
+    """,
+    ("symbol", "nazwa"),
+    ("symbol", "nazwa"),
+    lambda r: slowniki.Towar(int(r["id"]), str(r["symbol"]), str(r["nazwa"])),
+))
+
+
+def _checksum_sql(d: ReplikaDef) -> str:
+    return f"SELECT s.id, BINARY_CHECKSUM({', '.join('s.' + c for c in d.columns)}) AS chk FROM ({d.source.strip()}) s"
+
+
+def _rows_sql(d: ReplikaDef, ids: Optional[list[int]] = None) -> str:
+    sql = (f"SELECT s.*, BINARY_CHECKSUM({', '.join('s.' + c for c in d.columns)}) AS chk "
+           f"FROM ({d.source.strip()}) s")
+    if ids is not None:
+        sql += f" WHERE s.id IN ({', '.join(str(int(i)) for i in ids)})"
+    return sql
+
+# ============================================================================ #
+#                                  KATALOG
+# ============================================================================ #
+
+class Katalog:
+    """Plik SQLite z replikami; bezpieczny dla wielu wątków (jedno połączenie pod blokadą)."""
+
+    def __init__(self, path: str | Path = DEFAULT_PATH):
+        self.path = Path(path)
+        if str(path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._init_schema()
+
+    def _init_schema(self) -> None:
+        with self._lock, self._db:
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, synced TEXT, rows INTEGER)")
+            for d in REPLIKI.values():
+                cols = ", ".join(f"{c} TEXT" for c in d.columns)
+                self._db.execute(f"CREATE TABLE IF NOT EXISTS {d.name} (id INTEGER PRIMARY KEY, {cols}, chk INTEGER)")
+                for c in d.indexes:
+                    self._db.execute(f"CREATE INDEX IF NOT EXISTS ix_{d.name}_{c} ON {d.name} ({c} COLLATE NOCASE)")
+
+    # ------------------------------------------------------------- synchronizacja
+
+    def synced(self, name: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT synced FROM meta WHERE name = ?", (name,)).fetchone()
+        return row["synced"] if row else None
+
+    def sync(self, src, names: Optional[list[str]] = None) -> dict[str, dict]:
+        """
+        Synchronizuje repliki z bazą Subiekta (src: sesja albo ReadPath).
+        Zwraca {nazwa: {"nowe", "zmienione", "usuniete"}}.
+        """
+        defs = [REPLIKI[n] for n in (names or REPLIKI)]
+        t0 = time.perf_counter()
+        full = [d for d in defs if self.synced(d.name) is None]
+        incr = [d for d in defs if d not in full]
+
+        # 1) pełne dane dla pustych replik + sumy kontrolne dla pozostałych - jedna podróż
+        queries = {f"rows:{d.name}": _rows_sql(d) for d in full}
+        queries.update({f"chk:{d.name}": _checksum_sql(d) for d in incr})
+        res = run_sql_batch(src, queries) if queries else {}
+
+        stats: dict[str, dict] = {}
+        changed: dict[str, list[int]] = {}
+        removed: dict[str, list[int]] = {}
+        for d in incr:
+            remote = {int(r["id"]): int(r["chk"]) for r in res[f"chk:{d.name}"]}
+            with self._lock:
+                local = {r["id"]: r["chk"] for r in self._db.execute(f"SELECT id, chk FROM {d.name}")}
+            changed[d.name] = [i for i, c in remote.items() if local.get(i) != c]
+            removed[d.name] = [i for i in local if i not in remote]
+            stats[d.name] = {"nowe": sum(1 for i in changed[d.name] if i not in local),
+                             "zmienione": sum(1 for i in changed[d.name] if i in local),
+                             "usuniete": len(removed[d.name])}
+
+        # 2) pełne wiersze tylko zmienionych - druga (i ostatnia) podróż
+        queries = {}
+        for d in incr:
+            ids = changed[d.name]
+            for n in range(0, len(ids), IN_CHUNK):
+                queries[f"rows:{d.name}:{n}"] = _rows_sql(d, ids[n:n + IN_CHUNK])
+        if queries:
+            res.update(run_sql_batch(src, queries))
+
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._lock, self._db:
+            for d in defs:
+                rows = [r for key, part in res.items() if key.startswith("rows:") and key.split(":")[1] == d.name
+                        for r in part]
+                if d in full:
+                    self._db.execute(f"DELETE FROM {d.name}")
+                    stats[d.name] = {"nowe": len(rows), "zmienione": 0, "usuniete": 0}
+                cols = ("id",) + d.columns + ("chk",)
+                self._db.executemany(
+                    f"INSERT OR REPLACE INTO {d.name} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                    [(int(r["id"]), *[_text(r[c]) for c in d.columns], int(r["chk"])) for r in rows])
+                for i in removed.get(d.name, []):
+                    self._db.execute(f"DELETE FROM {d.name} WHERE id = ?", (i,))
+                count = self._db.execute(f"SELECT COUNT(*) FROM {d.name}").fetchone()[0]
+                self._db.execute("INSERT OR REPLACE INTO meta (name, synced, rows) VALUES (?, ?, ?)",
+                                 (d.name, now, count))
+        logger.info("Synchronizacja repliki w %.2f s: %s", time.perf_counter() - t0,
+                    ", ".join(f"{n} +{s['nowe']}/~{s['zmienione']}/-{s['usuniete']}" for n, s in stats.items()))
+        return stats
+
+    # ------------------------------------------------------------- wyszukiwanie
+
+    def get(self, name: str, id_: int):
+        return self._one(name, "id = ?", int(id_))
+
+    def by(self, name: str, column: str, value: str):
+        """Rekord po kolumnie z indeksem (symbol/nazwa), bez rozróżniania wielkości liter."""
+        if column not in REPLIKI[name].indexes:
+            raise KeyError(f"Kolumna {column} nie jest indeksowana w replice {name}.")
+        return self._one(name, f"{column} = ? COLLATE NOCASE", str(value).strip())
+
+    def _one(self, name: str, where: str, value):
+        with self._lock:
+            row = self._db.execute(f"SELECT * FROM {name} WHERE {where}", (value,)).fetchone()
+        return REPLIKI[name].row(dict(row)) if row else None
+
+    def slownik(self, name: str) -> slowniki.Slownik:
+        """Cały słownik z repliki (ten sam typ co slowniki.load)."""
+        d = REPLIKI[name]
+        with self._lock:
+            rows = self._db.execute(f"SELECT * FROM {name} ORDER BY nazwa COLLATE NOCASE").fetchall()
+        return slowniki.Slownik(name, [d.row(dict(r)) for r in rows])
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def _text(v) -> Optional[str]:
+    return None if v is None else str(v)
+
+# ============================================================================ #
+#                          DOMYŚLNY KATALOG PROCESU
+# ============================================================================ #
+
+_katalog: Optional[Katalog] = None
+_synced: set[str] = set()
+_init_lock = threading.Lock()
+
+
+def katalog(src=None, names: Optional[list[str]] = None) -> Katalog:
+    """
+    Katalog procesu; przy pierwszym użyciu słownika synchronizuje go z src.
+    Gdy serwer nie odpowiada, a replika ma dane - pracuje na nich (ostrzeżenie w logu).
+    """
+    global _katalog
+    with _init_lock:
+        if _katalog is None:
+            _katalog = Katalog()
+        todo = [n for n in (names or REPLIKI) if n not in _synced]
+        if todo and src is not None:
+            try:
+                with metryki.current().stage("replika"):
+                    _katalog.sync(src, todo)
+            except Exception as e:
+                stale = [n for n in todo if _katalog.synced(n) is None]
+                if stale:
+                    raise
+                logger.warning("Nie udało się zsynchronizować repliki (%s) – używam danych lokalnych.", e)
+            _synced.update(todo)
+    return _katalog
+
+
+def load(src, names: list[str]) -> dict[str, slowniki.Slownik]:
+    """Jak slowniki.load: słowniki z repliką idą z pliku lokalnego, pozostałe z bazy."""
+    local = [n for n in names if n in REPLIKI]
+    out = {}
+    if local:
+        k = katalog(src, local)
+        out.update({n: k.slownik(n) for n in local})
+    remote = [n for n in names if n not in REPLIKI]
+    if remote:
+        out.update(slowniki.load(src, remote))
+    return {n: out[n] for n in names}
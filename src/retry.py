@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Obsługa błędów pojedynczych dokumentów w pętlach seryjnych: klasyfikacja
+błędów, ponawianie przejściowych z wykładniczym odstępem, bezpiecznik
+przy skoku liczby błędów i lista nieudanych dokumentów (manifest do
+ponownego przebiegu: --manifest plik.json).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from pywintypes import com_error
+
+import metryki
+from logowanie import create_unique
+
+logger = logging.getLogger(__name__)
+
+# Klasy błędów
+TRANSIENT = "przejsciowy"   # ponów (blokada dokumentu, timeout SQL, serwer COM zajęty)
+PERMANENT = "trwaly"        # pomiń dokument, zapisz na liście nieudanych
+FATAL = "krytyczny"         # sesja utracona - dalsze dokumenty nie mają sensu
+NOT_PROCESSED = "nieprzetworzony"
+
+# HRESULT-y COM
+_HR_TRANSIENT = {
+    -2147418111,   # RPC_E_CALL_REJECTED
+    -2147417846,   # RPC_E_SERVERCALL_RETRYLATER
+}
+_HR_FATAL = {
+    -2147023174,   # RPC_S_SERVER_UNAVAILABLE
+    -2147417848,   # RPC_E_DISCONNECTED
+    -2147220995,   # CO_E_OBJNOTCONNECTED
+    -2147023170,   # RPC_S_CALL_FAILED
+}
+# Sfera zgłasza blokady i timeouty SQL jako E_FAIL - rozstrzyga opis błędu (małymi literami)
+_TRANSIENT_TEXT = (
+    "zablokowan", "blokad", "w użyciu", "jest edytowany", "locked", "deadlock", "zakleszcz",
+    "timeout", "limit czasu", "przekroczono czas", "time-out",
+)
+
+
+def _com_parts(e: com_error) -> tuple:
+    """(hresult, strerror, excepinfo) - z atrybutów albo z args (hresult, strerror, excepinfo, argerror)."""
+    args = tuple(e.args) + (None,) * 3
+    return (getattr(e, "hresult", args[0]), getattr(e, "strerror", args[1]), getattr(e, "excepinfo", args[2]))
+
+
+def _com_description(e: com_error) -> str:
+    _, strerror, exc = _com_parts(e)
+    parts = [str(strerror or "")]
+    if exc and len(exc) > 2 and exc[2]:
+        parts.append(str(exc[2]))
+    return " ".join(parts).lower()
+
+
+def _com_hresults(e: com_error) -> set[int]:
+    hresult, _, exc = _com_parts(e)
+    codes = {hresult}
+    if exc and len(exc) > 5 and exc[5]:
+        codes.add(exc[5])   # scode
+    return {c for c in codes if isinstance(c, int)}
+
+
+def classify(e: BaseException) -> str:
+    """Klasa błędu: TRANSIENT, PERMANENT albo FATAL."""
+    if isinstance(e, com_error):
+        codes = _com_hresults(e)
+        if codes & _HR_FATAL:
+            return FATAL
+        if any(t in _com_description(e) for t in _TRANSIENT_TEXT):
+            return TRANSIENT
+        if codes & _HR_TRANSIENT:
+            return TRANSIENT
+        return PERMANENT
+    if isinstance(e, (TimeoutError, ConnectionError)):
+        return TRANSIENT
+    if isinstance(e, PermissionError):
+        return TRANSIENT      # np. PDF otwarty w przeglądarce
+    if isinstance(e, (KeyboardInterrupt, SystemExit, MemoryError)):
+        return FATAL
+    return PERMANENT
+
+# ============================================================================ #
+#                         PONAWIANIE I BEZPIECZNIK
+# ============================================================================ #
+
+@dataclass
+class RetryPolicy:
+    attempts: int = 4          # łącznie z pierwszą próbą
+    base_delay: float = 0.5    # [s] przed drugą próbą
+    factor: float = 2.0
+    max_delay: float = 10.0
+    jitter: float = 0.2        # +/- ułamek odstępu
+
+    def delay(self, attempt: int) -> float:
+        """Odstęp przed próbą attempt+1 (attempt liczone od 1)."""
+        d = min(self.max_delay, self.base_delay * self.factor ** (attempt - 1))
+        return max(0.0, d * (1 + random.uniform(-self.jitter, self.jitter)))
+
+
+# Bez ponowień: operacje nieidempotentne (wydruk na papier - błąd po wysłaniu zadania do
+# spoolera ponowiony wydrukowałby dokument drugi raz); błąd od razu na listę nieudanych
+NO_RETRY = RetryPolicy(attempts=1)
+
+
+class CircuitOpen(RuntimeError):
+    """Zbyt wiele błędów w ostatnich dokumentach - przebieg zatrzymany."""
+
+
+class CircuitBreaker:
+    """Otwiera się, gdy w ostatnich 'window' dokumentach udział błędów przekroczy max_error_rate."""
+
+    def __init__(self, window: int = 50, max_error_rate: float = 0.5, min_calls: int = 10):
+        self.window = window
+        self.max_error_rate = max_error_rate
+        self.min_calls = min_calls
+        self._results: deque[bool] = deque(maxlen=window)
+
+    def record(self, ok: bool) -> None:
+        self._results.append(ok)
+
+    @property
+    def calls(self) -> int:
+        return len(self._results)
+
+    @property
+    def error_rate(self) -> float:
+        return self._results.count(False) / len(self._results) if self._results else 0.0
+
+    @property
+    def open(self) -> bool:
+        return self.calls >= self.min_calls and self.error_rate > self.max_error_rate
+
+# ============================================================================ #
+#                                WYKONAWCA
+# ============================================================================ #
+
+class ItemRunner:
+    """
+    Wykonuje operację na jednym dokumencie: ponawia błędy przejściowe,
+    błędy trwałe zapisuje na liście nieudanych i pozwala iść dalej.
+    Błąd krytyczny i otwarty bezpiecznik przerywają przebieg.
+    """
+
+    def __init__(self, policy: Optional[RetryPolicy] = None, breaker: Optional[CircuitBreaker] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.policy = policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.sleep = sleep
+        self.failed: list[dict] = []
+        self.retries = 0
+
+    def run(self, item: dict, fn: Callable[..., Any], *args, **kwargs) -> bool:
+        """fn(*args, **kwargs) dla dokumentu item ({id, numer}); True = sukces."""
+        if self.breaker.open:
+            msg = f"Przerwano: {self.breaker.error_rate:.0%} błędów w ostatnich dokumentach."
+            self.skip(item, msg)        # dokument nieprzetworzony - też do ponowienia
+            raise CircuitOpen(msg)
+        t0 = time.perf_counter()
+        for attempt in range(1, self.policy.attempts + 1):
+            try:
+                fn(*args, **kwargs)
+                self.breaker.record(True)
+                metryki.current().item(time.perf_counter() - t0)
+                return True
+            except Exception as e:
+                kind = classify(e)
+                if kind == FATAL:
+                    raise
+                if kind == TRANSIENT and attempt < self.policy.attempts:
+                    delay = self.policy.delay(attempt)
+                    self.retries += 1
+                    metryki.current().count("ponowienia")
+                    logger.warning("%s: błąd przejściowy (%s) – ponawiam za %.1f s (próba %d/%d).",
+                                   item.get("numer"), e, delay, attempt + 1, self.policy.attempts)
+                    self.sleep(delay)
+                    continue
+                logger.error("%s: pomijam dokument – %s (%s).", item.get("numer"), e, kind)
+                self.failed.append({"id": item.get("id"), "numer": item.get("numer"),
+                                    "klasa": kind, "proby": attempt, "blad": str(e)})
+                self.breaker.record(False)
+                metryki.current().item(time.perf_counter() - t0, ok=False)
+                if self.breaker.open:
+                    raise CircuitOpen(f"Przerwano: {self.breaker.error_rate:.0%} błędów "
+                                      f"w ostatnich {self.breaker.calls} dokumentach.") from e
+                return False
+        return False  # nieosiągalne
+
+    def skip(self, item: dict, reason: str) -> None:
+        """Dokument nieprzetworzony (np. po otwarciu bezpiecznika) - też na listę nieudanych."""
+        self.failed.append({"id": item.get("id"), "numer": item.get("numer"),
+                            "klasa": NOT_PROCESSED, "proby": 0, "blad": reason})
+
+    def write_dead_letters(self, folder: str | Path, prefix: str, params: Optional[dict] = None) -> Optional[Path]:
+        """
+        Zapisuje nieudane dokumenty jako manifest ({**params, "ids": [...], "bledy": [...]});
+        ponowny przebieg: skrypt.py --manifest <plik>. Bez błędów nic nie zapisuje.
+        """
+        if not self.failed:
+            return None
+        stamp = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+        path = create_unique(folder, f"{prefix}nieudane_{stamp}", ".json")
+        data = {**(params or {}), "ids": [f["id"] for f in self.failed], "bledy": self.failed}
+        path.write_text(json.dumps(data, ensure_ascii=False, indent=1, default=str), encoding="utf-8")
+        logger.warning("Nieudane dokumenty (%d) zapisano w %s – ponów: --manifest \"%s\"",
+                       len(self.failed), path, path)
+        return path
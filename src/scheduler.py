@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+Kolejka zadań launchera: uruchamia narzędzia jedno po drugim (z parametrami)
+i pilnuje limitu równoczesnych sesji Sfery (liczba stanowisk licencji).
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Optional
+
+# ============================================================================ #
+#                                   KONFIG
+# ============================================================================ #
+
+# Ile sesji Sfery może działać naraz (stanowiska licencji)
+DEFAULT_SEATS = max(1, int(os.getenv("SFERA_LICENCJE", "1") or 1))
+
+# Zmienna środowiskowa z plikiem postępu, przekazywana do uruchamianego narzędzia
+STATUS_ENV = "SFERA_JOB_STATUS"
+
+STATUS_QUEUED = "oczekuje"
+STATUS_RUNNING = "działa"
+STATUS_DONE = "zakończone"
+STATUS_FAILED = "błąd"
+STATUS_CANCELLED = "anulowane"
+
+# ============================================================================ #
+#                      Raportowanie postępu (po stronie narzędzia)
+# ============================================================================ #
+
+# Słuchacze postępu w tym samym procesie (np. okno postępu) i żądanie anulowania
+_listeners: list[Callable[[int, int], None]] = []
+_cancel = threading.Event()
+
+
+class Cancelled(Exception):
+    """Przebieg przerwany na żądanie użytkownika (po bieżącym dokumencie)."""
+
+
+def add_progress_listener(fn: Callable[[int, int], None]) -> None:
+    _listeners.append(fn)
+
+
+def remove_progress_listener(fn: Callable[[int, int], None]) -> None:
+    if fn in _listeners:
+        _listeners.remove(fn)
+
+
+def request_cancel() -> None:
+    """Pętle seryjne kończą pracę po bieżącym dokumencie (cancel_requested())."""
+    _cancel.set()
+
+
+def cancel_requested() -> bool:
+    return _cancel.is_set()
+
+
+def clear_cancel() -> None:
+    """Na początku kolejnego przebiegu w tym samym procesie (np. nowe okno postępu)."""
+    _cancel.clear()
+
+
+def report_progress(done: int, total: int) -> None:
+    """
+    Zapisuje postęp 'done total' do pliku wskazanego przez launcher
+    i przekazuje go słuchaczom w procesie (total = 0: nieznana liczba pozycji).
+    Bez launchera i słuchaczy nic nie robi.
+    """
+    for fn in list(_listeners):
+        try:
+            fn(done, total)
+        except Exception:
+            pass
+    path = os.environ.get(STATUS_ENV)
+    if not path:
+        return
+    try:
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="ascii") as f:
+            f.write(f"{int(done)} {int(total)}")
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def read_progress(path: str | None) -> tuple[int, int]:
+    if not path:
+        return 0, 0
+    try:
+        with open(path, "r", encoding="ascii") as f:
+            done, total = f.read().split()
+        return int(done), int(total)
+    except (OSError, ValueError):
+        return 0, 0
+
+
+def remove_progress(path: str | None) -> None:
+    """Usuwa plik postępu (i jego plik tymczasowy) po zakończeniu zadania."""
+    if not path:
+        return
+    for p in (path, f"{path}.tmp"):
+        try:
+            os.remove(p)
+        except OSError:
+            pass
+
+# ============================================================================ #
+#                                   ZADANIE
+# ============================================================================ #
+
+class Job:
+    """Pojedyncze uruchomienie narzędzia z parametrami."""
+
+    _next_id = 1
+
+    def __init__(self, app: dict, args: list[str] | None = None):
+        self.id = Job._next_id
+        Job._next_id += 1
+        self.app = app
+        self.args = list(args or [])
+        self.status = STATUS_QUEUED
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.returncode: Optional[int] = None
+        self.error: Optional[str] = None
+        self.proc: Optional[subprocess.Popen] = None
+        self.cancel_requested = False
+        self.final_progress: Optional[tuple[int, int]] = None   # po zakończeniu (plik usunięty)
+        self.status_file = str(Path(tempfile.gettempdir()) / f"sfera_job_{os.getpid()}_{self.id}.txt")
+
+    @property
+    def needs_seat(self) -> bool:
+        return bool(self.app.get("sfera", True))
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def progress(self) -> tuple[int, int]:
+        if self.final_progress is not None:
+            return self.final_progress
+        return read_progress(self.status_file)
+
+    @property
+    def throughput(self) -> float:
+        """Przetworzone pozycje na sekundę."""
+        done, _ = self.progress
+        el = self.elapsed
+        return done / el if el > 0 else 0.0
+
+# ============================================================================ #
+#                                 HARMONOGRAM
+# ============================================================================ #
+
+class JobScheduler:
+    """
+    Kolejka FIFO. Zadania korzystające z Sfery zajmują stanowisko licencji
+    na czas działania procesu; kolejne startuje natychmiast po zwolnieniu.
+    """
+
+    def __init__(self, launch: Callable[[Job], subprocess.Popen], seats: int = DEFAULT_SEATS):
+        self.launch = launch
+        self.seats = max(1, int(seats))
+        self.jobs: list[Job] = []
+        self._queue: deque[Job] = deque()
+        self._in_use = 0
+        self._cv = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._dispatch, daemon=True)
+        self._thread.start()
+
+    def submit(self, app: dict, args: list[str] | None = None) -> Job:
+        job = Job(app, args)
+        with self._cv:
+            self.jobs.append(job)
+            self._queue.append(job)
+            self._cv.notify_all()
+        return job
+
+    def cancel(self, job: Job) -> None:
+        """Anuluje zadanie oczekujące albo kończy działający proces."""
+        with self._cv:
+            if job.status == STATUS_QUEUED:
+                self._queue.remove(job)
+                job.status = STATUS_CANCELLED
+                return
+            if job.status != STATUS_RUNNING:
+                return
+            # proces jeszcze nieuruchomiony: _start zakończy go zaraz po starcie
+            job.cancel_requested = True
+            proc = job.proc
+        if proc is not None:
+            proc.terminate()
+
+    def stop(self) -> None:
+        with self._cv:
+            self._stopped = True
+            self._cv.notify_all()
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._cv:
+                while not self._stopped and not self._can_start_head():
+                    self._cv.wait()
+                if self._stopped:
+                    return
+                job = self._queue.popleft()
+                # status pod blokadą: cancel() nie szuka już zadania w kolejce
+                job.status = STATUS_RUNNING
+                job.started = time.monotonic()
+                if job.needs_seat:
+                    self._in_use += 1
+            self._start(job)
+
+    def _can_start_head(self) -> bool:
+        if not self._queue:
+            return False
+        return not self._queue[0].needs_seat or self._in_use < self.seats
+
+    def _start(self, job: Job) -> None:
+        try:
+            proc = self.launch(job)
+        except Exception as e:
+            job.error = str(e)
+            self._finish(job, STATUS_FAILED)
+            return
+        with self._cv:
+            job.proc = proc
+            cancelled = job.cancel_requested
+        if cancelled:
+            proc.terminate()
+        threading.Thread(target=self._wait, args=(job,), daemon=True).start()
+
+    def _wait(self, job: Job) -> None:
+        job.returncode = job.proc.wait()
+        if job.cancel_requested:
+            self._finish(job, STATUS_CANCELLED)
+        else:
+            self._finish(job, STATUS_DONE if job.returncode == 0 else STATUS_FAILED)
+
+    def _finish(self, job: Job, status: str) -> None:
+        job.finished = time.monotonic()
+        job.final_progress = read_progress(job.status_file)
+        remove_progress(job.status_file)
+        with self._cv:
+            job.status = status
+            if job.needs_seat:
+                self._in_use -= 1
+            self._cv.notify_all()
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Rejestr słowników (wzorce wydruku, kontrahenci, kategorie, ...) z typowanymi
+rekordami. load() pobiera wszystkie potrzebne słowniki jednym zapytaniem
+wsadowym (utils.run_sql_batch) zamiast osobnej podróży do serwera dla każdego.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Generic, Iterator, Optional, TypeVar
+
+from utils import run_sql_batch
+
+T = TypeVar("T")
+
+# ============================================================================ #
+#                                   REKORDY
+# ============================================================================ #
+
+@dataclass(frozen=True)
+class Wzorzec:
+    id: int
+    nazwa: str
+
+
+@dataclass(frozen=True)
+class Kontrahent:
+    id: int
+    nazwa: str
+    adres: str
+    miejscowosc: str
+
+    @property
+    def opis(self) -> str:
+        return f"{self.nazwa}, {self.adres}, {self.miejscowosc}"
+
+
+@dataclass(frozen=True)
+class Kategoria:
+    id: int
+    nazwa: str
+
+
+@dataclass(frozen=True)
+class Towar:
+    id: int
+    symbol: str
+    nazwa: str
+
+# ============================================================================ #
+#                                   REJESTR
+# ============================================================================ #
+
+@dataclass(frozen=True)
+class SlownikDef(Generic[T]):
+    name: str
+    sql: str
+    row: Callable[[dict], T]
+
+
+class Slownik(Generic[T]):
+    """Wczytany słownik: rekordy w kolejności zapytania, dostęp po id i po nazwie."""
+
+    def __init__(self, name: str, items: list[T]):
+        self.name = name
+        self.items = items
+        self._by_id = {it.id: it for it in items}
+        self._by_name = {it.nazwa.casefold(): it for it in items if hasattr(it, "nazwa")}
+
+    def get(self, id_: int) -> Optional[T]:
+        return self._by_id.get(int(id_))
+
+    def by_name(self, nazwa: str) -> Optional[T]:
+        return self._by_name.get(str(nazwa).strip().casefold())
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self.items)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+REGISTRY: dict[str, SlownikDef] = {}
+
+
+def register(name: str, sql: str, row: Callable[[dict], T]) -> SlownikDef[T]:
+    d = SlownikDef(name, sql, row)
+    REGISTRY[name] = d
+    return d
+
+
+def load(spAplikacja, names: list[str]) -> dict[str, Slownik]:
+    """Wczytuje wskazane słowniki jednym zapytaniem wsadowym."""
+    unknown = [n for n in names if n not in REGISTRY]
+    if unknown:
+        raise KeyError(f"Nieznane słowniki: {', '.join(unknown)}")
+    rows = run_sql_batch(spAplikacja, {n: REGISTRY[n].sql for n in names})
+    return {n: Slownik(n, [REGISTRY[n].row(r) for r in rows[n]]) for n in names}
+
+
+register(
+    "wzorce_fs",
+    """
+    SELECT wz.wzw_Id, wz.wzw_Nazwa
+      FROM wy_Wzorzec wz
+      JOIN wy_Typ wt ON wz.wzw_Typ = wt.wtp_Id
+     WHERE wt.wtp_Nazwa = 'Faktura sprzedaży'
+     ORDER BY wz.wzw_Nazwa
+    """,
+    lambda r: Wzorzec(int(r["wzw_Id"]), str(r["wzw_Nazwa"])),
+)
+
+register(
+    "kontrahenci",
+    """
+    SELECT k.kh_Id,
+           a.adr_Nazwa       AS Nazwa,
+           a.adr_Adres       AS Adres,
+           a.adr_Miejscowosc AS Miejscowosc
+      FROM kh__Kontrahent k
+      JOIN adr__Ewid a ON k.kh_Id = a.adr_IdObiektu
+     WHERE a.adr_TypAdresu = 1
+    """,
+    lambda r: Kontrahent(int(r["kh_Id"]), str(r["Nazwa"]), str(r["Adres"]), str(r["Miejscowosc"])),
+)
+
+register(
+    "kategorie",
+    """
+    SELECT kat_Id, kat_Nazwa
+      FROM sl_Kategoria
+     ORDER BY kat_Nazwa
+    """,
+    lambda r: Kategoria(int(r["kat_Id"]), str(r["kat_Nazwa"])),
+)
+
+register(
+    "towary",
+    """
+    SELECT tw_Id, tw_Symbol, tw_Nazwa
+      FROM tw__Towar
+     WHERE tw_Zablokowany = 0
+    """,
+    lambda r: Towar(int(r["tw_Id"]), str(r["tw_Symbol"]), str(r["tw_Nazwa"])),
+)
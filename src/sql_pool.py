@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+Bezpośredni odczyt z bazy Subiekta (bez logowania do Sfery).
+Mała pula połączeń DB-API (pyodbc wg zmiennych SFERA_SQL_* z run.ps1,
+lokalnie np. sqlite3) + ścieżka odczytu z awaryjnym przejściem na COM.
+
+Pula przyjmuje tylko pojedyncze zapytania SELECT/WITH (check_read_only), ale to
+zabezpieczenie po stronie klienta - ApplicationIntent=ReadOnly nie czyni połączenia
+tylko do odczytu. SFERA_SQL_LOGIN powinien być loginem z samą rolą db_datareader.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+try:
+    import pyodbc  # opcjonalnie: bez niego odczyt idzie przez COM
+except ImportError:
+    pyodbc = None
+
+logger = logging.getLogger(__name__)
+
+# Sterownik ODBC; "SQL Server" jest w każdym Windows, nowsze: "ODBC Driver 17 for SQL Server"
+DEFAULT_DRIVER = os.getenv("SFERA_SQL_DRIVER") or "SQL Server"
+DEFAULT_POOL_SIZE = 4
+CONNECT_TIMEOUT = int(os.getenv("SFERA_SQL_TIMEOUT") or 15)    # [s] logowanie do serwera
+QUERY_TIMEOUT = 300                                             # [s] pojedyncze zapytanie
+
+_READ_ONLY_RE = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+# literały, identyfikatory w [] i "" oraz komentarze - ich treść nie jest sprawdzana
+_SQL_SKIP_RE = re.compile(r"'(?:[^']|'')*'|\[[^\]]*\]|\"[^\"]*\"|--[^\n]*|/\*.*?\*/", re.DOTALL)
+_WRITE_RE = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|INTO|EXEC|EXECUTE|CREATE|ALTER|DROP|TRUNCATE|GRANT|"
+                       r"REVOKE|DENY|BACKUP|RESTORE|DBCC|SHUTDOWN|KILL|USE|DECLARE|SET)\b", re.IGNORECASE)
+
+
+def check_read_only(sql: str) -> None:
+    """
+    ValueError, jeśli sql nie jest pojedynczym zapytaniem SELECT/WITH: drugie polecenie
+    po ';' (poza literałami), SELECT ... INTO, WITH ... DELETE itp. są odrzucane.
+    """
+    if not _READ_ONLY_RE.match(sql):
+        raise ValueError("Pula służy tylko do odczytu (SELECT/WITH).")
+    code = _SQL_SKIP_RE.sub(" ", sql).strip().rstrip(";")
+    if ";" in code:
+        raise ValueError("Pula przyjmuje jedno zapytanie naraz (';' poza literałem).")
+    m = _WRITE_RE.search(code)
+    if m:
+        raise ValueError(f"Pula służy tylko do odczytu ({m.group(1).upper()} w zapytaniu).")
+
+
+class ConnectionPool:
+    """
+    Pula połączeń DB-API tworzonych leniwie przez connect(), najwyżej 'size' naraz.
+    Połączenie po błędzie jest zamykane zamiast wracać do puli. close() zamyka
+    połączenia wolne; używane w innych wątkach są zamykane dopiero przy zwrocie.
+    """
+
+    def __init__(self, connect: Callable[[], Any], size: int = DEFAULT_POOL_SIZE, timeout: float = 30.0):
+        self._connect = connect
+        self.size = max(1, int(size))
+        self.timeout = timeout
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"Brak wolnego połączenia w puli (rozmiar {self.size}).")
+        conn = None
+        try:
+            if self._closed:
+                raise ConnectionError("Pula połączeń została zamknięta.")
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            yield conn
+            with self._lock:
+                if not self._closed:
+                    self._idle.put(conn)
+                    return
+            self._discard(conn)
+        except BaseException:
+            if conn is not None:
+                self._discard(conn)
+            raise
+        finally:
+            self._slots.release()
+
+    def query(self, sql: str, params: tuple = ()) -> list[dict]:
+        """SELECT -> [{kolumna: wartość, ...}, ...] (jak utils.run_sql)."""
+        check_read_only(sql)
+        with self.connection() as conn:
+            cur = conn.cursor()
+            try:
+                return self._fetch(cur, sql, params)
+            finally:
+                cur.close()
+
+    def query_batch(self, queries: dict[str, str]) -> dict[str, list[dict]]:
+        """
+        Kilka SELECT-ów jednym execute() i cursor.nextset() - jedna podróż do serwera.
+        Sterowniki bez nextset() (np. sqlite3) dostają zapytania po kolei na jednym połączeniu.
+        """
+        for sql in queries.values():
+            check_read_only(sql)
+        names = list(queries)
+        if not names:
+            return {}
+        with self.connection() as conn:
+            cur = conn.cursor()
+            try:
+                if not hasattr(cur, "nextset"):
+                    return {name: self._fetch(cur, queries[name]) for name in names}
+                cur.execute("SET NOCOUNT ON;\n" + ";\n".join(q.strip().rstrip(";") for q in queries.values()))
+                results = {}
+                for name in names:
+                    results[name] = self._rows(cur)
+                    if len(results) < len(names) and not cur.nextset():
+                        raise RuntimeError(f"Zapytanie wsadowe zwróciło {len(results)} z {len(names)} wyników.")
+                return results
+            finally:
+                cur.close()
+
+    @classmethod
+    def _fetch(cls, cur, sql: str, params: tuple = ()) -> list[dict]:
+        cur.execute(sql, params)
+        return cls._rows(cur)
+
+    @staticmethod
+    def _rows(cur) -> list[dict]:
+        names = [c[0] for c in cur.description or ()]
+        return [dict(zip(names, row)) for row in cur.fetchall()]
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            conns = []
+            while not self._idle.empty():
+                conns.append(self._idle.get_nowait())
+        for conn in conns:
+            self._discard(conn)
+
+    @staticmethod
+    def _discard(conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def connection_string_from_env() -> Optional[str]:
+    """
+    Connection string ODBC ze zmiennych SFERA_SQL_*; None, jeśli brak serwera/bazy.
+    SFERA_BAZA/SFERA_SERWER (wiele_baz.py) mają pierwszeństwo - odczyt z tej samej bazy co sesja.
+    """
+    server = os.getenv("SFERA_SERWER") or os.getenv("SFERA_SQL_SERVER")
+    db = os.getenv("SFERA_BAZA") or os.getenv("SFERA_SQL_DB")
+    if not server or not db:
+        return None
+    parts = [f"DRIVER={{{DEFAULT_DRIVER}}}", f"SERVER={server}", f"DATABASE={db}", "ApplicationIntent=ReadOnly"]
+    login = os.getenv("SFERA_SQL_LOGIN")
+    if login:
+        parts += [f"UID={login}", f"PWD={os.getenv('SFERA_SQL_PASSWORD', '')}"]
+    else:
+        parts.append("Trusted_Connection=yes")
+    return ";".join(parts)
+
+
+def pool_from_env(size: int = DEFAULT_POOL_SIZE) -> Optional[ConnectionPool]:
+    """
+    Pula pyodbc wg run.ps1; None, jeśli brak pyodbc albo konfiguracji.
+    Limit czasu logowania (CONNECT_TIMEOUT) i zapytania (QUERY_TIMEOUT): niedostępny
+    serwer kończy się błędem połączenia (przejście na Sferę) zamiast zawieszenia puli.
+    """
+    conn_str = connection_string_from_env()
+    if pyodbc is None or conn_str is None:
+        return None
+
+    def connect():
+        conn = pyodbc.connect(conn_str, autocommit=True, readonly=True, timeout=CONNECT_TIMEOUT)
+        conn.timeout = QUERY_TIMEOUT
+        return conn
+
+    return ConnectionPool(connect, size=size)
+
+# ============================================================================ #
+#                              ŚCIEŻKA ODCZYTU
+# ============================================================================ #
+
+class ReadPath:
+    """
+    Źródło zapytań SELECT: pula bezpośrednich połączeń, a gdy jej brak lub
+    połączenie się nie uda - fallback(sql), np. run_sql przez sesję COM.
+    Obiekt można podać zamiast sesji do utils.run_sql i funkcji fetch_*.
+    """
+
+    def __init__(self, pool: Optional[ConnectionPool] = None,
+                 fallback: Optional[Callable[[str], list[dict]]] = None,
+                 fallback_batch: Optional[Callable[[dict[str, str]], dict[str, list[dict]]]] = None):
+        if pool is None and fallback is None:
+            raise ValueError("ReadPath wymaga puli połączeń albo ścieżki zapasowej.")
+        self.pool = pool
+        self.fallback = fallback
+        self.fallback_batch = fallback_batch
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=pool.size if pool else 1,
+                                            thread_name_prefix="sfera-sql")
+
+    @classmethod
+    def from_env(cls, fallback: Optional[Callable[[str], list[dict]]] = None,
+                 fallback_batch: Optional[Callable[[dict[str, str]], dict[str, list[dict]]]] = None,
+                 ) -> Optional["ReadPath"]:
+        pool = pool_from_env()
+        if pool is None and fallback is None:
+            return None
+        return cls(pool, fallback, fallback_batch)
+
+    @property
+    def direct(self) -> bool:
+        return self.pool is not None
+
+    def query(self, sql: str) -> list[dict]:
+        pool = self.pool            # lokalnie: inny wątek może w tym czasie odłączyć pulę
+        if pool is not None:
+            try:
+                return pool.query(sql)
+            except Exception as e:
+                self._drop_pool(pool, e)
+        return self.fallback(sql)
+
+    def query_batch(self, queries: dict[str, str]) -> dict[str, list[dict]]:
+        """Kilka SELECT-ów w jednej podróży do serwera: {nazwa: sql} -> {nazwa: wiersze}."""
+        pool = self.pool
+        if pool is not None:
+            try:
+                return pool.query_batch(queries)
+            except Exception as e:
+                self._drop_pool(pool, e)
+        if self.fallback_batch is not None:
+            return self.fallback_batch(queries)
+        return {name: self.fallback(sql) for name, sql in queries.items()}
+
+    def _drop_pool(self, pool: ConnectionPool, e: Exception) -> None:
+        """
+        Po błędzie połączenia przełącza na ścieżkę zapasową; inne błędy przepuszcza.
+        Pulę odłącza raz (pod blokadą); zapytania w toku w innych wątkach kończą się
+        na swoich połączeniach, a te są zamykane przy zwrocie do puli.
+        """
+        if self.fallback is None or not _is_connection_error(e):
+            raise e
+        with self._lock:
+            if self.pool is not pool:
+                return              # już odłączona przez inny wątek
+            self.pool = None
+        logger.warning("Bezpośrednie połączenie SQL niedostępne (%s) – odczyt przez Sferę.", e)
+        pool.close()
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """fn(self, *args, **kwargs) w wątku puli - równolegle na kilku połączeniach."""
+        return self._executor.submit(fn, self, *args, **kwargs)
+
+    def query_many(self, sqls: dict[str, str]) -> dict[str, list[dict]]:
+        """Kilka zapytań równolegle: {nazwa: sql} -> {nazwa: wiersze}."""
+        futures = {name: self._executor.submit(self.query, sql) for name, sql in sqls.items()}
+        return {name: f.result() for name, f in futures.items()}
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        with self._lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.close()
+
+
+def _is_connection_error(e: Exception) -> bool:
+    if pyodbc is not None and isinstance(e, (pyodbc.OperationalError, pyodbc.InterfaceError)):
+        return True
+    return isinstance(e, (TimeoutError, ConnectionError))
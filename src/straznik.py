@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Strażnik sesji Sfery: w długich przebiegach proces Subiekta rośnie (pamięć,
+uchwyty), a czas na dokument się wydłuża, aż do awarii. Strażnik próbkuje
+proces sesji i liczy kroczącą medianę czasu pozycji; po przekroczeniu progów
+ComWorker kończy sesję (Zakoncz), loguje się ponownie i kontynuuje od
+bieżącej pozycji.
+
+Próbkowanie idzie przez sampler (attach/sample) - na Windows psutil, w testach
+dowolny obiekt z tymi dwiema metodami. Bez psutil działa sam próg czasu.
+
+Progi (zmienne środowiskowe):
+    SFERA_STRAZNIK=0              wyłącza strażnika
+    SFERA_STRAZNIK_MB=1500        pamięć procesu sesji [MB]
+    SFERA_STRAZNIK_UCHWYTY=10000  uchwyty procesu sesji
+    SFERA_STRAZNIK_WOLNIEJ=3      mediana czasu pozycji względem początku sesji
+    SFERA_STRAZNIK_PROCES=subiekt nazwa procesu sesji (fragment, po przecinku kilka)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Optional, Protocol
+
+try:
+    import psutil  # opcjonalnie: pamięć i uchwyty procesu sesji
+except ImportError:
+    psutil = None
+
+from metryki import percentile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MB = 1500
+DEFAULT_HANDLES = 10000
+DEFAULT_SLOWDOWN = 3.0
+DEFAULT_PROCESS = "subiekt"
+WINDOW = 50                 # pozycji w medianie kroczącej (i w bazowej po zalogowaniu)
+SAMPLE_INTERVAL = 5.0       # [s] między próbkami procesu
+
+
+@dataclass(frozen=True)
+class Probe:
+    pamiec_mb: float
+    uchwyty: Optional[int] = None
+
+
+class Sampler(Protocol):
+    def attach(self, since: float) -> None:
+        """Po zalogowaniu: wskazanie procesu sesji (uruchomionego po czasie 'since', unix)."""
+
+    def sample(self) -> Optional[Probe]:
+        """Bieżąca próbka procesu sesji; None, jeśli niedostępna."""
+
+# ============================================================================ #
+#                                  SAMPLERY
+# ============================================================================ #
+
+class NullSampler:
+    """Bez próbkowania procesu (brak psutil) - strażnik pilnuje tylko czasu pozycji."""
+
+    def attach(self, since: float) -> None:
+        pass
+
+    def sample(self) -> Optional[Probe]:
+        return None
+
+
+class ProcessSampler:
+    """
+    psutil: najnowszy proces o nazwie zawierającej jeden z fragmentów 'names',
+    uruchomiony po zalogowaniu; bez takiego procesu - własny (Sfera w procesie).
+    """
+
+    def __init__(self, names: tuple[str, ...] = (DEFAULT_PROCESS,)):
+        self.names = tuple(n.lower() for n in names if n)
+        self._proc = None
+
+    def attach(self, since: float) -> None:
+        found = []
+        for p in psutil.process_iter(["name", "create_time"]):
+            name = (p.info.get("name") or "").lower()
+            if any(n in name for n in self.names) and (p.info.get("create_time") or 0) >= since - 1:
+                found.append(p)
+        self._proc = max(found, key=lambda p: p.info["create_time"]) if found else psutil.Process()
+        logger.debug("Strażnik: proces sesji %s (pid %d).", self._proc.name(), self._proc.pid)
+
+    def sample(self) -> Optional[Probe]:
+        if self._proc is None:
+            return None
+        try:
+            with self._proc.oneshot():
+                mb = self._proc.memory_info().rss / 2**20
+                if hasattr(self._proc, "num_handles"):
+                    handles = self._proc.num_handles()
+                else:
+                    handles = self._proc.num_fds()
+        except (psutil.Error, OSError):
+            return None
+        return Probe(mb, handles)
+
+# ============================================================================ #
+#                                  STRAŻNIK
+# ============================================================================ #
+
+class Watchdog:
+    """
+    item(s) po każdej pozycji, check() -> powód recyklingu albo None,
+    attach() po (ponownym) zalogowaniu - zeruje okna czasu i wskazuje proces.
+    """
+
+    def __init__(self, sampler: Sampler, max_mb: Optional[float] = DEFAULT_MB,
+                 max_handles: Optional[int] = DEFAULT_HANDLES, slowdown: Optional[float] = DEFAULT_SLOWDOWN,
+                 window: int = WINDOW, interval: float = SAMPLE_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.sampler = sampler
+        self.max_mb = max_mb
+        self.max_handles = max_handles
+        self.slowdown = slowdown
+        self.window = max(1, window)
+        self.interval = interval
+        self.clock = clock
+        self.last: Optional[Probe] = None
+        self._baseline: list[float] = []
+        self._recent: deque[float] = deque(maxlen=self.window)
+        self._next_sample = 0.0
+
+    def attach(self, since: Optional[float] = None) -> None:
+        self.sampler.attach(time.time() if since is None else since)
+        self._baseline.clear()
+        self._recent.clear()
+        self.last = None
+        self._next_sample = 0.0
+
+    def item(self, seconds: float) -> None:
+        if len(self._baseline) < self.window:
+            self._baseline.append(seconds)
+        else:
+            self._recent.append(seconds)
+
+    def check(self) -> Optional[str]:
+        now = self.clock()
+        if now >= self._next_sample:
+            self._next_sample = now + self.interval
+            self.last = self.sampler.sample() or self.last
+            p = self.last
+            if p is not None and self.max_mb and p.pamiec_mb > self.max_mb:
+                return f"pamięć procesu sesji {p.pamiec_mb:.0f} MB > {self.max_mb:.0f} MB"
+            if p is not None and p.uchwyty is not None and self.max_handles and p.uchwyty > self.max_handles:
+                return f"uchwyty procesu sesji {p.uchwyty} > {self.max_handles}"
+        if self.slowdown and len(self._recent) == self.window:
+            base = percentile(self._baseline, 0.5)
+            cur = percentile(list(self._recent), 0.5)
+            if base and cur > base * self.slowdown:
+                return f"mediana czasu pozycji {cur:.3f} s > {self.slowdown:g} × {base:.3f} s (początek sesji)"
+        return None
+
+
+def from_env() -> Optional[Watchdog]:
+    """Strażnik wg zmiennych SFERA_STRAZNIK*; None, gdy wyłączony."""
+    if os.getenv("SFERA_STRAZNIK", "1").strip() == "0":
+        return None
+    names = tuple(n.strip() for n in os.getenv("SFERA_STRAZNIK_PROCES", DEFAULT_PROCESS).split(","))
+    sampler = ProcessSampler(names) if psutil is not None else NullSampler()
+    return Watchdog(
+        sampler,
+        max_mb=float(os.getenv("SFERA_STRAZNIK_MB") or DEFAULT_MB),
+        max_handles=int(os.getenv("SFERA_STRAZNIK_UCHWYTY") or DEFAULT_HANDLES),
+        slowdown=float(os.getenv("SFERA_STRAZNIK_WOLNIEJ") or DEFAULT_SLOWDOWN),
+    )
@@ -1,10 +1,13 @@
 import logging
+from pathlib import Path
 
 import pythoncom
 from pywintypes import com_error
 
 import logowanie
-from utils import get_subiekt, run_sql
+import metryki
+import replika
+from utils import get_subiekt
 
 logger = logging.getLogger(__name__)
 
@@ -14,14 +17,12 @@ LOG_PREFIX = "ZK_"
 
 
 def get_kategoria_id(sub, nazwa: str) -> int:
-    """Pobiera ID kategorii o podanej nazwie."""
-    kategoria = run_sql(sub, f"""SELECT kat_Id
-                                   FROM sl_Kategoria
-                                  WHERE kat_Nazwa = '{nazwa}'""")
-    if not kategoria:
+    """Pobiera ID kategorii o podanej nazwie (lokalna replika słownika 'kategorie')."""
+    kategoria = replika.katalog(sub, ["kategorie"]).by("kategorie", "nazwa", nazwa)
+    if kategoria is None:
         logger.warning("Nie znaleziono kategorii o nazwie '%s', zostanie użyta domyślna.", nazwa)
         return None
-    return kategoria[0]['kat_Id']
+    return kategoria.id
 
 
 def main():
@@ -29,7 +30,8 @@ def main():
     sub = None
     
     try:
-        sub = get_subiekt()
+        with metryki.current().stage("logowanie"):
+            sub = get_subiekt()
         nowy_dok = sub.Dokumenty.Dodaj(-8)
         logger.info("Wyświetlam okno do tworzenia nowego dokumentu ZK...")
         kategoria_id = get_kategoria_id(sub, kategoria)
@@ -57,7 +59,9 @@ def main():
 if __name__ == "__main__":
     logfile = logowanie.setup_logging(LOG_PREFIX = LOG_PREFIX)
     logger.info(f"Start aplikacji. Logi zapisuję do pliku: {logfile}")
-    # try:
-    main()
-    # finally:
+    metryki.start("stworz_zk", LOG_PREFIX)
+    try:
+        main()
+    finally:
+        metryki.finish(Path(logfile).parent)
     #     show_completion_dialog(logfile=logfile, logs_dir="logs")
\ No newline at end of file
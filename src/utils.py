@@ -1,12 +1,15 @@
 import getpass
+import os
 import re
 import shutil
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 import pywintypes
 import win32cred
 from win32com.client import Dispatch, gencache
 
+from sql_pool import ReadPath
+
 
 def to_com_time(dt: datetime):
     return pywintypes.Time(dt)
@@ -20,22 +23,116 @@ def run_sql(spAplikacja, sql: str) -> list[dict]:
     """
     Wykonuje dowolny SELECT w Subiekcie przez ADO/COM.
     Zwraca listę słowników: [{kolumna: wartość, ...}, ...]
+    Zamiast sesji można podać sql_pool.ReadPath (odczyt bez Sfery).
     """
+    if isinstance(spAplikacja, ReadPath):
+        return spAplikacja.query(sql)
     conn = spAplikacja.Aplikacja.Baza.Polaczenie  # ADODB.Connection
     rs = Dispatch("ADODB.Recordset")
     # adUseClient=3, adOpenStatic=3, adLockReadOnly=1, adCmdText=1
     rs.CursorLocation = 3
     rs.Open(sql, conn, 3, 1, 1)
 
+    results = _read_recordset(rs)
+    rs.Close()
+    return results
+
+
+def run_sql_batch(spAplikacja, queries: dict[str, str]) -> dict[str, list[dict]]:
+    """
+    Kilka SELECT-ów jednym poleceniem (jedna podróż do serwera).
+    queries: {nazwa: sql}; zwraca {nazwa: [wiersze]} w tej samej kolejności.
+    Kolejne wyniki czytane przez Recordset.NextRecordset().
+    """
+    if isinstance(spAplikacja, ReadPath):
+        return spAplikacja.query_batch(queries)
+    names = list(queries)
+    if not names:
+        return {}
+    sql = "SET NOCOUNT ON;\n" + ";\n".join(q.strip().rstrip(";") for q in queries.values())
+
+    conn = spAplikacja.Aplikacja.Baza.Polaczenie  # ADODB.Connection
+    rs = Dispatch("ADODB.Recordset")
+    # adUseServer=2, adOpenForwardOnly=0, adLockReadOnly=1, adCmdText=1 - NextRecordset po stronie serwera
+    rs.CursorLocation = 2
+    rs.Open(sql, conn, 0, 1, 1)
+
+    results: dict[str, list[dict]] = {}
+    while rs is not None and len(results) < len(names):
+        if rs.State != 0:  # adStateClosed = polecenie bez wyniku
+            results[names[len(results)]] = _read_recordset(rs)
+        nxt = rs.NextRecordset()
+        rs = nxt[0] if isinstance(nxt, tuple) else nxt
+    if len(results) != len(names):
+        raise RuntimeError(f"Zapytanie wsadowe zwróciło {len(results)} z {len(names)} wyników.")
+    return results
+
+
+def _read_recordset(rs) -> list[dict]:
     results: list[dict] = []
     field_names = [f.Name for f in rs.Fields]
     while not rs.EOF:
         results.append({name: rs.Fields[name].Value for name in field_names})
         rs.MoveNext()
-    rs.Close()
     return results
 
 
+def sql_str(value) -> str:
+    """Literał tekstowy T-SQL (apostrofy podwojone)."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def doc_where(typ: int | None = None,
+              od: date | None = None, do: date | None = None,
+              numery: list[str] = (), kh_ids: list[int] = (), ids: list[int] = (),
+              alias: str = "d") -> str:
+    """
+    Warunek WHERE na dok__Dokument (alias 'd') wg filtra z cli.doc_filter().
+    Numery mogą zawierać '*' jako dowolny ciąg znaków.
+    """
+    where = []
+    if typ is not None:
+        where.append(f"{alias}.dok_Typ = {int(typ)}")
+    if od:
+        where.append(f"{alias}.dok_DataWyst >= '{od.isoformat()}'")
+    if do:
+        where.append(f"{alias}.dok_DataWyst < '{(do + timedelta(days=1)).isoformat()}'")
+    if numery:
+        where.append("(" + " OR ".join(_numer_cond(f"{alias}.dok_NrPelny", n) for n in numery) + ")")
+    if kh_ids:
+        where.append(f"{alias}.dok_OdbiorcaId IN ({', '.join(str(int(k)) for k in kh_ids)})")
+    if ids:
+        where.append(f"{alias}.dok_Id IN ({', '.join(str(int(i)) for i in ids)})")
+    return " AND ".join(where) or "1 = 1"
+
+
+def _numer_cond(column: str, numer: str) -> str:
+    """Numer dokumentu: '=' albo LIKE, gdy zawiera '*'; '%', '_' i '[' zawsze dosłownie."""
+    if "*" not in numer:
+        return f"{column} = {sql_str(numer)}"
+    pattern = re.sub(r"([\\%_\[])", r"\\\1", numer).replace("*", "%")
+    return f"{column} LIKE {sql_str(pattern)} ESCAPE '\\'"
+
+
+def find_doc_ids(spAplikacja, typ: int, **filtr) -> list[int]:
+    """Wybór dokumentów filtrem SQL zamiast okna Wybierz() (tryb bez okien)."""
+    rows = run_sql(spAplikacja, f"""
+        SELECT d.dok_Id
+          FROM dok__Dokument d
+         WHERE {doc_where(typ, **filtr)}
+         ORDER BY d.dok_DataWyst, d.dok_Id
+    """)
+    return [int(r["dok_Id"]) for r in rows]
+
+
+def select_docs_by_filter(spAplikacja, typ: int, filtr: dict) -> list:
+    """Jak select_docs_prev_month, ale bez okna: dokumenty wg filtra z cli.doc_filter()."""
+    ids = find_doc_ids(spAplikacja, typ, **filtr)
+    docs = [spAplikacja.Dokumenty.Wczytaj(i) for i in ids]
+    print(f"Wybrano {len(docs)} dokumentów (filtr).")
+    return docs
+
+
 def get_subiekt() -> any:
     """Logowanie do Subiekta wg zmiennych środowiskowych."""
     try:
@@ -49,6 +146,21 @@ def get_subiekt() -> any:
     # gt.Uzytkownik = os.getenv("SFERA_SQL_LOGIN", "sa")
     # gt.UzytkownikHaslo = os.getenv("SFERA_SQL_PASSWORD", "SqlPassword01!")
     # gt.Baza = os.getenv("SFERA_SQL_DB", "sfera_demo")
+    baza = os.getenv("SFERA_BAZA")       # tylko wiele_baz.py - bez niej baza z konfiguracji Sfery
+    if baza:
+        # serwer i baza razem, inaczej Sfera szukałaby bazy na serwerze z konfiguracji
+        serwer = os.getenv("SFERA_SERWER") or os.getenv("SFERA_SQL_SERVER")
+        if serwer:
+            # inny serwer - logowanie do niego też nie z konfiguracji
+            gt.Serwer = serwer
+            login = os.getenv("SFERA_SQL_LOGIN")
+            if login:
+                gt.Autentykacja = 0           # gtaAutentykacjaSQL
+                gt.Uzytkownik = login
+                gt.UzytkownikHaslo = os.getenv("SFERA_SQL_PASSWORD", "")
+            else:
+                gt.Autentykacja = 1           # gtaAutentykacjaWindows
+        gt.Baza = baza
     gt.Operator = cred_read()[0]
     gt.OperatorHaslo = cred_read()[1]
     sub = Dispatch(gt.Uruchom(1, 4))
@@ -82,21 +194,31 @@ def select_docs_prev_month(dok_manager, typ: int) -> list:
     return docs
 
 
-def safe_filename(name: str, ext="pdf", maxlen=150) -> str:
-    name = re.sub(r'[\x00-\x1f]+', '', name)                # usuń znaki sterujące
-    name = re.sub(r'[\\/:*?"<>|]+', '-', name)              # zamień niedozwolone
-    name = re.sub(r'\s+', ' ', name).strip().rstrip(' .')   # zbędne spacje/kropki
-    reserved = {"CON","PRN","AUX","NUL","COM1","COM2","COM3","COM4","COM5","COM6","COM7","COM8","COM9",
-                "LPT1","LPT2","LPT3","LPT4","LPT5","LPT6","LPT7","LPT8","LPT9"}
+_CTRL_RE = re.compile(r'[\x00-\x1f]+')
+_ILLEGAL_RE = re.compile(r'[\\/:*?"<>|]+')
+_WS_RE = re.compile(r'\s+')
+_RESERVED_NAMES = frozenset({
+    "CON","PRN","AUX","NUL","COM1","COM2","COM3","COM4","COM5","COM6","COM7","COM8","COM9",
+    "LPT1","LPT2","LPT3","LPT4","LPT5","LPT6","LPT7","LPT8","LPT9",
+})
+
+def safe_name(name: str, maxlen=150) -> str:
+    """Nazwa pliku/katalogu bez rozszerzenia, bezpieczna dla Windows."""
+    name = _CTRL_RE.sub('', name)                           # usuń znaki sterujące
+    name = _ILLEGAL_RE.sub('-', name)                       # zamień niedozwolone
+    name = _WS_RE.sub(' ', name).strip().rstrip(' .')       # zbędne spacje/kropki
     stem = name.split('.', 1)[0]
-    if stem.upper() in reserved:
+    if stem.upper() in _RESERVED_NAMES:
         name = f"_{name}"
     if len(name) > maxlen:
         base, dot, ext_old = name.partition('.')
         ext_suffix = f".{ext_old}" if dot else ""
         keep = max(1, maxlen - len(ext_suffix))
         name = base[:keep] + ext_suffix
-    return f"{name}.{ext}"
+    return name
+
+def safe_filename(name: str, ext="pdf", maxlen=150) -> str:
+    return f"{safe_name(name, maxlen)}.{ext}"
 
 _PERSIST = {
     "session": win32cred.CRED_PERSIST_SESSION,
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+To samo narzędzie (eksport FS, zmiana dat MM, raporty, ...) na kilku bazach
+Subiekta naraz: każda baza w osobnym procesie z własną sesją Sfery
+(SFERA_BAZA, SFERA_SERWER), własnym folderem logów (logs\\<baza>) i postępem w kolejce
+zadań (scheduler.JobScheduler - limit stanowisk licencji). Na końcu
+podsumowanie zbiorcze z metryk przebiegów każdej bazy.
+
+    python src\\wiele_baz.py --bazy firma_a,firma_b --narzedzie drukuj_fs -- --od 2024-01-01 --do 2024-01-31
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import logowanie
+from launcher import APPS, launch_job
+from scheduler import DEFAULT_SEATS, STATUS_CANCELLED, STATUS_DONE, STATUS_FAILED, Job, JobScheduler
+
+logger = logging.getLogger(__name__)
+
+LOG_PREFIX = "WIELE_BAZ_"
+FINISHED = (STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED)
+
+
+def db_log_dir(db: str) -> Path:
+    return Path(logowanie.LOG_DIR) / db
+
+
+def latest_metrics(folder: Path, since: float) -> Optional[dict]:
+    """Metryki (metryki.finish) zapisane w folderze po czasie 'since' (unix); None, jeśli brak."""
+    files = [p for p in folder.glob("*metryki_*.json") if p.stat().st_mtime >= since]
+    if not files:
+        return None
+    try:
+        return json.loads(max(files, key=lambda p: p.stat().st_mtime).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def run_all(app: dict, dbs: list[str], args: list[str], seats: int, poll: float = 1.0,
+            server: Optional[str] = None) -> list[dict]:
+    """Uruchamia app na każdej bazie (najwyżej 'seats' naraz) i czeka na wszystkie; zwraca podsumowanie."""
+    since = time.time()
+    scheduler = JobScheduler(launch=launch_job, seats=seats)
+    jobs: dict[str, Job] = {}
+    for db in dbs:
+        db_log_dir(db).mkdir(parents=True, exist_ok=True)
+        # baza i folder logów przez zmienne środowiskowe procesu (utils.get_subiekt, logowanie.LOG_DIR)
+        env = {**app.get("env", {}), "SFERA_BAZA": db, "SFERA_LOG_DIR": str(db_log_dir(db).resolve())}
+        if server:
+            env["SFERA_SERWER"] = server
+        jobs[db] = scheduler.submit({**app, "label": f"{app['label']} [{db}]", "env": env}, args)
+    logger.info("Uruchomiono %s na %d bazach (równolegle: %d).", app["id"], len(dbs), seats)
+
+    last = {}
+    try:
+        while not all(j.status in FINISHED for j in jobs.values()):
+            time.sleep(poll)
+            for db, job in jobs.items():
+                state = (job.status, job.progress)
+                if state != last.get(db):
+                    done, total = job.progress
+                    logger.info("%-20s %-10s %s", db, job.status, f"{done}/{total}" if total else done or "")
+                    last[db] = state
+    finally:
+        scheduler.stop()
+
+    summary = []
+    for db, job in jobs.items():
+        m = latest_metrics(db_log_dir(db), since) or {}
+        it = m.get("items") or {}
+        summary.append({
+            "baza": db,
+            "status": job.status,
+            "kod": job.returncode,
+            "blad": job.error,
+            "czas_s": round(job.elapsed, 1),
+            "pozycje": it.get("count"),
+            "bledy": it.get("errors"),
+            "poz_na_s": it.get("per_sec"),
+            "logi": str(db_log_dir(db)),
+        })
+    return summary
+
+
+def write_summary(summary: list[dict], wall: float, folder: Path) -> Path:
+    path = folder / f"{LOG_PREFIX}podsumowanie_{datetime.now():%Y-%m-%d_%H%M%S}.json"
+    path.write_text(json.dumps({"czas_calkowity_s": round(wall, 1), "bazy": summary},
+                               ensure_ascii=False, indent=1), encoding="utf-8")
+    return path
+
+
+def log_summary(summary: list[dict], wall: float) -> None:
+    logger.info("%-20s %-10s %8s %8s %6s %8s", "baza", "status", "czas [s]", "pozycje", "błędy", "poz./s")
+    for s in summary:
+        logger.info("%-20s %-10s %8s %8s %6s %8s", s["baza"], s["status"], s["czas_s"],
+                    s["pozycje"] if s["pozycje"] is not None else "-",
+                    s["bledy"] if s["bledy"] is not None else "-",
+                    s["poz_na_s"] if s["poz_na_s"] is not None else "-")
+    serial = sum(s["czas_s"] for s in summary)
+    logger.info("Czas całkowity %.1f s (kolejno byłoby ~%.1f s).", wall, serial)
+
+
+def parse_args(argv=None) -> tuple[argparse.Namespace, list[str]]:
+    ap = argparse.ArgumentParser(
+        description="Narzędzie na kilku bazach równolegle. Parametry po '--' trafiają do narzędzia.")
+    ap.add_argument("--bazy", required=True, help="Bazy Subiekta, po przecinku.")
+    ap.add_argument("--serwer", help="Serwer SQL baz (domyślnie SFERA_SQL_SERVER).")
+    ap.add_argument("--narzedzie", required=True, choices=[a["id"] for a in APPS], help="Narzędzie z launchera.")
+    ap.add_argument("--rownolegle", type=int,
+                    help="Ile baz naraz (domyślnie SFERA_LICENCJE; narzędzia bez Sfery - wszystkie).")
+    args, rest = ap.parse_known_args(argv)
+    if rest and rest[0] == "--":
+        rest = rest[1:]
+    return args, rest
+
+
+def main(argv=None) -> int:
+    args, tool_args = parse_args(argv)
+    app = next(a for a in APPS if a["id"] == args.narzedzie)
+    dbs = [b.strip() for b in args.bazy.split(",") if b.strip()]
+    if "--headless" not in tool_args and "--manifest" not in tool_args:
+        tool_args = ["--headless", *tool_args]   # procesy w tle nie mogą czekać na okna
+    seats = args.rownolegle or (DEFAULT_SEATS if app.get("sfera", True) else len(dbs))
+    if seats < len(dbs):
+        logger.info("Stanowiska Sfery: %d – bazy ponad limit czekają w kolejce (SFERA_LICENCJE).", seats)
+
+    t0 = time.monotonic()
+    summary = run_all(app, dbs, tool_args, seats, server=args.serwer)
+    wall = time.monotonic() - t0
+    log_summary(summary, wall)
+    logger.info("Podsumowanie: %s", write_summary(summary, wall, Path(logowanie.LOG_DIR)))
+    return 0 if all(s["status"] == STATUS_DONE for s in summary) else 1
+
+
+if __name__ == "__main__":
+    logowanie.setup_logging(LOG_PREFIX=LOG_PREFIX)
+    raise SystemExit(main())
@@ -1,71 +1,192 @@
+import argparse
 import logging
-from datetime import datetime, time
+from pathlib import Path
+from typing import Optional
 
-import pythoncom
 from pywintypes import com_error
 
+import bulk_edit
 import logowanie
-from gui import ask_new_date_and_dryrun, show_completion_dialog
-from utils import get_subiekt, select_docs_prev_month, to_com_time
+import metryki
+from cli import add_common_args, doc_filter, parse_date, resolve_runs
+from com_worker import ComWorker
+from gui import ProgressWindow, ask_new_date_and_dryrun, show_completion_dialog, show_table_preview
+from utils import doc_where, run_sql, select_docs_prev_month
 
 logger = logging.getLogger(__name__)
 
 # ===================== Stałe =====================
 LOG_PREFIX = "MM_"   # prefiks nazwy pliku logu
+MM_TYP = 9           # dok_Typ dokumentu MM
 
 # ===================== GŁÓWNY SKRYPT =====================
-def main():
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Seryjna zmiana daty wystawienia dokumentów MM.")
+    ap.add_argument("--data", help="Nowa data dokumentów (YYYY-MM-DD); wymagana w trybie bez okien.")
+    ap.add_argument("--wznow", help="Wznów przerwany przebieg z pliku dziennika (.jsonl).")
+    ap.add_argument("--cofnij", help="Przywróć stare daty zapisane w dzienniku (.jsonl).")
+    add_common_args(ap)
+    return ap.parse_args(argv)
+
+
+def ask_params(run: dict):
+    """Nowa data i dry-run: z parametrów (bez okien) albo z okna dialogowego."""
+    if run["headless"]:
+        if not run.get("data"):
+            raise ValueError("W trybie bez okien podaj nową datę: --data YYYY-MM-DD")
+        return parse_date(run["data"]), bool(run["dry_run"])
     # Pytanie w GUI zamiast argparse:
-    user_date, dry_run = ask_new_date_and_dryrun(default_dayshift=0, default_dryrun=True)
-    if user_date is None:
-        print("Anulowano przez użytkownika.")
-        return
+    return ask_new_date_and_dryrun(default_dayshift=0, default_dryrun=True)
 
-    # Ustal noon, aby uniknąć problemów z DST
-    d_noon = datetime.combine(user_date, time(12, 0))
-    new_date = to_com_time(d_noon)
 
-    pythoncom.CoInitialize()
-    sub = None
-    try:
-        sub = get_subiekt()
-        selected = select_docs_prev_month(sub.Dokumenty, typ=9)  # 9 = MM
+# ===================== PODGLĄD (DRY RUN) =====================
+def preview_changes(src, user_date, filtr: Optional[dict] = None, ids: Optional[list[int]] = None) -> list[dict]:
+    """
+    Podgląd zmiany dat jednym zapytaniem (bez otwierania dokumentów przez COM):
+    numer, netto, stara data, przesunięcie w dniach, miesiąc przed/po i ruch magazynowy.
+    Ryzyko: dokument z ruchem magazynowym przenoszony do innego miesiąca - zmienia
+    stany i wycenę rozchodów w obu okresach. Zwraca tylko dokumenty z inną datą.
+    """
+    if ids is not None and not ids:
+        return []
+    where = doc_where(MM_TYP, ids=ids) if ids is not None else doc_where(MM_TYP, **(filtr or {}))
+    new = user_date.isoformat()
+    with metryki.current().stage("podglad"):
+        rows = run_sql(src, f"""
+            SELECT d.dok_Id, d.dok_NrPelny, d.dok_WartNetto, d.dok_DataWyst, d.dok_JestRuchMag,
+                   DATEDIFF(day, d.dok_DataWyst, '{new}') AS przesuniecie
+              FROM dok__Dokument d
+             WHERE {where}
+               AND DATEDIFF(day, d.dok_DataWyst, '{new}') <> 0
+             ORDER BY d.dok_DataWyst, d.dok_Id
+        """)
+    new_month = f"{user_date:%Y-%m}"
+    out = []
+    for r in rows:
+        old = bulk_edit.FIELDS["data"][2](r["dok_DataWyst"])   # normalizacja daty jak w planie zmian
+        old_month = f"{old:%Y-%m}" if old else "?"
+        stock = bool(r["dok_JestRuchMag"])
+        out.append({"id": int(r["dok_Id"]), "numer": str(r["dok_NrPelny"]),
+                    "netto": float(r["dok_WartNetto"] or 0), "data": old.isoformat() if old else None,
+                    "dni": int(r["przesuniecie"]), "miesiac": old_month, "nowy_miesiac": new_month,
+                    "ruch_mag": stock, "ryzyko": stock and old_month != new_month})
+    return out
+
+
+PREVIEW_COLUMNS = [("numer", "Numer", 160), ("data", "Data", 90), ("dni", "Przesunięcie [dni]", 110),
+                   ("miesiac", "Miesiąc", 80), ("nowy_miesiac", "Nowy miesiąc", 90),
+                   ("netto", "Netto", 100), ("ruch_mag", "Ruch mag.", 70), ("ryzyko", "Ryzyko", 70)]
+
+
+def preview_summary(rows: list[dict], user_date) -> str:
+    risky = sum(1 for r in rows if r["ryzyko"])
+    text = (f"DRY RUN: {len(rows)} dokumentów MM zmieni datę na {user_date.isoformat()}, "
+            f"netto razem {sum(r['netto'] for r in rows):.2f}.")
+    if risky:
+        text += f" Uwaga: {risky} z ruchem magazynowym przejdzie do innego miesiąca."
+    return text
+
+
+def show_preview(rows: list[dict], user_date) -> bool:
+    """(wątek Tk) Tabela podglądu; True = zapisz zmiany dla pokazanych dokumentów."""
+    keys = [c[0] for c in PREVIEW_COLUMNS]
+    table = [tuple(("tak" if r[k] else "") if k in ("ruch_mag", "ryzyko") else r[k] for k in keys) for r in rows]
+    return show_table_preview(
+        "Podgląd zmiany dat MM", preview_summary(rows, user_date), PREVIEW_COLUMNS, table,
+        tag_of=lambda t: "ryzyko" if t[-1] else "", tags={"ryzyko": {"foreground": "#b00020"}},
+        confirm_text="Zapisz zmiany")
+
+
+def change_dates_run(sub, run: dict, user_date, dry_run: bool, ids: Optional[list[int]] = None):
+    """
+    Jeden przebieg (w wątku COM): wybór dokumentów MM i zmiana daty wystawienia.
+    Bieżące daty czyta jedno zapytanie (bulk_edit.plan_changes) - dokumenty
+    z docelową datą nie są otwierane ani zapisywane. DRY RUN: podgląd jednym
+    zapytaniem (preview_changes) - zwraca jego wiersze.
+    """
+    if ids is None and not run["headless"]:
+        with metryki.current().stage("wybor"):
+            selected = select_docs_prev_month(sub.Dokumenty, typ=MM_TYP)
         if not selected:
             print("Nie wybrano żadnych dokumentów.")
-            return
+            return None
+        ids = [int(p.Identyfikator) for p in selected]
+    filtr = doc_filter(run) if ids is None else None
 
-        for p in selected:
-            if not p.NumerPelny.startswith("MM"):
+    if dry_run:
+        rows = preview_changes(sub, user_date, filtr=filtr, ids=ids)
+        if run["headless"]:
+            for r in rows:
+                print(f"DRY RUN: {r['numer']} (netto {r['netto']:.2f}): {r['data']} -> {user_date.isoformat()} "
+                      f"({r['dni']:+d} dni){' – RYZYKO: ruch magazynowy, zmiana miesiąca' if r['ryzyko'] else ''}")
+        print(preview_summary(rows, user_date))
+        return rows
+
+    plan = bulk_edit.plan_changes(sub, {"data": user_date}, typ=MM_TYP, filtr=filtr, ids=ids)
+    if not plan:
+        print(f"Brak dokumentów MM do zmiany na {user_date.isoformat()}.")
+        return
+    bulk_edit.run_edit(sub, plan, {"data": user_date}, prefix=LOG_PREFIX, dry_run=dry_run,
+                       dead_params={"data": user_date.isoformat()})
+
+
+def resume_run(sub, path: str) -> None:
+    """(wątek COM) Dokańcza przebieg z dziennika - tylko niezatwierdzone dokumenty."""
+    bulk_edit.resume(sub, path, prefix=LOG_PREFIX)
+
+
+def undo_run(sub, path: str) -> None:
+    """(wątek COM) Przywraca stare daty dokumentów zapisanych w dzienniku."""
+    bulk_edit.undo(sub, path, prefix=LOG_PREFIX)
+
+
+def main(args: argparse.Namespace):
+    # logowanie do Subiekta startuje w tle, równolegle z pytaniem o datę
+    worker = ComWorker()
+    try:
+        runs = resolve_runs(args)
+        for n, run in enumerate(runs, start=1):
+            if len(runs) > 1:
+                print(f"=== Przebieg {n}/{len(runs)} ===")
+            if run.get("cofnij"):
+                worker.submit(undo_run, run["cofnij"]).result()
+                continue
+            if run.get("wznow"):
+                worker.submit(resume_run, run["wznow"]).result()
+                continue
+            user_date, dry_run = ask_params(run)
+            if user_date is None:
+                print("Anulowano przez użytkownika.")
                 continue
-            old_date = p.DataWystawienia.date()
-            msg = (f"Zmieniam datę dokumentu {p.NumerPelny} o wartości {p.WartoscNetto} "
-                   f"z dnia {old_date.isoformat()} na {user_date.isoformat()}")
-            if dry_run:
-                print("DRY RUN:", msg)
+            if dry_run and not run["headless"]:
+                # podgląd: wybór + jedno zapytanie w wątku COM, tabela w wątku Tk
+                rows = worker.submit(change_dates_run, run, user_date, True).result()
+                if not rows or not show_preview(rows, user_date):
+                    continue
+                dry_run, ids = False, [r["id"] for r in rows]
             else:
-                p.DataWystawienia = new_date
-                print(msg)
-                # if not p.SkutekMagazynowy:
-                #     print("  Dokument nie ma skutku magazynowego, pomijam")
-                # else:
-                p.Zapisz()
+                ids = None
+            f = worker.submit(change_dates_run, run, user_date, dry_run, ids)
+            if not run["headless"]:
+                # pętla MM w wątku COM; okno: postęp, ETA, "Anuluj" (stop po bieżącym dokumencie)
+                ProgressWindow("Zmiana dat MM").wait([f])
+            f.result()
 
     except com_error as e:
         logging.exception("Błąd COM: %s", e)
     except Exception as e:
         logging.exception("Błąd krytyczny: %s", e)
     finally:
-        try:
-            if sub is not None:
-                sub.Zakoncz()
-        except Exception:
-            pass
-        pythoncom.CoUninitialize()
+        worker.shutdown()
 
 if __name__ == "__main__":
+    args = parse_args()
     logfile = logowanie.setup_logging(LOG_PREFIX = LOG_PREFIX)  # <- tu powstaje logs/MM_YYYY-MM-DD.log
     print(f"Start aplikacji. Logi zapisuję do pliku: {logfile}")
+    metryki.start("zmiana_mm", LOG_PREFIX)
     try:
-        main()
+        main(args)
     finally:
-        show_completion_dialog(logfile=logfile, logs_dir="logs")
+        metryki.finish(Path(logfile).parent)
+        if not (args.headless or args.manifest or args.wznow or args.cofnij):
+            show_completion_dialog(logfile=logfile, logs_dir="logs")
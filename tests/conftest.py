@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Testy bez Subiekta: moduły z src/ importowane wprost, a gdy brak pywin32
+(Linux, CI) - minimalne zastępniki pythoncom/pywintypes/win32* tylko na
+potrzeby importu. Sesję Sfery zastępują obiekty testowe.
+"""
+
+import sys
+import types
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC))
+
+
+def _fake_pywin32() -> None:
+    class com_error(Exception):
+        pass
+
+    def dispatch(*args, **kwargs):
+        raise RuntimeError("COM niedostępny w testach")
+
+    fakes = {
+        "pythoncom": dict(COINIT_APARTMENTTHREADED=2, CoInitialize=lambda: None,
+                          CoInitializeEx=lambda flags: None, CoUninitialize=lambda: None,
+                          PumpWaitingMessages=lambda: None),
+        "pywintypes": dict(com_error=com_error, Time=lambda dt: dt),
+        "win32cred": dict(CRED_PERSIST_SESSION=1, CRED_PERSIST_LOCAL_MACHINE=2,
+                          CRED_PERSIST_ENTERPRISE=3, CRED_TYPE_GENERIC=1),
+        "win32print": dict(PRINTER_ENUM_LOCAL=2, PRINTER_ENUM_CONNECTIONS=4, EnumPrinters=lambda flags: []),
+        "win32com": {},
+        "win32com.client": dict(Dispatch=dispatch, gencache=types.SimpleNamespace(__gen_path__="")),
+    }
+    for name, attrs in fakes.items():
+        mod = types.ModuleType(name)
+        mod.__dict__.update(attrs)
+        sys.modules[name] = mod
+    sys.modules["win32com"].client = sys.modules["win32com.client"]
+
+
+try:
+    import pythoncom  # noqa: F401
+    import win32com.client  # noqa: F401
+except ImportError:
+    _fake_pywin32()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""bulk_edit: przypisania, plan jednym zapytaniem (tylko różnice), zapis partiami."""
+
+import sqlite3
+from datetime import date
+
+import pytest
+
+import bulk_edit
+from journal import ST_FAILED, ST_SAVED, Journal
+
+
+class FakeDoc:
+    def __init__(self, sub, id_):
+        self.sub, self.id = sub, id_
+
+    def Zapisz(self):
+        if self.id in self.sub.broken:
+            raise ValueError("Dokument zablokowany")
+        self.sub.db.execute("UPDATE dok__Dokument SET dok_Tytul = ?, dok_KatId = ? WHERE dok_Id = ?",
+                            (getattr(self, "Tytul", None), getattr(self, "KategoriaId", None), self.id))
+
+    def Zamknij(self):
+        pass
+
+
+class FakeSub:
+    def __init__(self):
+        self.db = sqlite3.connect(":memory:")
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("CREATE TABLE dok__Dokument (dok_Id INTEGER PRIMARY KEY, dok_Typ INTEGER, dok_NrPelny TEXT, "
+                        "dok_WartNetto REAL, dok_DataWyst TEXT, dok_KatId INTEGER, dok_Tytul TEXT, dok_Uwagi TEXT)")
+        self.db.executemany("INSERT INTO dok__Dokument VALUES (?, ?, ?, 10.0, ?, ?, ?, NULL)", [
+            (1, 9, "MM 1/2024", "2024-01-03", 5, "Stary"),
+            (2, 9, "MM 2/2024", "2024-01-02", 6, "Nowy"),
+            (3, 9, "MM 3/2024", "2024-01-01", None, None),
+            (4, 2, "FS 1/2024", "2024-01-01", 5, "Stary"),
+        ])
+        self.broken = set()
+        self.Dokumenty = self
+
+    def Wczytaj(self, id_):
+        doc = FakeDoc(self, id_)
+        row = self.db.execute("SELECT dok_Tytul, dok_KatId FROM dok__Dokument WHERE dok_Id = ?", (id_,)).fetchone()
+        doc.Tytul, doc.KategoriaId = row
+        return doc
+
+
+@pytest.fixture
+def sub(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_edit, "run_sql", lambda src, sql: [dict(r) for r in src.db.execute(sql)])
+    monkeypatch.setattr(bulk_edit, "JOURNAL_DIR", tmp_path)
+    return FakeSub()
+
+
+def test_parse_assignments():
+    assert bulk_edit.parse_assignments(["data=2024-01-31", "Tytul=a=b", "uwagi="]) == \
+        {"data": "2024-01-31", "tytul": "a=b", "uwagi": ""}
+    for bad in ("magazyn=1", "tytul"):
+        with pytest.raises(ValueError, match="Błędne przypisanie"):
+            bulk_edit.parse_assignments([bad])
+
+
+def test_resolve_assignments_normalizes_values(monkeypatch):
+    kategorie = {"hurt": type("Kat", (), {"id": 6})()}
+    katalog = type("Katalog", (), {"by": lambda self, name, col, v: kategorie.get(v.lower())})()
+    monkeypatch.setattr(bulk_edit.replika, "katalog", lambda src, names: katalog)
+
+    assert bulk_edit.resolve_assignments(None, {"data": "31.01.2024", "kategoria": "Hurt", "tytul": None}) == \
+        {"data": date(2024, 1, 31), "kategoria": 6, "tytul": ""}
+    assert bulk_edit.resolve_assignments(None, {"kategoria": " 7"}) == {"kategoria": 7}
+    with pytest.raises(ValueError, match="Nie znaleziono kategorii 'Detal'"):
+        bulk_edit.resolve_assignments(None, {"kategoria": "Detal"})
+
+
+def test_plan_contains_only_documents_with_differences(sub):
+    plan = bulk_edit.plan_changes(sub, {"tytul": "Nowy", "kategoria": 6}, typ=9, filtr={})
+    assert [(e["numer"], e["old"], e["new"]) for e in plan] == [
+        ("MM 3/2024", {"tytul": "", "kategoria": None}, {"tytul": "Nowy", "kategoria": 6}),   # od najstarszych
+        ("MM 1/2024", {"tytul": "Stary", "kategoria": 5}, {"tytul": "Nowy", "kategoria": 6}),
+    ]
+    assert bulk_edit.describe(plan[1]) == "MM 1/2024 (netto 10.0): tytul: 'Stary' -> 'Nowy'; kategoria: 5 -> 6"
+
+
+def test_plan_for_ids_keeps_their_order(sub):
+    plan = bulk_edit.plan_changes(sub, {"tytul": "X"}, ids=[4, 1, 3])
+    assert [e["id"] for e in plan] == [4, 1, 3]
+    assert bulk_edit.plan_changes(sub, {"tytul": "X"}, ids=[]) == []
+
+
+def test_dry_run_writes_nothing(sub, tmp_path):
+    plan = bulk_edit.plan_changes(sub, {"tytul": "X"}, typ=9, filtr={})
+    assert bulk_edit.run_edit(sub, plan, {"tytul": "X"}, dry_run=True) == 0
+    assert sub.db.execute("SELECT COUNT(*) FROM dok__Dokument WHERE dok_Tytul = 'X'").fetchone()[0] == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_failed_document_is_journaled_and_the_rest_saved(sub, tmp_path):
+    sub.broken.add(2)
+    plan = bulk_edit.plan_changes(sub, {"tytul": "X"}, typ=9, filtr={})
+    assert bulk_edit.run_edit(sub, plan, {"tytul": "X"}, prefix="MM_", batch_size=2) == 2
+
+    [path] = tmp_path.glob("MM_dziennik_*.jsonl")
+    assert {e["id"]: e["status"] for e in Journal(path).entries()} == {3: ST_SAVED, 2: ST_FAILED, 1: ST_SAVED}
+    assert Journal(path).pending_ids() == [2]
+    assert len(list(tmp_path.glob("MM_nieudane_*.json"))) == 1
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""cli: przebiegi z argumentów i manifestu, filtr dokumentów."""
+
+import argparse
+import json
+from datetime import date
+
+import pytest
+
+import cli
+
+
+def parse(argv):
+    ap = argparse.ArgumentParser()
+    cli.add_common_args(ap)
+    ap.add_argument("--wzorzec", type=int)
+    return ap.parse_args(argv)
+
+
+def test_without_manifest_a_single_run_from_arguments():
+    runs = cli.resolve_runs(parse(["--od", "2024-01-01", "--numer", "FS 1*"]))
+    assert len(runs) == 1
+    assert runs[0]["od"] == "2024-01-01" and runs[0]["numer"] == ["FS 1*"] and not runs[0]["headless"]
+
+
+def test_manifest_overrides_arguments_and_runs_override_manifest(tmp_path):
+    path = tmp_path / "noc.json"
+    path.write_text(json.dumps({
+        "do": "2024-01-31",
+        "dry-run": True,
+        "runs": [{"kontrahent": [7], "wzorzec": 3}, {"od": "2024-01-15", "dry-run": False}],
+    }), encoding="utf-8")
+    runs = cli.resolve_runs(parse(["--manifest", str(path), "--od", "2024-01-01", "--wzorzec", "1"]))
+
+    assert [r["headless"] for r in runs] == [True, True]               # manifest = bez okien
+    assert [(r["od"], r["do"]) for r in runs] == [("2024-01-01", "2024-01-31"), ("2024-01-15", "2024-01-31")]
+    assert [r["dry_run"] for r in runs] == [True, False]               # klucze z '-' jak w argparse
+    assert [r["wzorzec"] for r in runs] == [3, 1]
+    assert runs[0]["kontrahent"] == [7] and runs[1]["kontrahent"] == []
+
+
+def test_manifest_without_runs_is_one_run(tmp_path):
+    path = tmp_path / "m.json"
+    path.write_text('{"numer": "FS 1/2024"}', encoding="utf-8-sig")
+    [run] = cli.resolve_runs(parse(["--manifest", str(path)]))
+    assert run["numer"] == "FS 1/2024"
+
+
+def test_manifest_must_be_an_object(tmp_path):
+    path = tmp_path / "m.json"
+    path.write_text("[1, 2]", encoding="utf-8")
+    with pytest.raises(ValueError, match="oczekiwano obiektu"):
+        cli.resolve_runs(parse(["--manifest", str(path)]))
+
+
+def test_doc_filter_from_run():
+    run = {"od": "01.02.2024", "do": "2024-02-29", "numer": "FS 1*", "kontrahent": ["7", 8], "ids": []}
+    assert cli.doc_filter(run) == {"od": date(2024, 2, 1), "do": date(2024, 2, 29), "numery": ["FS 1*"],
+                                   "kh_ids": [7, 8], "ids": []}
+
+
+def test_doc_filter_defaults_to_previous_month_except_for_ids():
+    f = cli.doc_filter({})
+    assert (f["od"], f["do"]) == cli.prev_month_range()
+    assert cli.doc_filter({"id": 5}) == {"od": None, "do": None, "numery": [], "kh_ids": [], "ids": [5]}
+    assert cli.prev_month_range(date(2024, 3, 15)) == (date(2024, 2, 1), date(2024, 2, 29))
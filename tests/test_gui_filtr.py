@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""gui: filtr okna wyboru wzorca (indeks bez ogonków, zmiana tylko widoczności wierszy) - bez Tk."""
+
+import pytest
+
+import gui
+
+
+class FakeTree:
+    """Treeview: kolejność dołączonych wierszy, odłączanie i przenoszenie."""
+
+    def __init__(self, iids):
+        self.children = list(iids)
+        self.ops = 0
+        self.selected = None
+
+    def detach(self, *iids):
+        self.ops += len(iids)
+        self.children = [i for i in self.children if i not in iids]
+
+    def move(self, iid, parent, index):
+        self.ops += 1
+        if iid in self.children:
+            self.children.remove(iid)
+        self.children.insert(index, iid)
+
+    def selection_set(self, iid):
+        self.selected = iid
+
+    def focus(self, iid):
+        pass
+
+    def see(self, iid):
+        pass
+
+
+class FakeVar:
+    def __init__(self):
+        self.value = ""
+
+    def get(self):
+        return self.value
+
+
+WZORCE = [
+    {"wzw_Id": 1, "wzw_Nazwa": "Faktura"},
+    {"wzw_Id": 2, "wzw_Nazwa": "Faktura - kopia"},
+    {"wzw_Id": 3, "wzw_Nazwa": "Faktura zaliczkowa"},
+    {"wzw_Id": 14, "wzw_Nazwa": "Żółta etykieta"},
+]
+
+
+@pytest.fixture
+def picker(monkeypatch):
+    def build(self):
+        self.tree = FakeTree(self.order)
+        self.filter_var = FakeVar()
+
+    monkeypatch.setattr(gui._WzorPicker, "_build", build)
+    return gui._WzorPicker(WZORCE)
+
+
+def type_filter(picker, text):
+    picker.filter_var.value = text
+    picker._apply_filter()
+    return picker.tree.children
+
+
+def test_fold_text():
+    assert gui.fold_text("ŻÓŁTA Łódź Ęę") == "zolta lodz ee"
+
+
+def test_filter_ignores_case_and_diacritics_and_matches_id(picker):
+    assert type_filter(picker, "zolta") == ["14"]
+    assert type_filter(picker, "  ") == ["1", "2", "3", "14"]
+    assert type_filter(picker, "14") == ["14"]
+    assert type_filter(picker, "FAKTURA") == ["1", "2", "3"]
+    assert picker.tree.selected == "1"
+
+
+def test_narrowing_only_detaches_and_widening_restores_order(picker):
+    type_filter(picker, "fak")
+    picker.tree.ops = 0
+    assert type_filter(picker, "fakt") == ["1", "2", "3"]
+    assert picker.tree.ops == 0                                  # nic się nie zmieniło - bez operacji na drzewie
+    assert type_filter(picker, "faktura -") == ["2"]
+    assert type_filter(picker, "") == ["1", "2", "3", "14"]      # pierwotna kolejność
+
+
+def test_preselected_template_stays_selected_when_visible(picker):
+    picker.preselect_iid = "3"
+    type_filter(picker, "faktura")
+    assert picker.tree.selected == "3"
+    type_filter(picker, "kopia")
+    assert picker.tree.selected == "2"
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""import_zk: błędy danych pojedynczych zamówień trafiają do raportu, import idzie dalej."""
+
+import csv
+import json
+
+import import_zk
+from import_zk import ST_CREATED, ST_INVALID
+
+
+def run_import(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    report = tmp_path / "wynik.csv"
+    backend = import_zk.FakeBackend()
+    stats = import_zk.import_orders(import_zk.read_orders(path), import_zk.FakeIndex(), backend, report)
+    with report.open(encoding="utf-8-sig", newline="") as f:
+        rows = [(r["zamowienie"], r["status"]) for r in csv.DictReader(f, delimiter=";")]
+    return stats, rows
+
+
+def test_jsonl_bad_lines_are_rejected(tmp_path):
+    ok = {"kontrahent": 1, "pozycje": [{"symbol": "A", "ilosc": 1}]}
+    lines = [
+        json.dumps({"zamowienie": "Z1", **ok}),
+        '{"zamowienie": "Z2", "kontrahent": 1, ',                     # ucięty wiersz
+        json.dumps({"zamowienie": "Z3", "kontrahent": 1, "pozycje": ["A"]}),
+        json.dumps({"zamowienie": "Z4", "kontrahent": 1, "pozycje": {"symbol": "A"}}),
+        json.dumps(["Z5"]),
+        json.dumps({"zamowienie": "Z6", **ok}),
+    ]
+    stats, rows = run_import(tmp_path, "zam.jsonl", "\n".join(lines) + "\n")
+
+    assert rows == [("Z1", ST_CREATED), ("wiersz 2", ST_INVALID), ("Z3", ST_INVALID),
+                    ("Z4", ST_INVALID), ("wiersz 5", ST_INVALID), ("Z6", ST_CREATED)]
+    assert stats[ST_CREATED] == 2 and stats[ST_INVALID] == 4
+
+
+def test_csv_split_order_is_rejected(tmp_path):
+    text = ("zamowienie;kontrahent;symbol;ilosc\n"
+            "Z1;1;A;1\n"
+            "Z2;1;B;2\n"
+            "Z1;1;C;3\n"
+            "Z3;1;A;1\n")
+    stats, rows = run_import(tmp_path, "zam.csv", text)
+
+    assert rows == [("Z1", ST_CREATED), ("Z2", ST_CREATED), ("Z1", ST_INVALID), ("Z3", ST_CREATED)]
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""indeks_dok.Indeks.search na indeksie zbudowanym z bazy w pamięci."""
+
+import sqlite3
+import zlib
+from datetime import date, timedelta
+
+import pytest
+
+import indeks_dok
+
+TODAY = date.today()
+
+
+def day(n: int) -> str:
+    return (TODAY - timedelta(days=n)).isoformat()
+
+
+DOCS = [  # id, numer, typ, data, kh_id
+    (1, "FS 12/2024", 2, "2024-03-01", 100),
+    (2, "FS 120/2024", 2, "2024-05-10", 101),
+    (3, "FS 1/2025", 2, "2025-01-02", 100),
+    (4, "MM 12/2024", 9, "2024-03-01", None),
+    (5, "FS 7/2026", 2, day(1), 102),
+]
+ADRESY = [(100, "Kowalski Sp. z o.o."), (101, "Hurtownia Nowak"), (102, "Żabka Polska")]
+
+
+class Serwer:
+    def __init__(self):
+        self.db = sqlite3.connect(":memory:")
+        self.db.row_factory = sqlite3.Row
+        self.db.create_function("BINARY_CHECKSUM", -1, lambda *v: zlib.crc32(repr(v).encode()) - (1 << 31))
+        self.db.execute("CREATE TABLE dok__Dokument (dok_Id INTEGER PRIMARY KEY, dok_NrPelny TEXT, dok_Typ INTEGER, "
+                        "dok_DataWyst TEXT, dok_OdbiorcaId INTEGER)")
+        self.db.execute("CREATE TABLE adr__Ewid (adr_IdObiektu INTEGER, adr_TypAdresu INTEGER, adr_Nazwa TEXT)")
+        self.db.executemany("INSERT INTO dok__Dokument VALUES (?, ?, ?, ?, ?)", DOCS)
+        self.db.executemany("INSERT INTO adr__Ewid VALUES (?, 1, ?)", ADRESY)
+
+    def run_sql_batch(self, src, queries):
+        return {k: [dict(r) for r in self.db.execute(q)] for k, q in queries.items()}
+
+
+@pytest.fixture(params=[True, False], ids=["fts", "like"])
+def idx(request, monkeypatch):
+    serwer = Serwer()
+    monkeypatch.setattr(indeks_dok, "run_sql_batch", serwer.run_sql_batch)
+    i = indeks_dok.Indeks(":memory:")
+    i.sync(serwer)
+    i.fts = i.fts and request.param        # wariant bez trigramów (starsze SQLite)
+    i.serwer = serwer
+    return i
+
+
+def ids(rows):
+    return [r["id"] for r in rows]
+
+
+def test_exact_number_first_then_prefix_then_newest(idx):
+    assert ids(idx.search("FS 12/2024")) == [1]
+    assert ids(idx.search("fs 12")) == [2, 1]              # oba od "FS 12", nowszy pierwszy
+    assert ids(idx.search("12/2024")) == [4, 1]            # fragment; ta sama data - wyższe ID pierwsze
+    assert ids(idx.search("/2024")) == [2, 4, 1]
+
+
+def test_customer_name_and_date_terms(idx):
+    assert ids(idx.search("kowalski")) == [3, 1]
+    assert ids(idx.search("kowalski 2024-03")) == [1]
+    assert ids(idx.search("2024-03-01")) == [4, 1]
+
+
+def test_type_filter_and_limit(idx):
+    assert ids(idx.search("12/2024", typ=9)) == [4]
+    assert ids(idx.search("FS", limit=2)) == [5, 3]
+
+
+def test_short_phrase_is_a_number_prefix(idx):
+    assert ids(idx.search("MM")) == [4]
+    assert idx.search("   ") == []
+
+
+def test_wildcards_in_phrase_are_literal(idx):
+    assert idx.search("%") == [] and idx.search("_") == []
+    assert idx.search("FS_1") == [] and idx.search("F%") == []
+
+
+def test_refresh_updates_search_results(idx):
+    idx.serwer.db.execute("UPDATE adr__Ewid SET adr_Nazwa = 'Kaufland' WHERE adr_IdObiektu = 102")
+    idx.serwer.db.execute("INSERT INTO dok__Dokument VALUES (6, 'FS 8/2026', 2, ?, 102)", (day(0),))
+    stats = idx.sync(idx.serwer)
+    assert stats == {"nowe": 1, "zmienione": 1, "usuniete": 0}
+    assert ids(idx.search("kaufland")) == [6, 5]
+    assert idx.search("żabka") == []
+    assert idx.get(6)["kontrahent"] == "Kaufland"
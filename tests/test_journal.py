@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Dziennik zmian (journal) i bulk_edit: wznawianie, cofanie, unikalne nazwy plików."""
+
+import sqlite3
+from datetime import date
+
+import pytest
+
+import bulk_edit
+from journal import ST_SAVED, ST_UNDONE, Journal
+
+
+class FakeDoc:
+    def __init__(self, db, id_):
+        self.db, self.id = db, id_
+
+    def Zapisz(self):
+        self.db.execute("UPDATE dok__Dokument SET dok_DataWyst = ? WHERE dok_Id = ?",
+                        (self.DataWystawienia.date().isoformat(), self.id))
+
+    def Zamknij(self):
+        pass
+
+
+class FakeSub:
+    """Sesja Sfery na SQLite: Dokumenty.Wczytaj + zapytania utils.run_sql."""
+
+    def __init__(self, db):
+        self.db = db
+        self.saved = []
+        self.Dokumenty = self
+
+    def Wczytaj(self, id_):
+        self.saved.append(id_)
+        return FakeDoc(self.db, id_)
+
+
+@pytest.fixture
+def sub(tmp_path, monkeypatch):
+    db = sqlite3.connect(":memory:")
+    db.row_factory = sqlite3.Row
+    db.execute("CREATE TABLE dok__Dokument (dok_Id INTEGER PRIMARY KEY, dok_Typ INTEGER, dok_NrPelny TEXT, "
+               "dok_WartNetto REAL, dok_DataWyst TEXT)")
+    db.executemany("INSERT INTO dok__Dokument VALUES (?, 9, ?, 10.0, ?)",
+                   [(i, f"MM {i}/2024", f"2024-01-{i:02d}") for i in range(1, 5)])
+    monkeypatch.setattr(bulk_edit, "run_sql", lambda src, sql: [dict(r) for r in src.db.execute(sql)])
+    monkeypatch.setattr(bulk_edit, "JOURNAL_DIR", tmp_path)
+    return FakeSub(db)
+
+
+def dates(sub):
+    return {r["dok_Id"]: r["dok_DataWyst"] for r in sub.db.execute("SELECT dok_Id, dok_DataWyst FROM dok__Dokument")}
+
+
+TARGET = {"data": date(2024, 2, 1)}
+
+
+def test_resume_finishes_pending_documents(sub, tmp_path):
+    plan = bulk_edit.plan_changes(sub, TARGET, ids=[1, 2, 3])
+    with Journal.create(tmp_path, "MM_", {"assignments": {"data": "2024-02-01"}, "ids": [1, 2, 3]}) as j:
+        bulk_edit.apply_changes(sub, plan[:1], j)            # przerwany po pierwszym dokumencie
+    assert Journal(j.path).pending_ids() == [2, 3]
+
+    sub.saved.clear()
+    assert bulk_edit.resume(sub, str(j.path)) == 2
+    assert sub.saved == [2, 3]
+    assert Journal(j.path).pending_ids() == []
+    assert dates(sub) == {1: "2024-02-01", 2: "2024-02-01", 3: "2024-02-01", 4: "2024-01-04"}
+
+
+def test_undo_skips_documents_changed_afterwards(sub, tmp_path, caplog):
+    plan = bulk_edit.plan_changes(sub, TARGET, ids=[1, 2, 3])
+    bulk_edit.run_edit(sub, plan, TARGET, prefix="MM_")
+    path = next(tmp_path.glob("MM_dziennik_*.jsonl"))
+    sub.db.execute("UPDATE dok__Dokument SET dok_DataWyst = '2024-03-15' WHERE dok_Id = 2")   # ręczna poprawka
+
+    assert bulk_edit.undo(sub, str(path)) == 2
+    assert dates(sub) == {1: "2024-01-01", 2: "2024-03-15", 3: "2024-01-03", 4: "2024-01-04"}
+    assert "MM 2/2024: pomijam" in caplog.text
+    statuses = {e["id"]: e["status"] for e in Journal(path).entries()}
+    assert statuses == {1: ST_UNDONE, 2: ST_SAVED, 3: ST_UNDONE}
+    assert Journal(path).undo_entries()[0]["id"] == 2       # pominięty - nadal do cofnięcia
+
+
+def test_journals_created_in_the_same_second_are_separate(tmp_path):
+    a = Journal.create(tmp_path, "MM_", {"ids": [1]})
+    b = Journal.create(tmp_path, "MM_", {"ids": [2]})
+    a.close()
+    b.close()
+    assert a.path != b.path
+    assert Journal(a.path).plan() == {"ids": [1]} and Journal(b.path).plan() == {"ids": [2]}
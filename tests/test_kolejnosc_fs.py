@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""drukuj_fs.export_run: kolejność eksportu i punkt odniesienia 'kolejność wyboru'."""
+
+from concurrent.futures import Future
+
+import pytest
+
+import drukuj_fs
+
+
+class SyncWorker:
+    """Zamiast wątku COM: zadanie wykonane od razu przy submit()."""
+
+    def __init__(self, sub):
+        self.sub = sub
+
+    def submit(self, fn, *args, **kwargs):
+        f = Future()
+        f.set_running_or_notify_cancel()
+        try:
+            f.set_result(fn(self.sub, *args, **kwargs))
+        except BaseException as e:
+            f.set_exception(e)
+        return f
+
+
+@pytest.fixture
+def export(monkeypatch, tmp_path):
+    sub = object()
+    # wybór: kontrahenci na przemian, wzorzec 1 dla kontrahenta 10, 2 dla 20
+    items = [{"doc": None, "sub": sub, "id": i, "numer": f"FS {i}/2024", "data": None,
+              "kh_id": 10 if i % 2 else 20} for i in range(1, 7)]
+    templates = {10: 1, 20: 2}
+    seen = {}
+
+    monkeypatch.setattr(drukuj_fs, "read_selection", lambda s, run: [dict(it) for it in items])
+    monkeypatch.setattr(drukuj_fs, "choose_wzorce",
+                        lambda kh_ids, wzorce, kh, run, storage, on_chosen:
+                        [on_chosen(k, templates[k]) for k in kh_ids])
+    monkeypatch.setattr(drukuj_fs, "log_render_timing",
+                        lambda exported, selection: seen.update(exported=[it["id"] for it in exported],
+                                                                selection=selection))
+
+    def run(order):
+        drukuj_fs.export_run(SyncWorker(sub), {"headless": True, "dry_run": True, "tryb": "pdf",
+                                               "out_dir": str(tmp_path), "kolejnosc": order},
+                             [{"wzw_Id": 1, "wzw_Nazwa": "A"}, {"wzw_Id": 2, "wzw_Nazwa": "B"}], {})
+        return seen
+    return run
+
+
+def test_wybor_exports_in_selection_order(export):
+    seen = export("wybor")
+    assert seen["exported"] == [1, 2, 3, 4, 5, 6]
+    assert seen["selection"] == [1, 2, 1, 2, 1, 2]
+
+
+def test_grouped_order_keeps_selection_baseline(export):
+    seen = export("wzorzec")
+    assert seen["exported"] == [1, 3, 5, 2, 4, 6]
+    # punkt odniesienia: kolejność wyboru, nie kolejność po kontrahentach
+    assert seen["selection"] == [1, 2, 1, 2, 1, 2]
+    assert drukuj_fs.template_switches(seen["selection"]) == 6
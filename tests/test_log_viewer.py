@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""log_viewer.scan: wyszukiwanie tekstu bez względu na wielkość liter (także polskich)."""
+
+import log_viewer
+
+
+def test_scan_ignores_case(tmp_path):
+    path = tmp_path / "FS_2024.log"
+    path.write_text("\n".join([
+        "2024-01-02 10:00:00 [INFO] Eksport FS 1/2024 – Zakład Łódź",
+        "2024-01-02 10:00:01 [ERROR] fs 2/2024: BŁĄD wydruku",
+        "2024-01-02 10:00:02 [INFO] Faktura ŻÓŁTA",
+        "2024-01-02 10:00:03 [WARNING] Fs 3/2024 błąd pliku",
+    ]) + "\n", encoding="utf-8")
+
+    def found(text, level=None):
+        return [line.split(" ", 2)[2] for line in log_viewer.scan(path, text=text, min_level=level)[0]]
+
+    assert found("fS ") == ["[INFO] Eksport FS 1/2024 – Zakład Łódź", "[ERROR] fs 2/2024: BŁĄD wydruku",
+                            "[WARNING] Fs 3/2024 błąd pliku"]
+    assert found("błąd") == ["[ERROR] fs 2/2024: BŁĄD wydruku", "[WARNING] Fs 3/2024 błąd pliku"]
+    assert found("łÓdŹ") == ["[INFO] Eksport FS 1/2024 – Zakład Łódź"]
+    assert found("żółta") == ["[INFO] Faktura ŻÓŁTA"]
+    assert found("2/2024") == ["[ERROR] fs 2/2024: BŁĄD wydruku"]
+    assert found("Błąd", "WARNING") == ["[ERROR] fs 2/2024: BŁĄD wydruku", "[WARNING] Fs 3/2024 błąd pliku"]
+
+
+def test_scan_stops_at_limit_from_the_end(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_viewer, "CHUNK", 256)      # wiele okien także w małym pliku
+    path = tmp_path / "FS_2024.log"
+    path.write_text("".join(f"10:00:{i % 60:02d} [{'ERROR' if i % 3 == 0 else 'INFO'}] FS {i}/2024\n"
+                            for i in range(300)), encoding="utf-8")
+
+    lines, cut = log_viewer.scan(path, min_level="ERROR", limit=5)
+    assert cut and [l.split()[-1] for l in lines] == [f"{i}/2024" for i in (285, 288, 291, 294, 297)]
+
+    lines, cut = log_viewer.scan(path, text="fs 1", min_level="ERROR", limit=100)
+    assert not cut and [l.split()[-1] for l in lines] == [f"{i}/2024" for i in range(300)
+                                                           if i % 3 == 0 and str(i).startswith("1")]
+
+
+def test_run_start_of_own_process(tmp_path):
+    path = tmp_path / "FS_2024.log"
+    path.write_text("\n".join([
+        "10:00:00 [INFO] ===== START drukuj_fs.py pid=100 2024-01-02T10:00:00",
+        "10:00:01 [INFO] ===== START zmiana_mm.py pid=200 2024-01-02T10:00:01",
+        "10:00:02 [INFO] dokument A",
+        "10:00:03 [INFO] ===== START raporty.py pid=300 2024-01-02T10:00:03",
+    ]) + "\n", encoding="utf-8")
+    with log_viewer.mapped(path) as mm:
+        start = log_viewer.find_run_start(mm, 0, pid=200)
+        assert mm[start:].startswith(b"10:00:01 [INFO] ===== START zmiana_mm.py pid=200")
+        assert log_viewer.find_run_start(mm, 0, pid=999) == 0
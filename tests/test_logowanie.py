@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""logowanie.rotate_logs: archiwum gzip i sprzątanie porzuconych plików tymczasowych."""
+
+import gzip
+import os
+import time
+
+import logowanie
+
+
+def test_rotation_archives_and_removes_stale_tmp(tmp_path):
+    old = tmp_path / "FS_2024-01-01.log"
+    old.write_text("stary dzień\n", encoding="utf-8")
+    archive = tmp_path / logowanie.ARCHIVE_DIR
+    archive.mkdir()
+    stale = archive / "FS_2023-12-31.log.tmp"
+    fresh = archive / "FS_2023-12-30.log.tmp"            # np. kompresja w równoległym procesie
+    stale.write_bytes(b"niepelne")
+    fresh.write_bytes(b"w toku")
+    past = time.time() - 2 * logowanie.STALE_TMP_S
+    os.utime(stale, (past, past))
+
+    t = logowanie.rotate_logs(tmp_path / "FS_2024-01-02.log", "FS_", keep_days=0)
+    assert t is not None and not t.daemon
+    t.join(5)
+
+    assert not old.exists() and not stale.exists() and fresh.exists()
+    with gzip.open(archive / "FS_2024-01-01.log.gz", "rt", encoding="utf-8") as f:
+        assert f.read() == "stary dzień\n"
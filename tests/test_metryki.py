@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""metryki: percentyle i format Prometheus textfile."""
+
+import pytest
+
+import metryki
+
+
+@pytest.mark.parametrize("n, q, expected", [
+    (1, 0.5, 1), (2, 0.5, 1), (4, 0.5, 2), (6, 0.5, 3), (10, 0.5, 5), (11, 0.5, 6),
+    (10, 0.7, 7), (100, 0.07, 7), (20, 0.95, 19), (100, 0.95, 95), (10, 0.95, 10),
+    (10, 0.0, 1), (10, 1.0, 10),
+])
+def test_percentile_nearest_rank(n, q, expected):
+    values = list(range(n, 0, -1))          # kolejność wejścia bez znaczenia
+    assert metryki.percentile(values, q) == expected
+
+
+def test_percentile_of_empty_list_is_none():
+    assert metryki.percentile([], 0.95) is None
+
+
+SUMMARY = {
+    "tool": 'drukuj "FS"',
+    "started": "2026-10-19T10:15:00",
+    "duration_s": 12.5,
+    "stages_s": {"logowanie": 3.0, "eksport": 9.5},
+    "items": {"count": 3, "ok": 2, "errors": 1, "p50_s": 0.4, "p95_s": None, "max_s": 1.2, "per_sec": 0.24},
+    "counters": {"strony": 7},
+    "peak_memory_bytes": None,
+}
+
+
+def test_to_prometheus():
+    text = metryki.to_prometheus(SUMMARY)
+    lines = text.splitlines()
+    tool = 'tool="drukuj \\"FS\\""'
+
+    assert text.endswith("\n")
+    assert "# TYPE sfera_run_duration_seconds gauge" in lines
+    assert f"sfera_run_duration_seconds{{{tool}}} 12.5" in lines
+    assert f'sfera_stage_duration_seconds{{{tool},stage="eksport"}} 9.5' in lines
+    assert f'sfera_items{{{tool},result="error"}} 1' in lines
+    assert f'sfera_item_latency_seconds{{{tool},quantile="1"}} 1.2' in lines
+    assert f'sfera_counter{{{tool},name="strony"}} 7' in lines
+    # brak wartości - brak próbki, ale opis metryki zostaje
+    assert not any("quantile=\"0.95\"" in l for l in lines)
+    assert not any(l.startswith("sfera_peak_memory_bytes") for l in lines)
+    assert "# HELP sfera_peak_memory_bytes Szczytowe zużycie pamięci procesu." in lines
+
+
+def test_summary_feeds_prometheus():
+    m = metryki.RunMetrics("test")
+    for s in (0.1, 0.2, 0.3, 0.4):
+        m.item(s)
+    m.item(5.0, ok=False)
+    data = m.summary()
+    assert data["items"]["count"] == 5 and data["items"]["errors"] == 1
+    assert data["items"]["p50_s"] == 0.3 and data["items"]["max_s"] == 5.0
+    assert 'sfera_items{tool="test",result="ok"} 4' in metryki.to_prometheus(data)
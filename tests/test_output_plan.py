@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""output_plan: ścieżki eksportu liczone z góry, kolizje nazw, układ katalogów, manifest."""
+
+import json
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+import output_plan
+
+
+def doc(id_, numer, data=date(2024, 3, 5), kh_id=7, kontrahent="Kowalski"):
+    return {"id": id_, "numer": numer, "data": data, "kh_id": kh_id, "kontrahent": kontrahent}
+
+
+def names(items, out_dir):
+    return [str(Path(it["path"]).relative_to(out_dir)).replace("\\", "/") for it in items]
+
+
+def test_names_are_sanitized(tmp_path):
+    items = output_plan.plan_output_paths([doc(1, "FS 12/2024"), doc(2, "FS 13/2024")], tmp_path)
+    assert names(items, tmp_path) == ["FS 12-2024.pdf", "FS 13-2024.pdf"]
+    assert output_plan.collisions(items) == 0
+
+
+def test_collisions_get_deterministic_suffixes(tmp_path):
+    # "FS 1/2024" i "FS 1:2024" dają tę samą nazwę, "fs 1-2024" - ją bez względu na wielkość liter,
+    # a "FS 1-2024 (2)" już istnieje, więc kolejny wolny sufiks to (3)
+    docs = [doc(4, "fs 1-2024"), doc(3, "FS 1:2024"), doc(2, "FS 1-2024 (2)"), doc(1, "FS 1/2024")]
+    first = names(output_plan.plan_output_paths([dict(d) for d in docs], tmp_path), tmp_path)
+    again = names(output_plan.plan_output_paths([dict(d) for d in reversed(docs)], tmp_path), tmp_path)
+
+    assert first == ["fs 1-2024 (4).pdf", "FS 1-2024 (3).pdf", "FS 1-2024 (2).pdf", "FS 1-2024.pdf"]
+    assert sorted(again) == sorted(first)                  # niezależnie od kolejności zaznaczenia
+    assert output_plan.collisions(output_plan.plan_output_paths(docs, tmp_path)) == 2
+
+
+def test_layout_creates_sharded_directories(tmp_path):
+    items = output_plan.plan_output_paths(
+        [doc(1, "FS 1/2024"), doc(2, "FS 1/2024", kh_id=8, kontrahent=None), doc(3, "FS 2/2024", data=None)],
+        tmp_path, layout="/{year}\\{month}/{contractor}/", ext="xml")
+    assert names(items, tmp_path) == ["2024/03/Kowalski/FS 1-2024.xml", "2024/03/KH 8/FS 1-2024.xml",
+                                      "bez-daty/00/Kowalski/FS 2-2024.xml"]
+    assert all(Path(it["path"]).parent.is_dir() for it in items)
+
+
+def test_unknown_layout_field_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="Nieznane pole układu: {rok}"):
+        output_plan.plan_output_paths([doc(1, "FS 1")], tmp_path, layout="{rok}/{month}")
+
+
+def test_plan_without_creating_directories(tmp_path):
+    [it] = output_plan.plan_output_paths([doc(1, "FS 1")], tmp_path, layout="{kh_id}", create_dirs=False)
+    assert it["path"] == tmp_path / "7" / "FS 1.pdf" and not (tmp_path / "7").exists()
+
+
+def test_manifest_written_and_updated(tmp_path):
+    items = output_plan.plan_output_paths([doc(1, "FS 1/2024")], tmp_path, layout="{year}")
+    path = output_plan.write_manifest(items, tmp_path, {"tryb": "pdf"})
+    output_plan.update_manifest(tmp_path, paczki=["a.pdf"])
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["tryb"] == "pdf" and data["paczki"] == ["a.pdf"]
+    assert data["documents"] == [{"id": 1, "numer": "FS 1/2024", "kh_id": 7, "data": "2024-03-05",
+                                  "path": str(Path("2024") / "FS 1-2024.pdf")}]
+    assert [p.name for p in tmp_path.iterdir() if p.is_file()] == ["manifest.json"]
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""paczki_pdf: części paczki przy limicie stron i etap po przerwaniu eksportu."""
+
+import pytest
+
+import paczki_pdf
+
+
+def make_pdf(path, pages):
+    pypdf = pytest.importorskip("pypdf")
+    w = pypdf.PdfWriter()
+    for _ in range(pages):
+        w.add_blank_page(width=72, height=72)
+    with open(path, "wb") as f:
+        w.write(f)
+
+
+def test_bundle_split_into_parts(tmp_path):
+    pypdf = pytest.importorskip("pypdf")
+    docs = []
+    for i, pages in enumerate([2, 3, 2, 4], start=1):
+        path = tmp_path / f"FS {i}.pdf"
+        make_pdf(path, pages)
+        docs.append({"path": path, "numer": f"FS {i}/2024"})
+
+    info = paczki_pdf.write_bundle(docs, tmp_path / "paczki" / "KH 1.pdf", max_pages=5)
+
+    assert info["strony"] == 11
+    assert [p.name for p in info["czesci"]] == ["KH 1 cz1.pdf", "KH 1 cz2.pdf", "KH 1 cz3.pdf"]
+    assert [len(pypdf.PdfReader(str(p)).pages) for p in info["czesci"]] == [5, 2, 4]
+    assert not list((tmp_path / "paczki").glob("*.tmp"))
+
+
+def test_single_part_keeps_name(tmp_path):
+    pytest.importorskip("pypdf")
+    path = tmp_path / "FS 1.pdf"
+    make_pdf(path, 2)
+    info = paczki_pdf.write_bundle([{"path": path, "numer": "FS 1/2024"}], tmp_path / "KH 1.pdf")
+    assert info["czesci"] == [tmp_path / "KH 1.pdf"]
+
+
+def test_no_bundle_started_after_abort(tmp_path, monkeypatch):
+    monkeypatch.setattr(paczki_pdf, "PdfWriter", object)        # bez pypdf: etap tylko zleca zapis
+    monkeypatch.setattr(paczki_pdf, "write_bundle", lambda docs, target: {"czesci": [target]})
+    stage = paczki_pdf.BundleStage(tmp_path)
+    item = {"kh_id": 1, "kontrahent": "ACME", "path": tmp_path / "FS 1.pdf", "pos": 1}
+    item["path"].write_bytes(b"%PDF-1.4")
+    stage.expect(item)
+    stage.seal()
+    stage.abort()
+    stage.done(item, True)              # bez submit() do zamkniętej puli
+    assert stage.close() == []
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""drukuj_fs: profile wydruku per kontrahent - puste pola biorą wartość przebiegu."""
+
+import drukuj_fs
+
+
+def test_blank_fields_fall_back_to_run(tmp_path):
+    storage = tmp_path / "wzorce_kontrahentow.csv"
+    (tmp_path / drukuj_fs.PROFILES_FILE).write_text(
+        "kh_id;drukarka;kopie\n1;HP Magazyn;\n2;;2\n3;Biuro;4\nx;zly;1\n", encoding="utf-8")
+
+    profiles = drukuj_fs.load_print_profiles(str(storage))
+    assert profiles == {1: {"drukarka": "HP Magazyn", "kopie": None},
+                        2: {"drukarka": None, "kopie": 2},
+                        3: {"drukarka": "Biuro", "kopie": 4}}
+
+    items = [{"kh_id": k} for k in (1, 2, 3, 4)]
+    drukuj_fs.apply_print_profiles(items, profiles, "Domyślna", kopie=3)
+    assert [(it["drukarka"], it["kopie"]) for it in items] == [
+        ("HP Magazyn", 3), ("Domyślna", 2), ("Biuro", 4), ("Domyślna", 3)]
+
+
+def test_no_profiles_file(tmp_path):
+    assert drukuj_fs.load_print_profiles(str(tmp_path / "wzorce_kontrahentow.csv")) == {}
+
+
+def test_printers_and_settings_cached(monkeypatch):
+    enum_calls, created = [], []
+    monkeypatch.setattr(drukuj_fs.win32print, "EnumPrinters",
+                        lambda flags: enum_calls.append(flags) or [(0, "", "HP"), (0, "", "Biuro")])
+    monkeypatch.setattr(drukuj_fs.win32, "Dispatch", lambda prog: created.append(prog) or type("U", (), {})())
+    monkeypatch.setattr(drukuj_fs, "_printers", None)
+    drukuj_fs._settings.__dict__.clear()
+
+    a = drukuj_fs.print_settings(7, "HP", 2)
+    assert drukuj_fs.print_settings(7, "HP", 2) is a
+    assert drukuj_fs.print_settings(7, "Biuro", 2) is not a
+    assert (a.WzorzecWydruku, a.Drukarka, a.IloscKopii) == (7, "HP", 2)
+    assert len(created) == 2 and len(enum_calls) == 1
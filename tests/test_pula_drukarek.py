@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""druk_pdf.print_files_pool: wadliwy plik nie wyłącza drukarek ani nie blokuje pozostałych."""
+
+import pytest
+
+import druk_pdf
+
+
+class FakeBackend:
+    def __init__(self, broken_files=(), broken_printers=()):
+        self.broken_files = set(broken_files)
+        self.broken_printers = set(broken_printers)
+        self.printed = []
+        self.calls = []
+
+    def print_with_adobe(self, printer, pdf):
+        self.calls.append((printer, pdf))
+        if pdf in self.broken_files or printer in self.broken_printers:
+            raise RuntimeError("błąd wydruku")
+        self.printed.append((printer, pdf))
+
+
+def run_pool(backend, printers, pdfs):
+    log = []
+    counts = druk_pdf.print_files_pool(backend, printers, pdfs, delay=0, log=log.append, sleep=lambda s: None)
+    return counts, "".join(log)
+
+
+def test_corrupt_file_does_not_disable_pool():
+    pdfs = [f"f{i}.pdf" for i in range(10)]
+    backend = FakeBackend(broken_files={"f2.pdf", "f3.pdf"})
+    counts, log = run_pool(backend, ["A", "B"], pdfs)
+
+    assert sorted(p for _, p in backend.printed) == sorted(set(pdfs) - {"f2.pdf", "f3.pdf"})
+    assert sum(counts.values()) == 8
+    assert "wyłączona z puli" not in log
+    assert "Nieudane pliki (2)" in log
+    # każdy wadliwy plik próbowany MAX_FILE_ATTEMPTS razy, na różnych drukarkach
+    for bad in ("f2.pdf", "f3.pdf"):
+        tried = [pr for pr, p in backend.calls if p == bad]
+        assert len(tried) == druk_pdf.MAX_FILE_ATTEMPTS and len(set(tried)) == 2
+
+
+def test_broken_printer_still_leaves_pool():
+    pdfs = [f"f{i}.pdf" for i in range(6)]
+    backend = FakeBackend(broken_printers={"B"})
+    counts, log = run_pool(backend, ["A", "B"], pdfs)
+
+    assert counts["A"] == 6 and counts["B"] == 0
+    assert "Drukarka B wyłączona z puli" in log
+
+
+def test_batches_printed_as_they_are_merged(tmp_path, monkeypatch):
+    pypdf = pytest.importorskip("pypdf")
+    pdfs = []
+    for i in range(6):
+        w = pypdf.PdfWriter()
+        w.add_blank_page(width=72, height=72)
+        pdfs.append(str(tmp_path / f"f{i}.pdf"))
+        with open(pdfs[-1], "wb") as f:
+            w.write(f)
+    out_dir = tmp_path / "wsady"
+    monkeypatch.setattr(druk_pdf, "batch_dir", lambda: str(out_dir))
+
+    seen = []
+
+    class Backend(FakeBackend):
+        def print_with_adobe(self, printer, pdf):
+            seen.append(sorted(p.name for p in out_dir.glob("wsad_*.pdf")))
+            super().print_with_adobe(printer, pdf)
+
+    backend = Backend()
+    jobs = druk_pdf.batched(pdfs, max_pages=2, log=lambda msg: None)
+    counts, _ = run_pool(backend, ["A", "B"], jobs)
+
+    assert sum(counts.values()) == 3
+    assert seen[0] == ["wsad_0001.pdf"]          # pierwszy wsad w druku, zanim połączono kolejne
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""raporty: sumy GROUP BY jednym zapytaniem wsadowym, zapis CSV/XLSX."""
+
+import csv
+import sqlite3
+
+import pytest
+
+import raporty
+
+
+class Serwer:
+    """Baza Subiekta na SQLite (YEAR/MONTH jak w T-SQL)."""
+
+    def __init__(self):
+        db = self.db = sqlite3.connect(":memory:")
+        db.row_factory = sqlite3.Row
+        db.create_function("YEAR", 1, lambda d: int(d[:4]))
+        db.create_function("MONTH", 1, lambda d: int(d[5:7]))
+        db.executescript("""
+            CREATE TABLE dok__Dokument (dok_Id INTEGER PRIMARY KEY, dok_Typ INTEGER, dok_NrPelny TEXT,
+                dok_DataWyst TEXT, dok_OdbiorcaId INTEGER, dok_MagId INTEGER,
+                dok_WartNetto REAL, dok_WartVat REAL, dok_WartBrutto REAL);
+            CREATE TABLE kh__Kontrahent (kh_Id INTEGER PRIMARY KEY, kh_Symbol TEXT);
+            CREATE TABLE adr__Ewid (adr_IdObiektu INTEGER, adr_TypAdresu INTEGER, adr_Nazwa TEXT);
+            CREATE TABLE sl_Magazyn (mag_Id INTEGER PRIMARY KEY, mag_Symbol TEXT, mag_Nazwa TEXT);
+            INSERT INTO kh__Kontrahent VALUES (1, 'KOW'), (2, 'NOW');
+            INSERT INTO adr__Ewid VALUES (1, 1, 'Kowalski'), (1, 2, 'Kowalski - dostawa'), (2, 1, 'Nowak');
+            INSERT INTO sl_Magazyn VALUES (1, 'MAG', 'Główny'), (2, 'HURT', 'Hurtownia');
+            INSERT INTO dok__Dokument VALUES
+                (1, 2, 'FS 1/2024', '2024-01-10', 1, 1, 100, 23, 123),
+                (2, 2, 'FS 2/2024', '2024-01-20', 2, 2, 200, 46, 246),
+                (3, 2, 'FS 3/2024', '2024-02-05', 1, 1, 10, 2.3, 12.3),
+                (4, 9, 'MM 1/2024', '2024-01-15', NULL, 1, 999, 0, 999),
+                (5, 2, 'FS 4/2024', '2024-03-01', 2, 1, 1, 0.23, 1.23);
+        """)
+        self.batches = []
+
+    def run_sql_batch(self, src, queries):
+        self.batches.append(queries)
+        return {k: [dict(r) for r in self.db.execute(q)] for k, q in queries.items()}
+
+
+@pytest.fixture
+def serwer(monkeypatch):
+    s = Serwer()
+    monkeypatch.setattr(raporty, "run_sql_batch", s.run_sql_batch)
+    return s
+
+
+RUN = {"typ": "fs", "od": "2024-01-01", "do": "2024-02-29"}
+
+
+def test_all_reports_in_one_batch(serwer):
+    wyniki = raporty.run_reports(None, 2, raporty.doc_filter(RUN))
+
+    assert len(serwer.batches) == 1 and list(serwer.batches[0]) == ["kontrahenci", "miesiace", "magazyny"]
+    kh = wyniki["kontrahenci"]
+    assert kh.columns == ("kh_id", "symbol", "nazwa", "dokumenty", "netto", "vat", "brutto")
+    assert list(kh.rows()) == [(2, "NOW", "Nowak", 1, 200, 46, 246), (1, "KOW", "Kowalski", 2, 110, 25.3, 135.3)]
+    assert [(r[0], r[1], r[2]) for r in wyniki["miesiace"].rows()] == [(2024, 1, 2), (2024, 2, 1)]
+    assert wyniki["magazyny"].data["symbol"] == ["HURT", "MAG"]
+    assert wyniki["magazyny"].total("dokumenty") == 3 and len(wyniki["magazyny"]) == 2
+
+
+def test_empty_selection_gives_empty_reports(serwer):
+    wyniki = raporty.run_reports(None, 2, raporty.doc_filter({"od": "2030-01-01", "do": "2030-01-31"}),
+                                 ["miesiace"])
+    assert list(wyniki) == ["miesiace"]
+    assert len(wyniki["miesiace"]) == 0 and wyniki["miesiace"].total("brutto") == 0
+
+
+def test_report_run_writes_one_csv_per_report(serwer, tmp_path):
+    paths = raporty.report_run(None, {**RUN, "raport": "miesiace", "out_dir": str(tmp_path)})
+
+    [path] = paths
+    assert path.name.startswith("FS_") and path.name.endswith("_miesiace.csv")
+    with path.open(encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.reader(f, delimiter=";"))
+    assert rows[0] == ["rok", "miesiac", "dokumenty", "netto", "vat", "brutto"]
+    assert rows[1][:3] == ["2024", "1", "2"] and len(rows) == 3
+
+
+def test_xlsx_needs_openpyxl(serwer, tmp_path, monkeypatch):
+    monkeypatch.setattr(raporty, "openpyxl", None)
+    with pytest.raises(RuntimeError, match="openpyxl"):
+        raporty.report_run(None, {**RUN, "format": "xlsx", "out_dir": str(tmp_path)})
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Eksport FS po wymuszonym odnowieniu sesji przez strażnika (com_worker + straznik)."""
+
+from pathlib import Path
+
+import drukuj_fs
+import straznik
+from com_worker import ComWorker
+from retry import ItemRunner
+
+
+class FakeDoc:
+    def __init__(self, session, id_):
+        self.session = session
+        self.id = id_
+
+    def DrukujDoPlikuWgWzorca(self, wzw_id, path, fmt):
+        if self.session.closed:
+            raise RuntimeError("obiekt z zakończonej sesji")
+        Path(path).write_bytes(b"%PDF-1.4")
+        self.session.exported.append(self.id)
+
+
+class FakeDokumenty:
+    def __init__(self, session):
+        self.session = session
+
+    def Wczytaj(self, id_):
+        return FakeDoc(self.session, id_)
+
+
+class FakeSession:
+    count = 0
+
+    def __init__(self):
+        FakeSession.count += 1
+        self.no = FakeSession.count
+        self.closed = False
+        self.exported = []
+        self.Dokumenty = FakeDokumenty(self)
+
+    def Zakoncz(self):
+        self.closed = True
+
+
+class TripOnce:
+    """Próbka ponad progiem pamięci raz - po trzecim dokumencie pierwszej sesji."""
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+
+    def attach(self, since):
+        pass
+
+    def sample(self):
+        s = self.sessions[-1]
+        return straznik.Probe(5000 if s.no == 1 and len(s.exported) >= 3 else 100)
+
+
+def test_export_continues_after_forced_recycle(tmp_path):
+    sessions = []
+
+    def factory():
+        sessions.append(FakeSession())
+        return sessions[-1]
+
+    watchdog = straznik.Watchdog(TripOnce(sessions), max_mb=1000, interval=0)
+    worker = ComWorker(factory, watchdog=watchdog)
+    try:
+        first = worker.wait_ready(5)
+        # jak read_selection: obiekty dokumentów z pierwszej sesji
+        items = [{"doc": first.Dokumenty.Wczytaj(i), "sub": first, "id": i, "numer": f"FS {i}/2024",
+                  "kh_id": 1, "path": tmp_path / f"FS {i}.pdf"} for i in range(1, 9)]
+        runner = ItemRunner(sleep=lambda s: None)
+        run = {"dry_run": False, "tryb": "pdf"}
+        results = [worker.submit(drukuj_fs.export_doc_guarded, runner, it, 7, "wzorzec", run, None, n, len(items))
+                   .result(5) for n, it in enumerate(items, start=1)]
+    finally:
+        worker.shutdown()
+
+    assert worker.recycles == 1
+    assert all(results) and not runner.failed
+    assert sessions[0].exported == [1, 2, 3]
+    assert sessions[1].exported == [4, 5, 6, 7, 8]
+    assert all(it["path"].exists() for it in items)
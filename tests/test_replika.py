@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""replika.Katalog.sync: pełne wczytanie, potem tylko nowe/zmienione/usunięte wiersze."""
+
+import sqlite3
+import zlib
+
+import pytest
+
+import replika
+
+
+class Serwer:
+    """Baza Subiekta na SQLite; BINARY_CHECKSUM jako funkcja użytkownika."""
+
+    def __init__(self):
+        self.db = sqlite3.connect(":memory:")
+        self.db.row_factory = sqlite3.Row
+        self.db.create_function("BINARY_CHECKSUM", -1,
+                                lambda *v: zlib.crc32(repr(v).encode()) - (1 << 31))
+        self.db.execute("CREATE TABLE sl_Kategoria (kat_Id INTEGER PRIMARY KEY, kat_Nazwa TEXT)")
+        self.db.execute("CREATE TABLE tw__Towar (tw_Id INTEGER PRIMARY KEY, tw_Symbol TEXT, tw_Nazwa TEXT, "
+                        "tw_Zablokowany INTEGER DEFAULT 0)")
+        self.batches = []
+
+    def run_sql_batch(self, src, queries):
+        assert src is self
+        self.batches.append(dict(queries))
+        return {k: [dict(r) for r in self.db.execute(q)] for k, q in queries.items()}
+
+
+@pytest.fixture
+def serwer(monkeypatch):
+    s = Serwer()
+    s.db.executemany("INSERT INTO sl_Kategoria VALUES (?, ?)", [(1, "Detal"), (2, "Hurt"), (3, "Eksport")])
+    s.db.executemany("INSERT INTO tw__Towar (tw_Id, tw_Symbol, tw_Nazwa) VALUES (?, ?, ?)",
+                     [(10, "A1", "Śruba"), (11, "B2", "Nakrętka")])
+    monkeypatch.setattr(replika, "run_sql_batch", s.run_sql_batch)
+    return s
+
+
+NAMES = ["kategorie", "towary"]
+
+
+def test_first_sync_loads_everything_in_one_batch(serwer):
+    k = replika.Katalog(":memory:")
+    stats = k.sync(serwer, NAMES)
+
+    assert len(serwer.batches) == 1
+    assert stats["kategorie"] == {"nowe": 3, "zmienione": 0, "usuniete": 0}
+    assert k.by("towary", "symbol", "a1").nazwa == "Śruba"
+    assert [c.nazwa for c in k.slownik("kategorie")] == ["Detal", "Eksport", "Hurt"]
+    assert k.synced("kategorie") is not None
+
+
+def test_incremental_sync_fetches_only_added_and_changed(serwer):
+    k = replika.Katalog(":memory:")
+    k.sync(serwer, NAMES)
+    serwer.db.execute("INSERT INTO sl_Kategoria VALUES (4, 'Internet')")
+    serwer.db.execute("UPDATE sl_Kategoria SET kat_Nazwa = 'Hurtownia' WHERE kat_Id = 2")
+    serwer.db.execute("DELETE FROM sl_Kategoria WHERE kat_Id = 3")
+    serwer.db.execute("UPDATE tw__Towar SET tw_Zablokowany = 1 WHERE tw_Id = 11")   # znika ze źródła
+    serwer.batches.clear()
+
+    stats = k.sync(serwer, NAMES)
+
+    assert stats == {"kategorie": {"nowe": 1, "zmienione": 1, "usuniete": 1},
+                     "towary": {"nowe": 0, "zmienione": 0, "usuniete": 1}}
+    assert len(serwer.batches) == 2                                  # sumy kontrolne + zmienione wiersze
+    assert all(key.startswith("chk:") for key in serwer.batches[0])
+    assert list(serwer.batches[1]) == ["rows:kategorie:0"]
+    assert serwer.batches[1]["rows:kategorie:0"].endswith("IN (2, 4)")
+    assert [c.nazwa for c in k.slownik("kategorie")] == ["Detal", "Hurtownia", "Internet"]
+    assert k.get("kategorie", 3) is None
+    assert k.get("towary", 11) is None and k.get("towary", 10) is not None
+
+
+def test_unchanged_source_needs_a_single_checksum_batch(serwer):
+    k = replika.Katalog(":memory:")
+    k.sync(serwer, NAMES)
+    serwer.batches.clear()
+
+    stats = k.sync(serwer, NAMES)
+
+    assert len(serwer.batches) == 1
+    assert all(s == {"nowe": 0, "zmienione": 0, "usuniete": 0} for s in stats.values())
+
+
+def test_changed_ids_are_split_into_chunks(serwer, monkeypatch):
+    monkeypatch.setattr(replika, "IN_CHUNK", 2)
+    k = replika.Katalog(":memory:")
+    k.sync(serwer, ["kategorie"])
+    serwer.db.execute("UPDATE sl_Kategoria SET kat_Nazwa = kat_Nazwa || '!'")
+    serwer.batches.clear()
+
+    assert k.sync(serwer, ["kategorie"])["kategorie"]["zmienione"] == 3
+    assert list(serwer.batches[1]) == ["rows:kategorie:0", "rows:kategorie:2"]
+    assert {c.nazwa for c in k.slownik("kategorie")} == {"Detal!", "Hurt!", "Eksport!"}
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""ItemRunner: otwarty bezpiecznik nie gubi dokumentów z listy nieudanych."""
+
+import json
+
+import pytest
+
+from retry import FATAL, NO_RETRY, PERMANENT, TRANSIENT, CircuitBreaker, CircuitOpen, ItemRunner, classify
+
+
+def failing(item):
+    raise ValueError(f"zły dokument {item['id']}")
+
+
+def test_open_breaker_records_every_item(tmp_path):
+    runner = ItemRunner(breaker=CircuitBreaker(window=10, max_error_rate=0.5, min_calls=4),
+                        sleep=lambda s: None)
+    items = [{"id": i, "numer": f"FS {i}"} for i in range(1, 11)]
+    stopped = 0
+    for it in items:
+        try:
+            runner.run(it, failing, it)
+        except CircuitOpen:
+            stopped += 1
+
+    assert stopped == 7                     # 4. dokument otwiera bezpiecznik, 5-10 odrzucone od razu
+    assert [f["id"] for f in runner.failed] == [it["id"] for it in items]
+    path = runner.write_dead_letters(tmp_path, "FS_")
+    assert json.loads(path.read_text(encoding="utf-8"))["ids"] == list(range(1, 11))
+
+
+def test_success_not_recorded():
+    runner = ItemRunner(sleep=lambda s: None)
+    assert runner.run({"id": 1, "numer": "FS 1"}, lambda: None)
+    assert runner.failed == []
+
+
+
+class Flaky:
+    """Błąd przejściowy (TimeoutError) przez pierwsze 'fails' wywołań."""
+
+    def __init__(self, fails):
+        self.fails = fails
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.fails:
+            raise TimeoutError("limit czasu")
+
+
+def test_transient_error_retried():
+    runner = ItemRunner(sleep=lambda s: None)
+    fn = Flaky(2)
+    assert runner.run({"id": 1, "numer": "FS 1"}, fn)
+    assert fn.calls == 3 and runner.retries == 2 and runner.failed == []
+
+
+def test_permanent_error_not_retried():
+    runner = ItemRunner(sleep=lambda s: None)
+    assert not runner.run({"id": 1, "numer": "FS 1"}, failing, {"id": 1})
+    assert [(f["klasa"], f["proby"]) for f in runner.failed] == [(PERMANENT, 1)]
+
+
+def test_no_retry_policy_for_print():
+    """Wydruk: timeout po wysłaniu do spoolera nie jest ponawiany (podwójny wydruk)."""
+    runner = ItemRunner(NO_RETRY, sleep=lambda s: None)
+    fn = Flaky(1)
+    assert not runner.run({"id": 1, "numer": "FS 1"}, fn)
+    assert fn.calls == 1 and runner.retries == 0
+    assert [(f["klasa"], f["proby"]) for f in runner.failed] == [(TRANSIENT, 1)]
+
+
+def test_fatal_error_raised():
+    runner = ItemRunner(sleep=lambda s: None)
+
+    def lost():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        runner.run({"id": 1, "numer": "FS 1"}, lost)
+    assert classify(KeyboardInterrupt()) == FATAL
+
+
+def test_no_dead_letters_without_failures(tmp_path):
+    assert ItemRunner().write_dead_letters(tmp_path, "FS_") is None
+    assert not list(tmp_path.iterdir())
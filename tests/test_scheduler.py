@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Kolejka zadań (scheduler) i parametry z pola launchera."""
+
+import threading
+import time
+from pathlib import Path
+
+import scheduler
+from launcher import split_args
+from scheduler import STATUS_CANCELLED, STATUS_DONE, JobScheduler
+
+
+class FakeProc:
+    def __init__(self, job):
+        self.job = job
+        self.exited = threading.Event()
+        self.terminated = False
+
+    def wait(self):
+        self.exited.wait(5)
+        return -15 if self.terminated else 0
+
+    def terminate(self):
+        self.terminated = True
+        self.exited.set()
+
+
+def wait_for(cond, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < end, "przekroczony czas"
+        time.sleep(0.005)
+
+
+def test_cancel_during_start_does_not_fail():
+    """cancel() w chwili, gdy dyspozytor zdjął zadanie z kolejki, a proces jeszcze startuje."""
+    launching, go = threading.Event(), threading.Event()
+    procs = []
+
+    def launch(job):
+        launching.set()
+        go.wait(5)
+        procs.append(FakeProc(job))
+        return procs[-1]
+
+    sched = JobScheduler(launch, seats=1)
+    try:
+        job = sched.submit({"id": "x", "label": "x"})
+        assert launching.wait(5)
+        sched.cancel(job)                     # wcześniej: ValueError z deque.remove
+        go.set()
+        wait_for(lambda: job.status == STATUS_CANCELLED)
+        assert procs[0].terminated
+    finally:
+        go.set()
+        sched.stop()
+
+
+def test_status_file_removed_and_progress_kept(tmp_path):
+    procs = []
+
+    def launch(job):
+        Path(job.status_file).write_text("7 10", encoding="ascii")
+        procs.append(FakeProc(job))
+        return procs[-1]
+
+    sched = JobScheduler(launch, seats=1)
+    try:
+        job = sched.submit({"id": "x", "label": "x"})
+        wait_for(lambda: procs)
+        procs[0].exited.set()
+        wait_for(lambda: job.status == STATUS_DONE)
+        assert not Path(job.status_file).exists()
+        assert job.progress == (7, 10)
+    finally:
+        sched.stop()
+
+
+def test_clear_cancel():
+    scheduler.request_cancel()
+    assert scheduler.cancel_requested()
+    scheduler.clear_cancel()
+    assert not scheduler.cancel_requested()
+
+
+def test_split_args_strips_quotes_keeps_backslashes():
+    assert split_args(r'--katalog "C:\Moje pliki\FS" --od 2024-01-01') == \
+        ["--katalog", r"C:\Moje pliki\FS", "--od", "2024-01-01"]
+    assert split_args(r'--plik="C:\a b.pdf" --x \\srv\drukarka') == [r"--plik=C:\a b.pdf", "--x", r"\\srv\drukarka"]
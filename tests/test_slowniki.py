@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""slowniki.load: jedno zapytanie wsadowe (utils.run_sql_batch) i podział wyników."""
+
+from types import SimpleNamespace
+
+import pytest
+
+import slowniki
+import utils
+
+
+class FakeRecordset:
+    """ADODB.Recordset z kolejnymi wynikami; None = polecenie bez wyniku (stan zamknięty)."""
+
+    def __init__(self, results, opened):
+        self._results = list(results)
+        self._opened = opened
+        self._set(self._results.pop(0) if self._results else None)
+
+    def _set(self, rows):
+        self.State = 0 if rows is None else 1
+        self._rows, self._pos = rows or [], 0
+
+    def Open(self, sql, *args):
+        self._opened.append(sql)
+
+    @property
+    def EOF(self):
+        return self._pos >= len(self._rows)
+
+    @property
+    def Fields(self):
+        row = self._rows[self._pos] if not self.EOF else (self._rows[0] if self._rows else {})
+        fields = {k: SimpleNamespace(Name=k, Value=v) for k, v in row.items()}
+        return type("Fields", (dict,), {"__iter__": lambda s: iter(s.values())})(fields)
+
+    def MoveNext(self):
+        self._pos += 1
+
+    def NextRecordset(self):
+        if not self._results:
+            return (None, 0)
+        self._set(self._results.pop(0))
+        return (self, 0)
+
+
+@pytest.fixture
+def adodb(monkeypatch):
+    state = SimpleNamespace(results=[], opened=[])
+    monkeypatch.setattr(utils, "Dispatch", lambda name: FakeRecordset(state.results, state.opened))
+    return state
+
+
+SESJA = SimpleNamespace(Aplikacja=SimpleNamespace(Baza=SimpleNamespace(Polaczenie=object())))
+
+
+def test_load_splits_batch_results_in_order(adodb):
+    adodb.results = [
+        None,                                                   # SET NOCOUNT ON
+        [{"kat_Id": 2, "kat_Nazwa": "Hurt"}, {"kat_Id": 1, "kat_Nazwa": "Detal"}],
+        [{"wzw_Id": 7, "wzw_Nazwa": "Faktura"}],
+    ]
+    out = slowniki.load(SESJA, ["kategorie", "wzorce_fs"])
+
+    assert len(adodb.opened) == 1                               # jedna podróż do serwera
+    assert adodb.opened[0].startswith("SET NOCOUNT ON;")
+    assert [k.nazwa for k in out["kategorie"]] == ["Hurt", "Detal"]
+    assert out["kategorie"].get(1) == slowniki.Kategoria(1, "Detal")
+    assert out["kategorie"].by_name(" hurt ").id == 2
+    assert list(out["wzorce_fs"]) == [slowniki.Wzorzec(7, "Faktura")]
+
+
+def test_empty_result_set_is_an_empty_dictionary(adodb):
+    adodb.results = [[], [{"tw_Id": 1, "tw_Symbol": "A1", "tw_Nazwa": "Śruba"}]]
+    out = slowniki.load(SESJA, ["kategorie", "towary"])
+    assert len(out["kategorie"]) == 0
+    assert out["towary"].get(1).symbol == "A1"
+
+
+def test_missing_result_set_is_an_error(adodb):
+    adodb.results = [[{"kat_Id": 1, "kat_Nazwa": "Detal"}]]
+    with pytest.raises(RuntimeError, match="1 z 2"):
+        slowniki.load(SESJA, ["kategorie", "towary"])
+
+
+def test_unknown_dictionary_is_rejected_before_querying(adodb):
+    with pytest.raises(KeyError, match="magazyny"):
+        slowniki.load(SESJA, ["kategorie", "magazyny"])
+    assert adodb.opened == []
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""sql_pool: konfiguracja, pula połączeń i ścieżka odczytu z fallbackiem (na SQLite)."""
+
+import sqlite3
+import threading
+
+import pytest
+
+import sql_pool
+
+
+def test_connection_string_prefers_session_database(monkeypatch):
+    monkeypatch.setenv("SFERA_SQL_SERVER", "srv\\INSERTGT")
+    monkeypatch.setenv("SFERA_SQL_DB", "baza_testowa")
+    monkeypatch.delenv("SFERA_SQL_LOGIN", raising=False)
+    monkeypatch.delenv("SFERA_SERWER", raising=False)
+    monkeypatch.delenv("SFERA_BAZA", raising=False)
+    assert "DATABASE=baza_testowa" in sql_pool.connection_string_from_env()
+
+    monkeypatch.setenv("SFERA_BAZA", "firma_a")          # wiele_baz.py
+    monkeypatch.setenv("SFERA_SERWER", "srv2\\INSERTGT")
+    conn_str = sql_pool.connection_string_from_env()
+    assert "DATABASE=firma_a" in conn_str and "SERVER=srv2\\INSERTGT" in conn_str
+
+
+# ============================================================================ #
+#                          PULA I ŚCIEŻKA ODCZYTU (SQLite)
+# ============================================================================ #
+
+def sqlite_connect(path, on_connect=None):
+    def connect():
+        conn = sqlite3.connect(path, check_same_thread=False)
+        if on_connect:
+            on_connect(conn)
+        return conn
+    return connect
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = tmp_path / "sfera.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE dok__Dokument (dok_Id INTEGER PRIMARY KEY, dok_NrPelny TEXT)")
+        conn.executemany("INSERT INTO dok__Dokument VALUES (?, ?)", [(i, f"FS {i}/2024") for i in range(1, 6)])
+    return path
+
+
+def test_pool_reuses_connections(db):
+    created = []
+    pool = sql_pool.ConnectionPool(sqlite_connect(db, created.append), size=2)
+    rp = sql_pool.ReadPath(pool)
+    try:
+        sqls = {i: f"SELECT dok_NrPelny FROM dok__Dokument WHERE dok_Id = {i}" for i in range(1, 6)}
+        rows = rp.query_many(sqls)
+        assert {i: r[0]["dok_NrPelny"] for i, r in rows.items()} == {i: f"FS {i}/2024" for i in range(1, 6)}
+        assert 1 <= len(created) <= 2
+        batch = rp.query_batch({"n": "SELECT COUNT(*) AS n FROM dok__Dokument",
+                                "max": "SELECT MAX(dok_Id) AS m FROM dok__Dokument"})
+        assert batch == {"n": [{"n": 5}], "max": [{"m": 5}]}
+    finally:
+        rp.close()
+
+
+def test_pool_is_read_only(db):
+    pool = sql_pool.ConnectionPool(sqlite_connect(db))
+    try:
+        with pytest.raises(ValueError):
+            pool.query("DELETE FROM dok__Dokument")
+        with pytest.raises(ValueError):
+            pool.query_batch({"a": "SELECT 1", "b": "UPDATE dok__Dokument SET dok_NrPelny = ''"})
+        assert pool.query("SELECT COUNT(*) AS n FROM dok__Dokument") == [{"n": 5}]
+    finally:
+        pool.close()
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT 1; DELETE FROM dok__Dokument",
+    "SELECT 1;\nDROP TABLE dok__Dokument;",
+    "WITH x AS (SELECT 1 AS a) DELETE FROM dok__Dokument",
+    "SELECT * INTO kopia FROM dok__Dokument",
+    "SELECT 1 /* ; */; EXEC sp_who",
+])
+def test_read_only_rejects_writes_and_batches(sql):
+    with pytest.raises(ValueError):
+        sql_pool.check_read_only(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT dok_NrPelny FROM dok__Dokument WHERE dok_NrPelny = 'FS 1; DELETE'",
+    "SELECT [dok_Uwagi;x] FROM dok__Dokument;",
+    "WITH d AS (SELECT dok_Id FROM dok__Dokument) SELECT COUNT(*) AS n FROM d -- koniec; DELETE",
+    "select 'Update' AS etykieta",
+])
+def test_read_only_accepts_single_select(sql):
+    sql_pool.check_read_only(sql)
+
+
+def test_pool_from_env_sets_timeouts(monkeypatch):
+    calls = []
+
+    class Conn:
+        timeout = 0
+
+    class FakePyodbc:
+        @staticmethod
+        def connect(conn_str, **kwargs):
+            calls.append(kwargs)
+            return Conn()
+
+    monkeypatch.setattr(sql_pool, "pyodbc", FakePyodbc)
+    monkeypatch.setattr(sql_pool, "connection_string_from_env", lambda: "DRIVER={x}")
+    pool = sql_pool.pool_from_env()
+    with pool.connection() as conn:
+        assert conn.timeout == sql_pool.QUERY_TIMEOUT
+    assert calls == [{"autocommit": True, "readonly": True, "timeout": sql_pool.CONNECT_TIMEOUT}]
+
+
+def test_fallback_when_connection_fails():
+    def refuse():
+        raise ConnectionError("serwer niedostępny")
+
+    rp = sql_pool.ReadPath(sql_pool.ConnectionPool(refuse), fallback=lambda sql: [{"zrodlo": "sfera"}])
+    try:
+        assert rp.query("SELECT 1") == [{"zrodlo": "sfera"}]
+        assert not rp.direct
+        assert rp.query_batch({"a": "SELECT 1"}) == {"a": [{"zrodlo": "sfera"}]}
+    finally:
+        rp.close()
+
+
+def test_other_errors_are_not_swallowed(db):
+    rp = sql_pool.ReadPath(sql_pool.ConnectionPool(sqlite_connect(db)), fallback=lambda sql: [])
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            rp.query("SELECT * FROM brak_tabeli")
+        assert rp.direct
+    finally:
+        rp.close()
+
+
+def test_drop_pool_keeps_queries_in_flight(db):
+    """Zapytanie w toku kończy się na swoim połączeniu, gdy inny wątek odłącza pulę."""
+    inside, release = threading.Event(), threading.Event()
+
+    def wait():
+        inside.set()
+        release.wait(5)
+        return 1
+
+    calls = []
+
+    def connect():
+        calls.append(1)
+        if len(calls) > 1:
+            raise ConnectionError("serwer niedostępny")
+        return sqlite_connect(db, lambda c: c.create_function("czekaj", 0, wait))()
+
+    pool = sql_pool.ConnectionPool(connect, size=2)
+    rp = sql_pool.ReadPath(pool, fallback=lambda sql: [{"x": "sfera"}])
+    try:
+        slow = rp.submit(lambda path: path.query("SELECT czekaj() AS x"))
+        assert inside.wait(5)
+        assert rp.query("SELECT 1 AS x") == [{"x": "sfera"}]     # drugie połączenie się nie udaje
+        assert not rp.direct
+        release.set()
+        assert slow.result(5) == [{"x": 1}]
+        assert pool._idle.empty()                                # zwrócone połączenie zamknięte
+    finally:
+        release.set()
+        rp.close()
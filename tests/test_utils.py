@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""utils: logowanie do Sfery (get_subiekt) i filtr dokumentów (doc_where)."""
+
+import sqlite3
+from datetime import date
+
+import pytest
+
+import utils
+
+
+class FakeGT:
+    def Uruchom(self, *args):
+        return self
+
+
+@pytest.fixture
+def gt(monkeypatch):
+    gt = FakeGT()
+    sub = type("Sub", (), {})()
+    sub.Aplikacja = type("A", (), {"Wersja": "1.0"})()
+    sub.Baza = type("B", (), {"Nazwa": "firma_a", "Serwer": "srv"})()
+    monkeypatch.setattr(utils, "Dispatch", lambda x: gt if x == "InsERT.GT" else sub)
+    monkeypatch.setattr(utils, "cred_read", lambda: ("Szef", "haslo"))
+    for name in ("SFERA_BAZA", "SFERA_SERWER", "SFERA_SQL_SERVER", "SFERA_SQL_LOGIN", "SFERA_SQL_PASSWORD"):
+        monkeypatch.delenv(name, raising=False)
+    return gt
+
+
+def test_database_without_server_keeps_configured_server(gt, monkeypatch):
+    monkeypatch.setenv("SFERA_BAZA", "firma_a")
+    utils.get_subiekt()
+    assert gt.Baza == "firma_a"
+    assert not hasattr(gt, "Serwer") and not hasattr(gt, "Autentykacja")
+
+
+def test_other_server_uses_sql_login(gt, monkeypatch):
+    monkeypatch.setenv("SFERA_BAZA", "firma_b")
+    monkeypatch.setenv("SFERA_SERWER", r"srv2\INSERTGT")
+    monkeypatch.setenv("SFERA_SQL_LOGIN", "sfera")
+    monkeypatch.setenv("SFERA_SQL_PASSWORD", "tajne")
+    utils.get_subiekt()
+    assert (gt.Serwer, gt.Baza, gt.Autentykacja, gt.Uzytkownik, gt.UzytkownikHaslo) == \
+        (r"srv2\INSERTGT", "firma_b", 0, "sfera", "tajne")
+
+
+def test_other_server_without_login_uses_windows_auth(gt, monkeypatch):
+    monkeypatch.setenv("SFERA_BAZA", "firma_b")
+    monkeypatch.setenv("SFERA_SQL_SERVER", "srv3")
+    utils.get_subiekt()
+    assert (gt.Serwer, gt.Autentykacja) == ("srv3", 1)
+    assert not hasattr(gt, "Uzytkownik")
+
+
+# ---------------------------------------------------------------- doc_where
+
+NUMERY = ["FS 12/2024", "FS 1/2024", "FS 112/2024", "FS_1%/2024", "FS [A]1/2024", "FSX1/2024"]
+
+
+@pytest.fixture
+def dokumenty():
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE dok__Dokument (dok_Id INTEGER PRIMARY KEY, dok_Typ INTEGER, dok_NrPelny TEXT, "
+               "dok_DataWyst TEXT, dok_OdbiorcaId INTEGER)")
+    db.executemany("INSERT INTO dok__Dokument VALUES (?, 2, ?, ?, ?)",
+                   [(i, n, f"2024-01-{i:02d}", 100 + i % 2) for i, n in enumerate(NUMERY, start=1)])
+    return lambda **filtr: [n for (n,) in db.execute(
+        f"SELECT d.dok_NrPelny FROM dok__Dokument d WHERE {utils.doc_where(**filtr)} ORDER BY d.dok_Id")]
+
+
+def test_number_without_star_is_an_exact_match(dokumenty):
+    assert utils.doc_where(numery=["FS 12/2024"]) == "(d.dok_NrPelny = 'FS 12/2024')"
+    assert dokumenty(numery=["FS 12/2024"]) == ["FS 12/2024"]
+    assert dokumenty(numery=["FS_1%/2024"]) == ["FS_1%/2024"]
+
+
+@pytest.mark.parametrize("numer, expected", [
+    ("FS 1*/2024", ["FS 12/2024", "FS 1/2024", "FS 112/2024"]),
+    ("FS_1*", ["FS_1%/2024"]),                 # '_' nie jest dowolnym znakiem (FSX1)
+    ("FS_1%*", ["FS_1%/2024"]),
+    ("FS [A]*", ["FS [A]1/2024"]),             # '[' nie otwiera zbioru znaków
+    ("FS [*", ["FS [A]1/2024"]),
+])
+def test_only_star_is_a_wildcard(dokumenty, numer, expected):
+    assert dokumenty(numery=[numer]) == expected
+
+
+def test_filters_are_combined(dokumenty):
+    where = utils.doc_where(typ=2, od=date(2024, 1, 2), do=date(2024, 1, 3), numery=["FS 1*", "FS [*"],
+                            kh_ids=[100, 101], ids=[1, 2, 3, 5])
+    assert where.startswith("d.dok_Typ = 2 AND d.dok_DataWyst >= '2024-01-02' AND d.dok_DataWyst < '2024-01-04'")
+    assert dokumenty(typ=2, od=date(2024, 1, 2), do=date(2024, 1, 3), numery=["FS 1*", "FS [*"],
+                     kh_ids=[100, 101], ids=[1, 2, 3, 5]) == ["FS 1/2024", "FS 112/2024"]
+    assert utils.doc_where() == "1 = 1"
+    assert utils.doc_where(numery=["FS [A]_1*"]) == "(d.dok_NrPelny LIKE 'FS \\[A]\\_1%' ESCAPE '\\')"
+    assert utils.doc_where(numery=["O'B*"], alias="x") == "(x.dok_NrPelny LIKE 'O''B%' ESCAPE '\\')"
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""zmiana_mm: podgląd zmiany dat MM jednym zapytaniem (dry run)."""
+
+import sqlite3
+from datetime import date
+
+import pytest
+
+import zmiana_mm
+
+
+class Serwer:
+    """dok__Dokument na SQLite; DATEDIFF(day, a, b) jak w T-SQL."""
+
+    def __init__(self):
+        self.db = sqlite3.connect(":memory:")
+        self.db.row_factory = sqlite3.Row
+        self.db.create_function("DATEDIFF", 3, lambda unit, a, b: (date.fromisoformat(b[:10])
+                                                                   - date.fromisoformat(a[:10])).days)
+        self.db.execute("CREATE TABLE dok__Dokument (dok_Id INTEGER PRIMARY KEY, dok_Typ INTEGER, dok_NrPelny TEXT, "
+                        "dok_WartNetto REAL, dok_DataWyst TEXT, dok_JestRuchMag INTEGER, dok_OdbiorcaId INTEGER)")
+        self.db.executemany("INSERT INTO dok__Dokument VALUES (?, ?, ?, ?, ?, ?, NULL)", [
+            (1, 9, "MM 1/2024", 100.0, "2024-01-30 00:00:00", 1),
+            (2, 9, "MM 2/2024", None, "2024-02-01 00:00:00", 1),
+            (3, 9, "MM 3/2024", 50.5, "2024-01-10 00:00:00", 0),
+            (4, 9, "MM 4/2024", 10.0, "2024-01-31 00:00:00", 1),    # już ma docelową datę
+            (5, 2, "FS 1/2024", 10.0, "2024-01-01 00:00:00", 1),
+        ])
+        self.queries = []
+
+    def run_sql(self, src, sql):
+        self.queries.append(sql)
+        return [dict(r) for r in self.db.execute(sql.replace("DATEDIFF(day,", "DATEDIFF('day',"))]
+
+
+@pytest.fixture
+def serwer(monkeypatch):
+    s = Serwer()
+    monkeypatch.setattr(zmiana_mm, "run_sql", s.run_sql)
+    return s
+
+
+NEW = date(2024, 1, 31)
+
+
+def test_preview_in_one_query_with_month_change_risk(serwer):
+    rows = zmiana_mm.preview_changes(None, NEW, filtr={})
+
+    assert len(serwer.queries) == 1
+    assert [(r["numer"], r["data"], r["dni"], r["miesiac"], r["ruch_mag"], r["ryzyko"]) for r in rows] == [
+        ("MM 3/2024", "2024-01-10", 21, "2024-01", False, False),
+        ("MM 1/2024", "2024-01-30", 1, "2024-01", True, False),
+        ("MM 2/2024", "2024-02-01", -1, "2024-02", True, True),      # ruch magazynowy do innego miesiąca
+    ]
+    assert rows[2]["netto"] == 0.0 and rows[2]["nowy_miesiac"] == "2024-01"
+
+
+def test_preview_for_ids_and_summary(serwer):
+    rows = zmiana_mm.preview_changes(None, NEW, ids=[2, 4, 5])
+    assert [r["id"] for r in rows] == [2]                          # 4 bez zmiany, 5 to nie MM
+    assert zmiana_mm.preview_changes(None, NEW, ids=[]) == []
+    assert zmiana_mm.preview_summary(zmiana_mm.preview_changes(None, NEW, filtr={}), NEW) == (
+        "DRY RUN: 3 dokumentów MM zmieni datę na 2024-01-31, netto razem 150.50. "
+        "Uwaga: 1 z ruchem magazynowym przejdzie do innego miesiąca.")